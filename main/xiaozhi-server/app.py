@@ -8,6 +8,8 @@ from config.logger import setup_logging
 from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
+from core.utils.turn_trace import get_metrics_registry
+from core.worker_supervisor import WorkerSupervisor, reuse_port_supported
 from core.utils.util import check_ffmpeg_installed
 from core.utils.gc_manager import get_gc_manager
 
@@ -68,11 +70,24 @@ async def main():
     gc_manager = get_gc_manager(interval_seconds=300)
     await gc_manager.start()
 
-    # 启动 WebSocket 服务器
-    ws_server = WebSocketServer(config)
-    ws_task = asyncio.create_task(ws_server.start())
+    # 启动 WebSocket 服务器，workers大于1时使用多进程模式
+    workers = int(config["server"].get("workers") or 1)
+    if workers > 1 and not reuse_port_supported():
+        logger.bind(tag=TAG).warning("当前平台不支持SO_REUSEPORT，使用单进程模式")
+        workers = 1
+    supervisor = None
+    if workers > 1:
+        supervisor = WorkerSupervisor(config, workers)
+        ws_task = asyncio.create_task(supervisor.start())
+        health_provider = supervisor.get_health
+        metrics_provider = supervisor.render_metrics
+    else:
+        ws_server = WebSocketServer(config)
+        ws_task = asyncio.create_task(ws_server.start())
+        health_provider = ws_server.get_health
+        metrics_provider = get_metrics_registry().render_local
     # 启动 Simple http 服务器
-    ota_server = SimpleHttpServer(config)
+    ota_server = SimpleHttpServer(config, health_provider, metrics_provider)
     ota_task = asyncio.create_task(ota_server.start())
 
     read_config_from_api = config.get("read_config_from_api", False)
@@ -130,6 +145,10 @@ async def main():
         # 停止全局GC管理器
         await gc_manager.stop()
 
+        # 通知工作进程退出
+        if supervisor:
+            await supervisor.stop()
+
         # 取消所有任务（关键修复点）
         stdin_task.cancel()
         ws_task.cancel()
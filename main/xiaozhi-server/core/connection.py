@@ -4,6 +4,7 @@ import copy
 import json
 import uuid
 import time
+import functools
 import queue
 import asyncio
 import threading
@@ -27,7 +28,8 @@ from core.utils.modules_initialize import (
 from core.handle.reportHandle import report
 from core.providers.tts.default import DefaultTTS
 from concurrent.futures import ThreadPoolExecutor
-from core.utils.dialogue import Message, Dialogue
+from core.utils.dialogue import Message, Dialogue, SUMMARY_PROMPT, format_for_summary
+from core.utils.audio_buffer import PacketRingBuffer
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
 from core.providers.tools.unified_tool_handler import UnifiedToolHandler
@@ -36,11 +38,14 @@ from plugins_func.register import Action
 from core.auth import AuthenticationError
 from config.config_loader import get_private_config_from_api
 from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
+from core.providers.tts.pipeline import close_audio_item
 from config.logger import setup_logging, build_module_string, create_connection_logger
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException
 from core.utils.prompt_manager import PromptManager
 from core.utils.voiceprint_provider import VoiceprintProvider
 from core.utils import textUtils
+from core.utils.turn_trace import current_turn
+from core.utils.speculative import SpeculativeStream
 
 TAG = __name__
 
@@ -117,10 +122,12 @@ class ConnectionHandler:
         self.voiceprint_provider = None
 
         # vad相关变量
-        self.client_audio_buffer = bytearray()
+        # 连接独占的VAD会话（解码器、模型状态、音频缓冲区），由VAD会话池分配
+        self.vad_session = None
         self.client_have_voice = False
         self.client_voice_window = deque(maxlen=5)
         self.first_activity_time = 0.0  # 记录首次活动的时间（毫秒）
+        self.turn_trace = None  # 当前对话轮次的耗时记录
         self.last_activity_time = 0.0  # 统一的活动时间戳（毫秒）
         self.client_voice_stop = False
         self.last_is_voice = False
@@ -128,12 +135,23 @@ class ConnectionHandler:
         # asr相关变量
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
         # 所以涉及到ASR的变量，需要在这里定义，属于connection的私有变量
-        self.asr_audio = []
+        self.asr_audio = PacketRingBuffer()
+        # 边说边识别的中间状态（本地ASR开启分段识别时使用）
+        self.asr_incremental = None
         self.asr_audio_queue = queue.Queue()
 
         # llm相关变量
         self.llm_finish_task = True
-        self.dialogue = Dialogue()
+        self.chat_task = None
+        # 意图识别期间提前发出的对话请求
+        self.speculative_stream = None
+        window_config = self.config.get("dialogue_window") or {}
+        self.dialogue = Dialogue(
+            max_tokens=int(window_config.get("max_tokens", 0) or 0),
+            summarizer=(
+                self._summarize_dialogue if window_config.get("summary", True) else None
+            ),
+        )
 
         # tts相关变量
         self.sentence_id = None
@@ -150,6 +168,8 @@ class ConnectionHandler:
         self.close_after_chat = False
         self.load_function_plugin = False
         self.intent_type = "nointent"
+        # intent_llm模式下是否在意图识别的同时请求对话LLM
+        self.speculative_chat = False
 
         self.timeout_seconds = (
             int(self.config.get("close_connection_no_voice_time", 120)) + 60
@@ -395,6 +415,11 @@ class ConnectionHandler:
                 )
             )
 
+            # 多进程模式下由主进程逐个平滑替换工作进程，不中断其他连接
+            if self.server and getattr(self.server, "cluster", None):
+                self.server.cluster.request_restart()
+                return
+
             # 异步执行重启操作
             def restart_server():
                 """实际执行重启的方法"""
@@ -485,6 +510,10 @@ class ConnectionHandler:
         )
         if enhanced_prompt:
             self.change_system_prompt(enhanced_prompt)
+            # 时间、天气等易变信息每轮对话单独渲染，追加在静态提示词之后
+            self.dialogue.context_renderer = functools.partial(
+                self.prompt_manager.build_context, self.device_id, self.client_ip
+            )
             self.logger.bind(tag=TAG).debug("系统提示词已增强更新")
 
     def _init_report_threads(self):
@@ -738,6 +767,12 @@ class ConnectionHandler:
         ]["type"]
         if self.intent_type == "function_call" or self.intent_type == "intent_llm":
             self.load_function_plugin = True
+        if self.intent_type == "intent_llm":
+            self.speculative_chat = bool(
+                self.config["Intent"][self.config["selected_module"]["Intent"]].get(
+                    "speculative_chat", False
+                )
+            )
         """初始化意图识别模块"""
         # 获取意图识别配置
         intent_config = self.config["Intent"]
@@ -779,12 +814,84 @@ class ConnectionHandler:
         if hasattr(self, "loop") and self.loop:
             asyncio.run_coroutine_threadsafe(self.func_handler._initialize(), self.loop)
 
+    def _summarize_dialogue(self, summary, messages):
+        """把移出上下文窗口的对话压缩进滚动摘要，在后台线程中调用"""
+        if self.llm is None:
+            return None
+        max_chars = (self.config.get("dialogue_window") or {}).get(
+            "summary_max_chars", 300
+        )
+        result = self.llm.response_no_stream(
+            SUMMARY_PROMPT.format(max_chars=max_chars),
+            format_for_summary(summary, messages),
+        )
+        # response_no_stream出错时返回【...】格式的提示，不能当作摘要
+        if not result or result.startswith("【"):
+            return None
+        self.logger.bind(tag=TAG).debug(f"对话摘要已更新: {result}")
+        return result.strip()
+
     def change_system_prompt(self, prompt):
         self.prompt = prompt
         # 更新系统prompt至上下文
         self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query, depth=0):
+    def start_chat(self, query):
+        """在事件循环中开始一轮对话，必须在事件循环线程中调用"""
+        # 新的提问覆盖上一轮尚未结束的对话，本轮推测发出的请求保留给新任务
+        task = self.chat_task
+        if task is not None and not task.done():
+            task.cancel()
+        self.chat_task = self.loop.create_task(self._run_chat(query))
+        return self.chat_task
+
+    def cancel_chat(self):
+        """打断正在进行的对话，上游LLM请求随之立即断开"""
+        self.discard_speculative_chat()
+        task = self.chat_task
+        if task is not None and not task.done():
+            task.cancel()
+
+    def start_speculative_chat(self, query):
+        """意图识别期间提前请求对话LLM，回复先缓存，确认是普通对话后由chat接着播放"""
+        self.discard_speculative_chat()
+        self.speculative_stream = SpeculativeStream(
+            query, self._speculative_responses(query)
+        )
+
+    def discard_speculative_chat(self):
+        """识别出其他意图时放弃提前发出的对话请求"""
+        if self.speculative_stream is not None:
+            self.speculative_stream.cancel()
+            self.speculative_stream = None
+
+    async def _speculative_responses(self, query):
+        # 与chat中的请求相同，只是用户消息在确认前不写入对话记录
+        memory_str = None
+        if self.memory is not None:
+            memory_str = await self.memory.query_memory(query)
+        dialogue = self.dialogue.get_llm_dialogue_with_memory(
+            memory_str, self.config.get("voiceprint", {})
+        )
+        dialogue.append(Message(role="user", content=query).to_llm_message())
+        llm_responses = self.llm.aresponse(self.session_id, dialogue)
+        try:
+            async for response in llm_responses:
+                yield response
+        finally:
+            await llm_responses.aclose()
+
+    async def _run_chat(self, query):
+        try:
+            await self.chat(query)
+        except asyncio.CancelledError:
+            self.llm_finish_task = True
+            self.logger.bind(tag=TAG).info("对话已被打断，LLM请求已取消")
+        except Exception as e:
+            self.llm_finish_task = True
+            self.logger.bind(tag=TAG).error(f"对话处理出错 {query}: {e}")
+
+    async def chat(self, query, depth=0):
         if query is not None:
             self.logger.bind(tag=TAG).info(f"大模型收到用户消息: {query}")
 
@@ -828,32 +935,46 @@ class ConnectionHandler:
         ):
             functions = self.func_handler.get_functions()
         response_message = []
+        trace = current_turn(self)
+
+        # 意图识别期间已经发出的请求
+        speculative = self.speculative_stream if depth == 0 else None
+        if speculative is not None:
+            self.speculative_stream = None
+            if speculative.query != query or functions is not None:
+                speculative.cancel()
+                speculative = None
 
         try:
-            # 使用带记忆的对话
-            memory_str = None
-            if self.memory is not None:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
-                )
-                memory_str = future.result()
-
-            if self.intent_type == "function_call" and functions is not None:
-                # 使用支持functions的streaming接口
-                llm_responses = self.llm.response_with_functions(
-                    self.session_id,
-                    self.dialogue.get_llm_dialogue_with_memory(
-                        memory_str, self.config.get("voiceprint", {})
-                    ),
-                    functions=functions,
-                )
+            if speculative is not None:
+                # 回复已在意图识别期间开始生成，从缓存接着读取
+                llm_start_time = time.monotonic()
+                llm_responses = speculative
             else:
-                llm_responses = self.llm.response(
-                    self.session_id,
-                    self.dialogue.get_llm_dialogue_with_memory(
-                        memory_str, self.config.get("voiceprint", {})
-                    ),
-                )
+                # 使用带记忆的对话
+                memory_str = None
+                if self.memory is not None:
+                    async with trace.aspan("memory_query"):
+                        memory_str = await self.memory.query_memory(query)
+
+                llm_start_time = time.monotonic()
+
+                if self.intent_type == "function_call" and functions is not None:
+                    # 使用支持functions的streaming接口
+                    llm_responses = self.llm.aresponse_with_functions(
+                        self.session_id,
+                        self.dialogue.get_llm_dialogue_with_memory(
+                            memory_str, self.config.get("voiceprint", {})
+                        ),
+                        functions=functions,
+                    )
+                else:
+                    llm_responses = self.llm.aresponse(
+                        self.session_id,
+                        self.dialogue.get_llm_dialogue_with_memory(
+                            memory_str, self.config.get("voiceprint", {})
+                        ),
+                    )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
             return None
@@ -865,46 +986,60 @@ class ConnectionHandler:
         content_arguments = ""
         self.client_abort = False
         emotion_flag = True
-        for response in llm_responses:
-            if self.client_abort:
-                break
-            if self.intent_type == "function_call" and functions is not None:
-                content, tools_call = response
-                if "content" in response:
-                    content = response["content"]
-                    tools_call = None
-                if content is not None and len(content) > 0:
-                    content_arguments += content
-
-                if not tool_call_flag and content_arguments.startswith("<tool_call>"):
-                    # print("content_arguments", content_arguments)
-                    tool_call_flag = True
+        first_token = True
+        try:
+            async for response in llm_responses:
+                if self.client_abort:
+                    break
+                if first_token:
+                    trace.record_stage("llm_first_token", time.monotonic() - llm_start_time)
+                    trace.mark("llm_first_token")
+                    first_token = False
+                if self.intent_type == "function_call" and functions is not None:
+                    content, tools_call = response
+                    if "content" in response:
+                        content = response["content"]
+                        tools_call = None
+                    if content is not None and len(content) > 0:
+                        content_arguments += content
+
+                    if not tool_call_flag and content_arguments.startswith("<tool_call>"):
+                        # print("content_arguments", content_arguments)
+                        tool_call_flag = True
+
+                    if tools_call is not None and len(tools_call) > 0:
+                        tool_call_flag = True
+                        self._merge_tool_calls(tool_calls_list, tools_call)
+                else:
+                    content = response
 
-                if tools_call is not None and len(tools_call) > 0:
-                    tool_call_flag = True
-                    self._merge_tool_calls(tool_calls_list, tools_call)
-            else:
-                content = response
+                # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
+                if emotion_flag and content is not None and content.strip():
+                    asyncio.create_task(textUtils.get_emotion(self, content))
+                    emotion_flag = False
 
-            # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
-            if emotion_flag and content is not None and content.strip():
-                asyncio.run_coroutine_threadsafe(
-                    textUtils.get_emotion(self, content),
-                    self.loop,
-                )
-                emotion_flag = False
-
-            if content is not None and len(content) > 0:
-                if not tool_call_flag:
-                    response_message.append(content)
-                    self.tts.tts_text_queue.put(
-                        TTSMessageDTO(
-                            sentence_id=self.sentence_id,
-                            sentence_type=SentenceType.MIDDLE,
-                            content_type=ContentType.TEXT,
-                            content_detail=content,
+                if content is not None and len(content) > 0:
+                    if not tool_call_flag:
+                        response_message.append(content)
+                        self.tts.tts_text_queue.put(
+                            TTSMessageDTO(
+                                sentence_id=self.sentence_id,
+                                sentence_type=SentenceType.MIDDLE,
+                                content_type=ContentType.TEXT,
+                                content_detail=content,
+                            )
                         )
-                    )
+        except asyncio.CancelledError:
+            # 被打断时保留已经生成的部分回复
+            if len(response_message) > 0:
+                self.dialogue.put(
+                    Message(role="assistant", content="".join(response_message))
+                )
+            raise
+        finally:
+            # 提前结束时立即关闭上游流式请求
+            await llm_responses.aclose()
+        trace.record_stage("llm_complete", time.monotonic() - llm_start_time)
         # 处理function call
         if tool_call_flag:
             bHasError = False
@@ -947,30 +1082,25 @@ class ConnectionHandler:
                     f"检测到 {len(tool_calls_list)} 个工具调用"
                 )
 
-                # 收集所有工具调用的 Future
-                futures_with_data = []
+                tool_start_time = time.monotonic()
                 for tool_call_data in tool_calls_list:
                     self.logger.bind(tag=TAG).debug(
                         f"function_name={tool_call_data['name']}, function_id={tool_call_data['id']}, function_arguments={tool_call_data['arguments']}"
                     )
 
-                    future = asyncio.run_coroutine_threadsafe(
-                        self.func_handler.handle_llm_function_call(
-                            self, tool_call_data
-                        ),
-                        self.loop,
-                    )
-                    futures_with_data.append((future, tool_call_data))
-
-                # 等待协程结束（实际等待时长为最慢的那个）
-                tool_results = []
-                for future, tool_call_data in futures_with_data:
-                    result = future.result()
-                    tool_results.append((result, tool_call_data))
+                # 并行执行所有工具调用（实际等待时长为最慢的那个）
+                results = await asyncio.gather(
+                    *[
+                        self.func_handler.handle_llm_function_call(self, tool_call_data)
+                        for tool_call_data in tool_calls_list
+                    ]
+                )
+                trace.record_stage("tool_call", time.monotonic() - tool_start_time)
+                tool_results = list(zip(results, tool_calls_list))
 
                 # 统一处理所有工具调用结果
                 if tool_results:
-                    self._handle_function_result(tool_results, depth=depth)
+                    await self._handle_function_result(tool_results, depth=depth)
 
         # 存储对话内容
         if len(response_message) > 0:
@@ -995,7 +1125,7 @@ class ConnectionHandler:
 
         return True
 
-    def _handle_function_result(self, tool_results, depth):
+    async def _handle_function_result(self, tool_results, depth):
         need_llm_tools = []
 
         for result, tool_call_data in tool_results:
@@ -1047,7 +1177,7 @@ class ConnectionHandler:
                         )
                     )
 
-            self.chat(None, depth=depth + 1)
+            await self.chat(None, depth=depth + 1)
 
     def _report_worker(self):
         """聊天记录上报工作线程"""
@@ -1103,6 +1233,9 @@ class ConnectionHandler:
                     pass
                 self.timeout_task = None
 
+            # 取消进行中的对话，断开上游LLM请求
+            self.cancel_chat()
+
             # 清理工具处理器资源
             if hasattr(self, "func_handler") and self.func_handler:
                 try:
@@ -1158,6 +1291,10 @@ class ConnectionHandler:
             if self.tts:
                 await self.tts.close()
 
+            # 归还VAD会话
+            if self.vad:
+                self.vad.release_session(self)
+
             # 最后关闭线程池（避免阻塞）
             if self.executor:
                 try:
@@ -1182,6 +1319,9 @@ class ConnectionHandler:
                 f"开始清理: TTS队列大小={self.tts.tts_text_queue.qsize()}, 音频队列大小={self.tts.tts_audio_queue.qsize()}"
             )
 
+            # 先丢弃流水线中尚未播放的句子，避免清空后又被转发进播放队列
+            self.tts.cancel_pending()
+
             # 使用非阻塞方式清空队列
             for q in [
                 self.tts.tts_text_queue,
@@ -1192,9 +1332,11 @@ class ConnectionHandler:
                     continue
                 while True:
                     try:
-                        q.get_nowait()
+                        item = q.get_nowait()
                     except queue.Empty:
                         break
+                    # 未播放的音频文件要关闭，否则文件句柄和临时文件会残留
+                    close_audio_item(item)
 
             # 重置音频流控器（取消后台任务并清空队列）
             if hasattr(self, "audio_rate_controller") and self.audio_rate_controller:
@@ -1206,16 +1348,17 @@ class ConnectionHandler:
             )
 
     def reset_vad_states(self):
-        self.client_audio_buffer = bytearray()
+        if self.vad_session is not None:
+            self.vad_session.clear_buffer()
         self.client_have_voice = False
         self.client_voice_stop = False
         self.logger.bind(tag=TAG).debug("VAD states reset.")
 
-    def chat_and_close(self, text):
+    async def chat_and_close(self, text):
         """Chat with the user and then close the connection"""
         try:
             # Use the existing chat method
-            self.chat(text)
+            await self.chat(text)
 
             # After chat is complete, close the connection
             self.close_after_chat = True
@@ -7,6 +7,8 @@ async def handleAbortMessage(conn):
     conn.logger.bind(tag=TAG).info("Abort message received")
     # 设置成打断状态，会自动打断llm、tts任务
     conn.client_abort = True
+    # 取消对话任务，立即断开上游LLM请求
+    conn.cancel_chat()
     conn.clear_queues()
     # 打断客户端说话状态
     await conn.websocket.send(
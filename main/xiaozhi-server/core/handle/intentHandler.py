@@ -13,6 +13,8 @@ TAG = __name__
 
 
 async def handle_user_intent(conn, text):
+    # 对话LLM使用未解析的原始文本
+    chat_text = text
     # 预处理输入文本，处理可能的JSON格式
     try:
         if text.strip().startswith('{') and text.strip().endswith('}'):
@@ -35,10 +37,16 @@ async def handle_user_intent(conn, text):
     if conn.intent_type == "function_call":
         # 使用支持function calling的聊天方法,不再进行意图分析
         return False
+    # 意图识别的同时提前请求对话LLM，回复在确认是普通对话前不播放
+    if conn.speculative_chat:
+        conn.start_speculative_chat(chat_text)
     # 使用LLM进行意图分析
     intent_result = await analyze_intent_with_llm(conn, text)
     if not intent_result:
         return False
+    if not is_continue_chat(intent_result):
+        # 识别出其他意图，放弃提前发出的对话请求
+        conn.discard_speculative_chat()
     # 会话开始时生成sentence_id
     conn.sentence_id = str(uuid.uuid4().hex)
     # 处理各种意图
@@ -75,6 +83,15 @@ async def analyze_intent_with_llm(conn, text):
     return None
 
 
+def is_continue_chat(intent_result):
+    """意图识别结果是否会交给普通对话处理，无法解析的结果同样继续对话"""
+    try:
+        intent_data = json.loads(intent_result)
+        return intent_data["function_call"]["name"] == "continue_chat"
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return True
+
+
 async def process_intent_result(conn, intent_result, original_text):
     """处理意图识别结果"""
     try:
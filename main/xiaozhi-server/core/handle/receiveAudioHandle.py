@@ -2,6 +2,7 @@ import time
 import json
 import asyncio
 from core.utils.util import audio_to_data
+from core.utils.turn_trace import current_turn
 from core.handle.abortHandle import handleAbortMessage
 from core.handle.intentHandler import handle_user_intent
 from core.utils.output_counter import check_device_output_limit
@@ -12,7 +13,7 @@ TAG = __name__
 
 async def handleAudioMessage(conn, audio):
     # 当前片段是否有人说话
-    have_voice = conn.vad.is_vad(conn, audio)
+    have_voice = await conn.vad.is_vad_async(conn, audio)
     # 如果设备刚刚被唤醒，短暂忽略VAD检测
     if hasattr(conn, "just_woken_up") and conn.just_woken_up:
         have_voice = False
@@ -79,15 +80,18 @@ async def startToChat(conn, text):
         await handleAbortMessage(conn)
 
     # 首先进行意图分析，使用实际文本内容
-    intent_handled = await handle_user_intent(conn, actual_text)
+    async with current_turn(conn).aspan("intent"):
+        intent_handled = await handle_user_intent(conn, actual_text)
 
     if intent_handled:
         # 如果意图已被处理，不再进行聊天
+        conn.discard_speculative_chat()
         return
 
     # 意图未被处理，继续常规聊天流程，使用实际文本内容
+    # 意图识别期间提前发出的对话请求由chat接着读取
     await send_stt_message(conn, actual_text)
-    conn.executor.submit(conn.chat, actual_text)
+    conn.start_chat(actual_text)
 
 
 async def no_voice_close_connect(conn, have_voice):
@@ -13,6 +13,7 @@ import time
 import opuslib_next
 
 from config.manage_api_client import report as manage_report
+from core.utils.audio_buffer import Utterance
 
 TAG = __name__
 
@@ -55,6 +56,10 @@ def opus_to_wav(conn, opus_data):
     Returns:
         bytes: WAV格式的音频数据
     """
+    if isinstance(opus_data, Utterance):
+        # 识别时已解码并封装过，直接复用
+        return opus_data.to_wav()
+
     decoder = None
     try:
         decoder = opuslib_next.Decoder(16000, 1)  # 16kHz, 单声道
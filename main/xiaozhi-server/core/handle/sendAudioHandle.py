@@ -3,6 +3,7 @@ import time
 import asyncio
 from core.utils import textUtils
 from core.utils.util import audio_to_data
+from core.utils.turn_trace import current_turn
 from core.providers.tts.dto.dto import SentenceType
 from core.utils.audioRateController import AudioRateController
 
@@ -38,11 +39,27 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
     # 发送结束消息（如果是最后一个文本）
     if sentenceType == SentenceType.LAST:
         await send_tts_message(conn, "stop", None)
+        current_turn(conn).finish()
         conn.client_is_speaking = False
         if conn.close_after_chat:
             await conn.close()
 
 
+async def sendAudioFrame(conn, opus_packet, max_pending):
+    """
+    发送音频文件中的一帧，流控队列中待发送的包达到max_pending时先等待，
+    使音频文件按播放进度读取，而不是一次性全部进入队列
+    """
+    rate_controller = getattr(conn, "audio_rate_controller", None)
+    if rate_controller is not None:
+        while not await rate_controller.wait_for_space(max_pending, timeout=0.5):
+            if conn.client_abort or conn.stop_event.is_set():
+                return
+    if conn.client_abort:
+        return
+    await sendAudioMessage(conn, SentenceType.MIDDLE, opus_packet, None)
+
+
 async def _wait_for_audio_completion(conn):
     """
     等待音频队列清空
@@ -224,6 +241,7 @@ async def _do_send_audio(conn, opus_packet, flow_control):
     else:
         # 直接发送opus数据包
         await conn.websocket.send(opus_packet)
+    current_turn(conn).mark("first_audio_sent")
 
     # 更新流控状态
     flow_control["packet_count"] = packet_index + 1
@@ -37,7 +37,7 @@ class ListenTextMessageHandler(TextMessageHandler):
             else:
                 # 非流式模式：直接触发ASR识别
                 if len(conn.asr_audio) > 0:
-                    asr_audio_task = conn.asr_audio.copy()
+                    asr_audio_task = conn.asr_audio.to_utterance(conn.audio_format)
                     conn.asr_audio.clear()
                     conn.reset_vad_states()
 
@@ -1,4 +1,5 @@
 import asyncio
+from typing import Callable, Optional
 from aiohttp import web
 from config.logger import setup_logging
 from core.api.ota_handler import OTAHandler
@@ -8,11 +9,35 @@ TAG = __name__
 
 
 class SimpleHttpServer:
-    def __init__(self, config: dict):
+    def __init__(
+        self,
+        config: dict,
+        health_provider: Optional[Callable[[], dict]] = None,
+        metrics_provider: Optional[Callable[[], str]] = None,
+    ):
+        """
+        Args:
+            config: 配置
+            health_provider: 返回WebSocket服务健康状态的函数，单进程和多进程模式各自提供
+            metrics_provider: 返回Prometheus文本格式指标的函数
+        """
         self.config = config
         self.logger = setup_logging()
         self.ota_handler = OTAHandler(config)
         self.vision_handler = VisionHandler(config)
+        self.health_provider = health_provider
+        self.metrics_provider = metrics_provider
+
+    async def handle_health(self, request):
+        """健康检查接口，多进程模式下返回所有工作进程的汇总状态"""
+        if self.health_provider is None:
+            return web.json_response({"status": "ok"})
+        return web.json_response({"status": "ok", **self.health_provider()})
+
+    async def handle_metrics(self, request):
+        """Prometheus指标接口，导出每轮对话各阶段的耗时直方图"""
+        body = self.metrics_provider() if self.metrics_provider else ""
+        return web.Response(text=body, content_type="text/plain", charset="utf-8")
 
     def _get_websocket_url(self, local_ip: str, port: int) -> str:
         """获取websocket地址
@@ -56,6 +81,8 @@ class SimpleHttpServer:
                     web.get("/mcp/vision/explain", self.vision_handler.handle_get),
                     web.post("/mcp/vision/explain", self.vision_handler.handle_post),
                     web.options("/mcp/vision/explain", self.vision_handler.handle_post),
+                    web.get("/xiaozhi/health", self.handle_health),
+                    web.get("/metrics", self.handle_metrics),
                 ]
             )
 
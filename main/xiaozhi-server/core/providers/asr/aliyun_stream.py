@@ -135,7 +135,7 @@ class ASRProvider(ASRProviderBase):
             conn.asr_audio_for_voiceprint.append(audio)
         
         conn.asr_audio.append(audio)
-        conn.asr_audio = conn.asr_audio[-10:]
+        conn.asr_audio.keep_last(10)
 
         # 只在有声音且没有连接时建立连接（排除正在停止的情况）
         if audio_have_voice and not self.is_processing and not self.asr_ws:
@@ -293,7 +293,7 @@ class ASRProvider(ASRProviderBase):
                 if hasattr(conn, 'asr_audio_for_voiceprint'):
                     conn.asr_audio_for_voiceprint = []
                 if hasattr(conn, 'asr_audio'):
-                    conn.asr_audio = []
+                    conn.asr_audio.clear()
 
     async def _send_stop_request(self):
         """发送停止识别请求（不关闭连接）"""
@@ -1,5 +1,4 @@
 import os
-import io
 import wave
 import uuid
 import json
@@ -15,13 +14,41 @@ from typing import Optional, Tuple, List
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
+from core.utils.audio_buffer import Utterance
+from core.utils.turn_trace import start_turn
 from core.handle.receiveAudioHandle import handleAudioMessage
 
 TAG = __name__
 logger = setup_logging()
 
 
+# 每个Opus音频包的时长（毫秒）
+PACKET_DURATION_MS = 60
+
+
+class IncrementalRecognition:
+    """边说边识别的中间状态（每个连接一份）
+
+    说话过程中，每当未识别的音频超过分段时长并遇到短暂停顿，就把这一段提前送去识别，
+    说话结束时只需识别最后一段尾音，再与之前各段的结果拼接。
+    """
+
+    def __init__(self, generation: int):
+        self.generation = generation
+        self.cut_index = 0  # 已送识别的音频包位置
+        self.segments: List[asyncio.Task] = []
+
+    def cancel(self):
+        for task in self.segments:
+            task.cancel()
+        self.segments.clear()
+
+
 class ASRProviderBase(ABC):
+    # 边说边识别，仅本地非流式ASR支持，由子类根据配置开启
+    incremental_enabled = False
+    incremental_segment_ms = 3000
+
     def __init__(self):
         pass
 
@@ -52,48 +79,127 @@ class ASRProviderBase(ABC):
 
     # 接收音频
     async def receive_audio(self, conn, audio, audio_have_voice):
+        # VAD检测时已经解码过的PCM随音频包一起缓存，语音结束后不再重复解码
+        pcm_frame = conn.vad.pop_decoded_pcm(conn) if conn.vad else None
         if conn.client_listen_mode == "manual":
             # 手动模式：缓存音频用于ASR识别
-            conn.asr_audio.append(audio)
+            conn.asr_audio.append(audio, pcm_frame)
         else:
             # 自动/实时模式：使用VAD检测
             have_voice = audio_have_voice
 
-            conn.asr_audio.append(audio)
+            conn.asr_audio.append(audio, pcm_frame)
             if not have_voice and not conn.client_have_voice:
-                conn.asr_audio = conn.asr_audio[-10:]
+                conn.asr_audio.keep_last(10)
                 return
 
             # 自动模式下通过VAD检测到语音停止时触发识别
             if conn.client_voice_stop:
-                asr_audio_task = conn.asr_audio.copy()
+                incremental = self._take_incremental(conn)
+                asr_audio_task = conn.asr_audio.to_utterance(conn.audio_format)
+                asr_audio_task.incremental = incremental
                 conn.asr_audio.clear()
                 conn.reset_vad_states()
 
                 if len(asr_audio_task) > 15:
                     await self.handle_voice_stop(conn, asr_audio_task)
+                elif incremental is not None:
+                    incremental.cancel()
+            elif self.incremental_enabled:
+                self._feed_incremental(conn)
+
+    def _take_incremental(self, conn) -> Optional[IncrementalRecognition]:
+        """取出当前连接边说边识别的状态，音频缓冲区被清空过的旧状态直接丢弃"""
+        incremental = conn.asr_incremental
+        conn.asr_incremental = None
+        if incremental is None:
+            return None
+        if incremental.generation != conn.asr_audio.generation:
+            incremental.cancel()
+            return None
+        return incremental
+
+    def _feed_incremental(self, conn):
+        """说话过程中遇到停顿且积累的音频足够长时，提前识别这一段"""
+        incremental = conn.asr_incremental
+        if incremental is None or incremental.generation != conn.asr_audio.generation:
+            if incremental is not None:
+                incremental.cancel()
+            incremental = IncrementalRecognition(conn.asr_audio.generation)
+            conn.asr_incremental = incremental
+
+        if conn.last_is_voice or conn.audio_format == "pcm":
+            return
+        pending = len(conn.asr_audio) - incremental.cut_index
+        if pending * PACKET_DURATION_MS < self.incremental_segment_ms:
+            return
+
+        segment = conn.asr_audio.to_utterance(start=incremental.cut_index)
+        incremental.cut_index = len(conn.asr_audio)
+        incremental.segments.append(
+            asyncio.create_task(
+                self.speech_to_text(segment, conn.session_id, conn.audio_format)
+            )
+        )
+
+    async def _recognize_utterance(
+        self, conn, asr_audio_task
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """识别整句话，边说边识别时只需识别尾段，再合并前面已完成的分段结果"""
+        incremental = getattr(asr_audio_task, "incremental", None)
+        if incremental is None or not incremental.segments:
+            return await self.speech_to_text(
+                asr_audio_task, conn.session_id, conn.audio_format
+            )
+
+        tail = asr_audio_task.tail(incremental.cut_index)
+        tail_task = self.speech_to_text(tail, conn.session_id, conn.audio_format)
+        results = await asyncio.gather(*incremental.segments, tail_task)
+        texts = [text for text, _ in results if text]
+        logger.bind(tag=TAG).debug(f"边说边识别分段数: {len(results)}")
+        return self._join_segment_texts(texts), results[-1][1]
+
+    @staticmethod
+    def _join_segment_texts(texts: List[str]) -> str:
+        """拼接分段识别结果，相邻两段都是字母或数字结尾/开头时补空格"""
+        joined = ""
+        for text in texts:
+            text = text.strip()
+            if not text:
+                continue
+            if (
+                joined
+                and joined[-1].isascii()
+                and joined[-1].isalnum()
+                and text[0].isascii()
+                and text[0].isalnum()
+            ):
+                joined += " "
+            joined += text
+        return joined
 
     # 处理语音停止
     async def handle_voice_stop(self, conn, asr_audio_task: List[bytes]):
         """并行处理ASR和声纹识别"""
         try:
             total_start_time = time.monotonic()
+            # 说话结束，开始记录本轮各阶段耗时
+            trace = start_turn(conn, total_start_time)
 
-            # 准备音频数据
-            if conn.audio_format == "pcm":
-                pcm_data = asr_audio_task
-            else:
-                pcm_data = self.decode_opus(asr_audio_task)
-
-            combined_pcm_data = b"".join(pcm_data)
+            # 整句音频只解码一次，ASR、声纹和上报共用
+            asr_audio_task = Utterance.wrap(asr_audio_task, conn.audio_format)
 
             # 预先准备WAV数据
             wav_data = None
-            if conn.voiceprint_provider and combined_pcm_data:
-                wav_data = self._pcm_to_wav(combined_pcm_data)
+            if conn.voiceprint_provider and asr_audio_task.pcm:
+                wav_data = asr_audio_task.to_wav()
 
             # 定义ASR任务
-            asr_task = self.speech_to_text(asr_audio_task, conn.session_id, conn.audio_format)
+            async def asr_task_traced():
+                async with trace.aspan("asr"):
+                    return await self._recognize_utterance(conn, asr_audio_task)
+
+            asr_task = asr_task_traced()
 
             if conn.voiceprint_provider and wav_data:
                 voiceprint_task = conn.voiceprint_provider.identify_speaker(wav_data, conn.session_id)
@@ -138,6 +244,9 @@ class ASRProviderBase(ABC):
                 # 使用自定义模块进行上报
                 await startToChat(conn, enhanced_text)
                 enqueue_asr_report(conn, enhanced_text, asr_audio_task)
+            else:
+                # 没有识别到文字，本轮不会有回复
+                trace.finish(completed=False)
                 
         except Exception as e:
             logger.bind(tag=TAG).error(f"处理语音停止失败: {e}")
@@ -154,36 +263,16 @@ class ASRProviderBase(ABC):
         else:
             return text
 
-    def _pcm_to_wav(self, pcm_data: bytes) -> bytes:
-        """将PCM数据转换为WAV格式"""
-        if len(pcm_data) == 0:
-            logger.bind(tag=TAG).warning("PCM数据为空，无法转换WAV")
-            return b""
-        
-        # 确保数据长度是偶数（16位音频）
-        if len(pcm_data) % 2 != 0:
-            pcm_data = pcm_data[:-1]
-        
-        # 创建WAV文件头
-        wav_buffer = io.BytesIO()
-        try:
-            with wave.open(wav_buffer, 'wb') as wav_file:
-                wav_file.setnchannels(1)      # 单声道
-                wav_file.setsampwidth(2)      # 16位
-                wav_file.setframerate(16000)  # 16kHz采样率
-                wav_file.writeframes(pcm_data)
-            
-            wav_buffer.seek(0)
-            wav_data = wav_buffer.read()
-            
-            return wav_data
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"WAV转换失败: {e}")
-            return b""
-
     def stop_ws_connection(self):
         pass
 
+    def close(self):
+        """释放所有连接共享的本地推理资源（批处理线程、推理子进程等），配置更新替换ASR实例时调用
+
+        流式ASR每个连接各有实例，连接级资源由子类的异步close清理
+        """
+        pass
+
     def save_audio_to_file(self, pcm_data: List[bytes], session_id: str) -> str:
         """PCM数据保存为WAV文件"""
         module_name = __name__.split(".")[-1]
@@ -208,6 +297,9 @@ class ASRProviderBase(ABC):
     @staticmethod
     def decode_opus(opus_data: List[bytes]) -> List[bytes]:
         """将Opus音频数据解码为PCM数据"""
+        if isinstance(opus_data, Utterance):
+            # 接收时已解码，直接复用
+            return opus_data.pcm_frames
         decoder = None
         try:
             decoder = opuslib_next.Decoder(16000, 1)
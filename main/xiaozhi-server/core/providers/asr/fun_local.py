@@ -2,9 +2,9 @@ import os
 import io
 import sys
 import time
+import asyncio
 import shutil
 import psutil
-import asyncio
 
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
@@ -12,6 +12,7 @@ from funasr import AutoModel
 from funasr.utils.postprocess_utils import rich_transcription_postprocess
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.micro_batcher import MicroBatcher
 
 TAG = __name__
 logger = setup_logging()
@@ -51,6 +52,9 @@ class ASRProvider(ASRProviderBase):
         self.model_dir = config.get("model_dir")
         self.output_dir = config.get("output_dir")  # 修正配置键名
         self.delete_audio_file = delete_audio_file
+        # 边说边识别：说话过程中按停顿分段提前识别，结束时只识别尾段
+        self.incremental_enabled = str(config.get("incremental", False)).lower() in ("true", "1", "yes")
+        self.incremental_segment_ms = int(config.get("incremental_segment_ms") or 3000)
 
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
@@ -63,6 +67,34 @@ class ASRProvider(ASRProviderBase):
                 # device="cuda:0",  # 启用GPU加速
             )
 
+        # 所有连接共享一个模型，短时间内到达的多条语音合并为一次generate调用
+        self.batcher = MicroBatcher(
+            self._generate_batch,
+            max_batch_size=int(config.get("batch_max_size") or 8),
+            max_wait_ms=int(config.get("batch_max_wait_ms") or 10),
+            name="funasr-batch",
+        )
+
+    def close(self):
+        """停止批处理线程，仍在使用本实例的连接改为在线程池中逐条识别"""
+        batcher, self.batcher = self.batcher, None
+        if batcher is not None:
+            batcher.close()
+
+    def _generate_batch(self, batch: List[bytes]) -> List[str]:
+        """批量识别多段PCM音频，运行在批处理线程中"""
+        results = self.model.generate(
+            input=batch,
+            cache={},
+            language="auto",
+            use_itn=True,
+            # batch_size_s是启用VAD切分时按音频总时长（秒）动态组批的上限，保持原值；
+            # 未启用VAD时generate按batch_size（条数）组批，默认为1，这里设为本批条数才能一次前向推理
+            batch_size_s=60,
+            batch_size=len(batch),
+        )
+        return [rich_transcription_postprocess(result["text"]) for result in results]
+
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, audio_format="opus"
     ) -> Tuple[Optional[str], Optional[str]]:
@@ -79,6 +111,9 @@ class ASRProvider(ASRProviderBase):
                     pcm_data = self.decode_opus(opus_data)
 
                 combined_pcm_data = b"".join(pcm_data)
+                if not combined_pcm_data:
+                    # 空音频不进入批次，避免拖累同批的其他请求
+                    return "", file_path
 
                 # 检查磁盘空间
                 if not self.delete_audio_file:
@@ -92,17 +127,16 @@ class ASRProvider(ASRProviderBase):
                 else:
                     file_path = self.save_audio_to_file(pcm_data, session_id)
 
-                # 语音识别 - 使用线程池避免阻塞事件循环
+                # 语音识别 - 交给批处理线程，与其他连接的语音合并推理，避免阻塞事件循环
                 start_time = time.time()
-                result = await asyncio.to_thread(
-                    self.model.generate,
-                    input=combined_pcm_data,
-                    cache={},
-                    language="auto",
-                    use_itn=True,
-                    batch_size_s=60,
-                )
-                text = await asyncio.to_thread(rich_transcription_postprocess, result[0]["text"])
+                batcher = self.batcher
+                if batcher is not None:
+                    text = await batcher.submit(combined_pcm_data)
+                else:
+                    texts = await asyncio.get_running_loop().run_in_executor(
+                        None, self._generate_batch, [combined_pcm_data]
+                    )
+                    text = texts[0]
                 logger.bind(tag=TAG).debug(
                     f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
                 )
@@ -3,10 +3,12 @@ import wave
 import os
 import sys
 import io
+import asyncio
 from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.providers.asr.dto.dto import InterfaceType
 from core.providers.asr.base import ASRProviderBase
+from core.utils.micro_batcher import MicroBatcher
 
 import numpy as np
 import sherpa_onnx
@@ -42,6 +44,9 @@ class ASRProvider(ASRProviderBase):
         self.output_dir = config.get("output_dir")
         self.model_type = config.get("model_type", "sense_voice")  # 支持 paraformer
         self.delete_audio_file = delete_audio_file
+        # 边说边识别：说话过程中按停顿分段提前识别，结束时只识别尾段
+        self.incremental_enabled = str(config.get("incremental", False)).lower() in ("true", "1", "yes")
+        self.incremental_segment_ms = int(config.get("incremental_segment_ms") or 3000)
 
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
@@ -96,6 +101,37 @@ class ASRProvider(ASRProviderBase):
                     use_itn=True,
                 )
 
+        # 解码在独立线程中进行，多个连接同时到达的语音合并为一次decode_streams
+        self.batcher = MicroBatcher(
+            self._decode_batch,
+            max_batch_size=int(config.get("batch_max_size") or 8),
+            max_wait_ms=int(config.get("batch_max_wait_ms") or 10),
+            name="sherpa-asr-batch",
+        )
+
+    def close(self):
+        """停止批处理线程，仍在使用本实例的连接改为在线程池中逐条识别"""
+        batcher, self.batcher = self.batcher, None
+        if batcher is not None:
+            batcher.close()
+
+    def _decode_batch(self, batch: List[np.ndarray]) -> List[str]:
+        """批量解码多段音频，运行在批处理线程中"""
+        streams = []
+        for samples in batch:
+            s = self.model.create_stream()
+            s.accept_waveform(16000, samples)
+            streams.append(s)
+        self.model.decode_streams(streams)
+        return [s.result.text for s in streams]
+
+    @staticmethod
+    def pcm_to_samples(pcm_data: bytes) -> np.ndarray:
+        """16位PCM直接转换为[-1, 1]范围的float32数组"""
+        samples = np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32)
+        samples *= 1.0 / 32768
+        return samples
+
     def read_wave(self, wave_filename: str) -> Tuple[np.ndarray, int]:
         """
         Args:
@@ -126,24 +162,26 @@ class ASRProvider(ASRProviderBase):
         """语音转文本主处理逻辑"""
         file_path = None
         try:
-            # 保存音频文件
-            start_time = time.time()
             if audio_format == "pcm":
                 pcm_data = opus_data
             else:
                 pcm_data = self.decode_opus(opus_data)
-            file_path = self.save_audio_to_file(pcm_data, session_id)
-            logger.bind(tag=TAG).debug(
-                f"音频文件保存耗时: {time.time() - start_time:.3f}s | 路径: {file_path}"
-            )
+
+            # 需要保留音频时才写文件，识别直接使用内存中的数据
+            if not self.delete_audio_file:
+                file_path = self.save_audio_to_file(pcm_data, session_id)
 
             # 语音识别
             start_time = time.time()
-            s = self.model.create_stream()
-            samples, sample_rate = self.read_wave(file_path)
-            s.accept_waveform(sample_rate, samples)
-            self.model.decode_stream(s)
-            text = s.result.text
+            samples = self.pcm_to_samples(b"".join(pcm_data))
+            batcher = self.batcher
+            if batcher is not None:
+                text = await batcher.submit(samples)
+            else:
+                texts = await asyncio.get_running_loop().run_in_executor(
+                    None, self._decode_batch, [samples]
+                )
+                text = texts[0]
             logger.bind(tag=TAG).debug(
                 f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
             )
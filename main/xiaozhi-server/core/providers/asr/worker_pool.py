@@ -0,0 +1,243 @@
+"""
+本地ASR多进程推理池
+本地模型推理放到N个子进程中执行，每个子进程只加载一次模型，
+PCM数据通过共享内存传递，识别结果通过队列返回，避免与WebSocket主循环争抢GIL
+"""
+
+import os
+import time
+import uuid
+import queue
+import asyncio
+import threading
+import concurrent.futures
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Optional, Tuple, List
+from config.logger import setup_logging
+from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.dto.dto import InterfaceType
+
+TAG = __name__
+logger = setup_logging()
+
+# 支持放入推理池的本地ASR类型
+POOLABLE_ASR_TYPES = ("fun_local", "sherpa_onnx_local", "vosk")
+# 检查子进程存活的间隔（秒）
+WORKER_CHECK_INTERVAL = 1
+
+
+def _worker_main(asr_type, asr_config, delete_audio_file, request_queue, result_queue):
+    """子进程入口：加载一次模型，循环处理识别请求"""
+    from core.utils import asr
+
+    provider = asr.create_instance(asr_type, asr_config, delete_audio_file)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    pid = os.getpid()
+    result_queue.put(("ready", pid, None, None))
+
+    while True:
+        request = request_queue.get()
+        if request is None:
+            break
+        request_id, shm_name, size, session_id = request
+        # 告知主进程该请求由哪个子进程处理，子进程退出时主进程据此立即让请求失败
+        result_queue.put(("taken", pid, request_id, None))
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+            try:
+                pcm_data = bytes(shm.buf[:size])
+            finally:
+                shm.close()
+            text, _ = loop.run_until_complete(
+                provider.speech_to_text([pcm_data], session_id, "pcm")
+            )
+            result_queue.put(("result", pid, request_id, (text, None)))
+        except Exception as e:
+            result_queue.put(("result", pid, request_id, (None, str(e))))
+    loop.close()
+
+
+class ASRWorkerPool:
+    """ASR子进程池：所有子进程共享一个请求队列，空闲的子进程自动领取请求"""
+
+    def __init__(self, asr_type: str, asr_config: dict, delete_audio_file: bool, workers: int):
+        self.asr_type = asr_type
+        self.asr_config = asr_config
+        self.delete_audio_file = delete_audio_file
+        self.workers = workers
+        # torch、onnxruntime等不支持fork后继续使用，子进程统一用spawn启动
+        self._ctx = multiprocessing.get_context("spawn")
+        self._request_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+        self._pending = {}
+        # 子进程pid -> 正在处理的请求ID
+        self._running = {}
+        self._lock = threading.Lock()
+        self._processes = []
+        self._closed = False
+        for _ in range(workers):
+            self._processes.append(self._spawn())
+        self._reader = threading.Thread(
+            target=self._read_results, name="asr-pool-reader", daemon=True
+        )
+        self._reader.start()
+
+    def _spawn(self):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                self.asr_type,
+                self.asr_config,
+                self.delete_audio_file,
+                self._request_queue,
+                self._result_queue,
+            ),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _read_results(self):
+        last_check = time.monotonic()
+        while True:
+            if self._closed and not self._has_pending():
+                break
+            try:
+                kind, pid, request_id, payload = self._result_queue.get(
+                    timeout=WORKER_CHECK_INTERVAL
+                )
+            except queue.Empty:
+                kind = None
+            except (EOFError, OSError):
+                break
+            if kind == "ready":
+                logger.bind(tag=TAG).info(f"ASR推理子进程已就绪: pid={pid}")
+            elif kind == "taken":
+                with self._lock:
+                    self._running[pid] = request_id
+            elif kind == "result":
+                with self._lock:
+                    if self._running.get(pid) == request_id:
+                        del self._running[pid]
+                    future = self._pending.pop(request_id, None)
+                text, error = payload
+                if future is not None and not future.done():
+                    if error is not None:
+                        future.set_exception(RuntimeError(error))
+                    else:
+                        future.set_result(text)
+
+            # 繁忙时队列一直有结果，按时间间隔检查子进程
+            if time.monotonic() - last_check >= WORKER_CHECK_INTERVAL:
+                last_check = time.monotonic()
+                self._check_workers()
+        self._fail_pending("ASR推理池已关闭")
+
+    def _has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def _check_workers(self):
+        """让退出的子进程正在处理的请求立即失败，并重启子进程"""
+        alive = 0
+        for i, process in enumerate(self._processes):
+            if process.is_alive():
+                alive += 1
+                continue
+            with self._lock:
+                request_id = self._running.pop(process.pid, None)
+                future = self._pending.pop(request_id, None) if request_id else None
+            if future is not None and not future.done():
+                future.set_exception(
+                    RuntimeError(f"ASR推理子进程异常退出: exitcode={process.exitcode}")
+                )
+            if self._closed:
+                continue
+            logger.bind(tag=TAG).error(
+                f"ASR推理子进程异常退出: pid={process.pid}, exitcode={process.exitcode}，正在重启"
+            )
+            self._processes[i] = self._spawn()
+            alive += 1
+        if alive == 0:
+            # 关闭后子进程都已退出，剩下的请求不会再有结果
+            self._fail_pending("ASR推理池已关闭")
+
+    def _fail_pending(self, reason: str):
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._running.clear()
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError(reason))
+
+    def submit(self, pcm_data: bytes, session_id: str) -> concurrent.futures.Future:
+        """提交一段PCM，返回识别文本的Future"""
+        future = concurrent.futures.Future()
+        if self._closed:
+            future.set_exception(RuntimeError("ASR推理池已关闭"))
+            return future
+        request_id = uuid.uuid4().hex
+        shm = shared_memory.SharedMemory(create=True, size=len(pcm_data))
+        shm.buf[: len(pcm_data)] = pcm_data
+
+        def release_shm(_):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(release_shm)
+        with self._lock:
+            self._pending[request_id] = future
+        self._request_queue.put((request_id, shm.name, len(pcm_data), session_id))
+        return future
+
+    def close(self):
+        """停止接收新请求，子进程处理完已排队的请求后退出，共享内存随请求结束释放"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._processes:
+            self._request_queue.put(None)
+
+
+class PooledASRProvider(ASRProviderBase):
+    """本地ASR的代理：音频在主进程解码拼接后，交给子进程池识别"""
+
+    def __init__(self, asr_type: str, config: dict, delete_audio_file: bool, workers: int):
+        super().__init__()
+        self.interface_type = InterfaceType.LOCAL
+        self.asr_type = asr_type
+        self.output_dir = config.get("output_dir", "tmp/")
+        self.delete_audio_file = delete_audio_file
+        self.timeout = int(config.get("worker_timeout") or 60)
+        self.incremental_enabled = str(config.get("incremental", False)).lower() in ("true", "1", "yes")
+        self.incremental_segment_ms = int(config.get("incremental_segment_ms") or 3000)
+        self.pool = ASRWorkerPool(asr_type, config, delete_audio_file, workers)
+        logger.bind(tag=TAG).info(f"ASR推理池已启动: {asr_type} x {workers}")
+
+    async def speech_to_text(
+        self, opus_data: List[bytes], session_id: str, audio_format="opus"
+    ) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            if audio_format == "pcm":
+                pcm_data = opus_data
+            else:
+                pcm_data = self.decode_opus(opus_data)
+            combined_pcm_data = b"".join(pcm_data)
+            if not combined_pcm_data:
+                return "", None
+
+            future = self.pool.submit(combined_pcm_data, session_id)
+            text = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            return text or "", None
+        except asyncio.TimeoutError:
+            logger.bind(tag=TAG).error(f"ASR推理池识别超时: {self.asr_type}")
+            return "", None
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"ASR推理池识别失败: {e}")
+            return "", None
+
+    def close(self):
+        self.pool.close()
@@ -4,8 +4,8 @@ from plugins_func.functions.play_music import initialize_music_handler
 from config.logger import setup_logging
 import re
 import json
-import hashlib
 import time
+from core.utils.cache.intent_cache import get_intent_cache, tools_fingerprint
 
 TAG = __name__
 logger = setup_logging()
@@ -16,11 +16,8 @@ class IntentProvider(IntentProviderBase):
         super().__init__(config)
         self.llm = None
         self.promot = ""
-        # 导入全局缓存管理器
-        from core.utils.cache.manager import cache_manager, CacheType
-
-        self.cache_manager = cache_manager
-        self.CacheType = CacheType
+        # 所有设备共享的意图缓存
+        self.intent_cache = get_intent_cache(config.get("intent_cache"))
         self.history_count = 4  # 默认使用最近4条对话记录
 
     def get_intent_system_prompt(self, functions_list: str) -> str:
@@ -135,18 +132,6 @@ class IntentProvider(IntentProviderBase):
         model_info = getattr(self.llm, "model_name", str(self.llm.__class__.__name__))
         logger.bind(tag=TAG).debug(f"使用意图识别模型: {model_info}")
 
-        # 计算缓存键
-        cache_key = hashlib.md5((conn.device_id + text).encode()).hexdigest()
-
-        # 检查缓存
-        cached_intent = self.cache_manager.get(self.CacheType.INTENT, cache_key)
-        if cached_intent is not None:
-            cache_time = time.time() - total_start_time
-            logger.bind(tag=TAG).debug(
-                f"使用缓存的意图: {cache_key} -> {cached_intent}, 耗时: {cache_time:.4f}秒"
-            )
-            return cached_intent
-
         if self.promot == "":
             functions = conn.func_handler.get_functions()
             if hasattr(conn, "mcp_client"):
@@ -173,6 +158,16 @@ class IntentProvider(IntentProviderBase):
                 hass_prompt += device + "\n"
             prompt_music += hass_prompt
 
+        # 检查缓存，工具集相同的设备共享
+        fingerprint = tools_fingerprint(prompt_music)
+        cached_intent = self.intent_cache.get(text, fingerprint)
+        if cached_intent is not None:
+            cache_time = time.time() - total_start_time
+            logger.bind(tag=TAG).debug(
+                f"使用缓存的意图: {text} -> {cached_intent}, 耗时: {cache_time:.4f}秒"
+            )
+            return cached_intent
+
         logger.bind(tag=TAG).debug(f"User prompt: {prompt_music}")
 
         # 构建用户对话历史的提示
@@ -256,7 +251,7 @@ class IntentProvider(IntentProviderBase):
                     logger.bind(tag=TAG).info(f"检测到函数调用意图: {function_name}")
 
             # 统一缓存处理和返回
-            self.cache_manager.set(self.CacheType.INTENT, cache_key, intent)
+            self.intent_cache.put(text, fingerprint, intent)
             postprocess_time = time.time() - postprocess_start_time
             logger.bind(tag=TAG).debug(f"意图后处理耗时: {postprocess_time:.4f}秒")
             return intent
@@ -1,9 +1,37 @@
+import asyncio
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 
 TAG = __name__
 logger = setup_logging()
 
+_DONE = object()
+
+
+async def iterate_in_thread(generator):
+    """在线程池中逐个读取同步生成器，供未实现原生异步接口的LLM使用
+
+    被取消时，等线程里正在进行的读取结束后再关闭生成器，由生成器自己关闭上游请求。
+    """
+    loop = asyncio.get_running_loop()
+    pending = None
+    try:
+        while True:
+            pending = loop.run_in_executor(None, next, generator, _DONE)
+            # 任务被取消时不取消线程里的读取，由finally在读取结束后关闭生成器
+            item = await asyncio.shield(pending)
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        if pending is not None and not pending.done():
+            pending.add_done_callback(
+                lambda _: loop.run_in_executor(None, generator.close)
+            )
+        else:
+            generator.close()
+
+
 class LLMProviderBase(ABC):
     @abstractmethod
     def response(self, session_id, dialogue):
@@ -25,7 +53,7 @@ class LLMProviderBase(ABC):
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in Ollama response generation: {e}")
             return "【LLM服务响应异常】"
-    
+
     def response_with_functions(self, session_id, dialogue, functions=None):
         """
         Default implementation for function calling (streaming)
@@ -37,3 +65,20 @@ class LLMProviderBase(ABC):
         for token in self.response(session_id, dialogue):
             yield token, None
 
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        """异步流式接口，与response的输出相同
+
+        默认在线程池中运行同步的response，支持异步请求的LLM应重写此方法，
+        读取上游时不占用线程，取消任务时立即断开上游请求。
+        """
+        async for token in iterate_in_thread(
+            self.response(session_id, dialogue, **kwargs)
+        ):
+            yield token
+
+    async def aresponse_with_functions(self, session_id, dialogue, functions=None):
+        """异步流式接口，与response_with_functions的输出相同"""
+        async for item in iterate_in_thread(
+            self.response_with_functions(session_id, dialogue, functions=functions)
+        ):
+            yield item
@@ -0,0 +1,107 @@
+"""
+LLM异步客户端池
+原来每个LLM实例各自创建同步的OpenAI客户端，流式请求在线程池里阻塞读取。
+这里按事件循环共享一个httpx连接池，同一服务地址、密钥的AsyncOpenAI客户端只创建一次，
+所有连接的流式请求复用已建立的TLS连接，读取时不占用线程。
+事件循环关闭时（asyncio.run退出前会取消所有任务）随之关闭该循环的连接池。
+"""
+
+import asyncio
+import weakref
+import httpx
+import openai
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# 每个事件循环的最大并发连接数和保持的空闲连接数
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE_CONNECTIONS = 50
+# 空闲连接保持时间（秒）
+KEEPALIVE_EXPIRY = 60
+# 每个事件循环最多缓存的AsyncOpenAI客户端数（不同服务地址、密钥、超时的组合），超出时淘汰最久未使用的
+MAX_OPENAI_CLIENTS = 32
+
+
+class _LoopClients:
+    """一个事件循环共享的httpx客户端，以及基于它创建的AsyncOpenAI客户端"""
+
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(300),
+        )
+        self.openai: "OrderedDict[Tuple[str, str, float], openai.AsyncOpenAI]" = (
+            OrderedDict()
+        )
+        # 等待事件循环关闭的任务，持有强引用避免被回收
+        self.closer: Optional[asyncio.Task] = None
+
+    async def close(self):
+        # AsyncOpenAI客户端没有自己的连接，关闭共享的httpx客户端即可
+        self.openai.clear()
+        await self.http.aclose()
+
+
+# httpx客户端绑定创建它的事件循环，按循环分别缓存；循环关闭前由_close_on_shutdown删除记录，
+# 未取消任务就直接关闭的循环在下次创建客户端时清理
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClients]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+async def _close_on_shutdown(clients: _LoopClients):
+    """一直等待到所在事件循环关闭前被取消，然后关闭该循环的客户端"""
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        loop = asyncio.get_running_loop()
+        if _loop_clients.get(loop) is clients:
+            del _loop_clients[loop]
+        await clients.close()
+
+
+def _get_loop_clients() -> _LoopClients:
+    loop = asyncio.get_running_loop()
+    clients = _loop_clients.get(loop)
+    if clients is not None and not clients.http.is_closed:
+        return clients
+    if clients is not None:
+        # httpx客户端已被关闭，旧的AsyncOpenAI不再使用
+        clients.closer.cancel()
+    # 没有取消任务就直接关闭的事件循环，其客户端已无法使用，不再保留
+    for closed_loop in [l for l in _loop_clients if l.is_closed()]:
+        del _loop_clients[closed_loop]
+    clients = _LoopClients()
+    clients.closer = loop.create_task(_close_on_shutdown(clients))
+    _loop_clients[loop] = clients
+    return clients
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的httpx客户端，必须在协程中调用"""
+    return _get_loop_clients().http
+
+
+def get_async_openai(base_url: str, api_key: str, timeout: float = 300) -> openai.AsyncOpenAI:
+    """获取共享连接池的AsyncOpenAI客户端，必须在协程中调用"""
+    clients = _get_loop_clients()
+    key = (base_url, api_key, timeout)
+    client = clients.openai.get(key)
+    if client is not None:
+        clients.openai.move_to_end(key)
+        return client
+    client = openai.AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=httpx.Timeout(timeout),
+        http_client=clients.http,
+    )
+    clients.openai[key] = client
+    while len(clients.openai) > MAX_OPENAI_CLIENTS:
+        # 被淘汰的客户端不能调用close，否则会关闭共享的httpx客户端
+        clients.openai.popitem(last=False)
+    return client
@@ -2,11 +2,14 @@ import json
 from config.logger import setup_logging
 import requests
 from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.client_pool import get_http_client
 from core.utils.util import check_model_key
 
 TAG = __name__
 logger = setup_logging()
 
+_DONE = object()
+
 
 class LLMProvider(LLMProviderBase):
     def __init__(self, config):
@@ -18,50 +21,79 @@ class LLMProvider(LLMProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
 
-    def response(self, session_id, dialogue, **kwargs):
+    def _build_request(self, session_id, dialogue):
+        # 取最后一条用户消息
+        last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
+        return {
+            "stream": True,
+            "chatId": session_id,
+            "detail": self.detail,
+            "variables": self.variables,
+            "messages": [{"role": "user", "content": last_msg["content"]}],
+        }
+
+    @staticmethod
+    def _parse_line(line):
+        """解析一行SSE数据，返回要输出的文本；流结束返回_DONE，没有内容返回None"""
+        if not line:
+            return None
         try:
-            # 取最后一条用户消息
-            last_msg = next(m for m in reversed(dialogue) if m["role"] == "user")
+            if line.startswith(b"data: "):
+                if line[6:].decode("utf-8") == "[DONE]":
+                    return _DONE
+
+                data = json.loads(line[6:])
+                if "choices" in data and len(data["choices"]) > 0:
+                    delta = data["choices"][0].get("delta", {})
+                    if delta and "content" in delta and delta["content"] is not None:
+                        content = delta["content"]
+                        if "<think>" in content:
+                            return None
+                        if "</think>" in content:
+                            return None
+                        return content
+
+        except json.JSONDecodeError as e:
+            return None
+        except Exception as e:
+            return None
+        return None
 
+    def response(self, session_id, dialogue, **kwargs):
+        try:
             # 发起流式请求
             with requests.post(
                 f"{self.base_url}/chat/completions",
                 headers={"Authorization": f"Bearer {self.api_key}"},
-                json={
-                    "stream": True,
-                    "chatId": session_id,
-                    "detail": self.detail,
-                    "variables": self.variables,
-                    "messages": [{"role": "user", "content": last_msg["content"]}],
-                },
+                json=self._build_request(session_id, dialogue),
                 stream=True,
             ) as r:
                 for line in r.iter_lines():
-                    if line:
-                        try:
-                            if line.startswith(b"data: "):
-                                if line[6:].decode("utf-8") == "[DONE]":
-                                    break
+                    content = self._parse_line(line)
+                    if content is _DONE:
+                        break
+                    if content:
+                        yield content
 
-                                data = json.loads(line[6:])
-                                if "choices" in data and len(data["choices"]) > 0:
-                                    delta = data["choices"][0].get("delta", {})
-                                    if (
-                                        delta
-                                        and "content" in delta
-                                        and delta["content"] is not None
-                                    ):
-                                        content = delta["content"]
-                                        if "<think>" in content:
-                                            continue
-                                        if "</think>" in content:
-                                            continue
-                                        yield content
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+            yield "【服务响应异常】"
 
-                        except json.JSONDecodeError as e:
-                            continue
-                        except Exception as e:
-                            continue
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        try:
+            # 发起流式请求，退出时连接归还共享连接池
+            async with get_http_client().stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json=self._build_request(session_id, dialogue),
+            ) as r:
+                async for line in r.aiter_lines():
+                    content = self._parse_line(line.encode("utf-8"))
+                    if content is _DONE:
+                        break
+                    if content:
+                        yield content
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
@@ -71,3 +103,10 @@ class LLMProvider(LLMProviderBase):
         logger.bind(tag=TAG).error(
             f"fastgpt暂未实现完整的工具调用（function call），建议使用其他意图识别"
         )
+
+    async def aresponse_with_functions(self, session_id, dialogue, functions=None):
+        logger.bind(tag=TAG).error(
+            f"fastgpt暂未实现完整的工具调用（function call），建议使用其他意图识别"
+        )
+        return
+        yield
@@ -125,7 +125,16 @@ class LLMProvider(LLMProviderBase):
     def response_with_functions(self, session_id, dialogue, functions=None):
         yield from self._generate(dialogue, self._build_tools(functions))
 
-    def _generate(self, dialogue, tools):
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        async for item in self._agenerate(dialogue, None):
+            yield item
+
+    async def aresponse_with_functions(self, session_id, dialogue, functions=None):
+        async for item in self._agenerate(dialogue, self._build_tools(functions)):
+            yield item
+
+    @staticmethod
+    def _build_contents(dialogue):
         role_map = {"assistant": "model", "user": "user"}
         contents: list = []
         # 拼接对话
@@ -164,23 +173,30 @@ class LLMProvider(LLMProviderBase):
                     "parts": [{"text": str(m.get("content", ""))}],
                 }
             )
+        return contents
 
-        stream: GenerateContentResponse = self.model.generate_content(
-            contents=contents,
+    def _request_kwargs(self, dialogue, tools):
+        return dict(
+            contents=self._build_contents(dialogue),
             generation_config=self.gen_cfg,
             tools=tools,
             stream=True,
-            timeout=self.timeout,
+            request_options={"timeout": self.timeout},
         )
 
-        try:
-            for chunk in stream:
-                cand = chunk.candidates[0]
-                for part in cand.content.parts:
-                    # a) 函数调用-通常是最后一段话才是函数调用
-                    if getattr(part, "function_call", None):
-                        fc = part.function_call
-                        yield None, [
+    @staticmethod
+    def _parse_chunk(chunk, tools):
+        """解析一个流式分块，返回 (要输出的数据列表, 是否是函数调用)"""
+        items = []
+        cand = chunk.candidates[0]
+        for part in cand.content.parts:
+            # a) 函数调用-通常是最后一段话才是函数调用
+            if getattr(part, "function_call", None):
+                fc = part.function_call
+                items.append(
+                    (
+                        None,
+                        [
                             SimpleNamespace(
                                 id=uuid.uuid4().hex,
                                 type="function",
@@ -191,16 +207,46 @@ class LLMProvider(LLMProviderBase):
                                     ),
                                 ),
                             )
-                        ]
-                        return
-                    # b) 普通文本
-                    if getattr(part, "text", None):
-                        yield part.text if tools is None else (part.text, None)
+                        ],
+                    )
+                )
+                return items, True
+            # b) 普通文本
+            if getattr(part, "text", None):
+                items.append(part.text if tools is None else (part.text, None))
+        return items, False
+
+    def _generate(self, dialogue, tools):
+        stream: GenerateContentResponse = self.model.generate_content(
+            **self._request_kwargs(dialogue, tools)
+        )
+
+        try:
+            for chunk in stream:
+                items, is_function_call = self._parse_chunk(chunk, tools)
+                yield from items
+                if is_function_call:
+                    return
 
         finally:
             if tools is not None:
                 yield None, None  # function‑mode 结束，返回哑包
 
+    async def _agenerate(self, dialogue, tools):
+        stream = await self.model.generate_content_async(
+            **self._request_kwargs(dialogue, tools)
+        )
+
+        async for chunk in stream:
+            items, is_function_call = self._parse_chunk(chunk, tools)
+            for item in items:
+                yield item
+            if is_function_call:
+                break
+
+        if tools is not None:
+            yield None, None  # function‑mode 结束，返回哑包
+
     # 关闭stream，预留后续打断对话功能的功能方法，官方文档推荐打断对话要关闭上一个流，可以有效减少配额计费和资源占用
     @staticmethod
     def _safe_finish_stream(stream: GenerateContentResponse):
@@ -4,6 +4,7 @@ from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
 from core.providers.llm.base import LLMProviderBase
+from core.providers.llm.client_pool import get_async_openai
 
 TAG = __name__
 logger = setup_logging()
@@ -55,73 +56,66 @@ class LLMProvider(LLMProviderBase):
                 msg["content"] = ""
         return dialogue
 
-    def response(self, session_id, dialogue, **kwargs):
-        try:
-            dialogue = self.normalize_dialogue(dialogue)
+    def _request_params(self, dialogue, kwargs, functions=None):
+        request_params = {
+            "model": self.model_name,
+            "messages": self.normalize_dialogue(dialogue),
+            "stream": True,
+        }
+        if functions is not None:
+            request_params["tools"] = functions
+
+        # 添加可选参数,只有当参数不为None时才添加
+        optional_params = {
+            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
+            "temperature": kwargs.get("temperature", self.temperature),
+            "top_p": kwargs.get("top_p", self.top_p),
+            "frequency_penalty": kwargs.get("frequency_penalty", self.frequency_penalty),
+        }
 
-            request_params = {
-                "model": self.model_name,
-                "messages": dialogue,
-                "stream": True,
-            }
+        for key, value in optional_params.items():
+            if value is not None:
+                request_params[key] = value
+        return request_params
 
-            # 添加可选参数,只有当参数不为None时才添加
-            optional_params = {
-                "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-                "temperature": kwargs.get("temperature", self.temperature),
-                "top_p": kwargs.get("top_p", self.top_p),
-                "frequency_penalty": kwargs.get("frequency_penalty", self.frequency_penalty),
-            }
+    @staticmethod
+    def _chunk_content(chunk):
+        try:
+            delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+            return getattr(delta, "content", "") if delta else ""
+        except IndexError:
+            return ""
 
-            for key, value in optional_params.items():
-                if value is not None:
-                    request_params[key] = value
+    @staticmethod
+    def _log_usage(chunk):
+        usage_info = getattr(chunk, "usage", None)
+        if isinstance(usage_info, CompletionUsage):
+            logger.bind(tag=TAG).info(
+                f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
+                f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
+                f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
+            )
 
-            responses = self.client.chat.completions.create(**request_params)
+    def response(self, session_id, dialogue, **kwargs):
+        try:
+            responses = self.client.chat.completions.create(
+                **self._request_params(dialogue, kwargs)
+            )
 
-            is_active = True
+            think_filter = ThinkFilter()
             for chunk in responses:
-                try:
-                    delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
-                    content = getattr(delta, "content", "") if delta else ""
-                except IndexError:
-                    content = ""
+                content = think_filter.feed(self._chunk_content(chunk))
                 if content:
-                    if "<think>" in content:
-                        is_active = False
-                        content = content.split("<think>")[0]
-                    if "</think>" in content:
-                        is_active = True
-                        content = content.split("</think>")[-1]
-                    if is_active:
-                        yield content
+                    yield content
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in response generation: {e}")
 
     def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
         try:
-            dialogue = self.normalize_dialogue(dialogue)
-
-            request_params = {
-                "model": self.model_name,
-                "messages": dialogue,
-                "stream": True,
-                "tools": functions,
-            }
-
-            optional_params = {
-                "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-                "temperature": kwargs.get("temperature", self.temperature),
-                "top_p": kwargs.get("top_p", self.top_p),
-                "frequency_penalty": kwargs.get("frequency_penalty", self.frequency_penalty),
-            }
-
-            for key, value in optional_params.items():
-                if value is not None:
-                    request_params[key] = value
-
-            stream = self.client.chat.completions.create(**request_params)
+            stream = self.client.chat.completions.create(
+                **self._request_params(dialogue, kwargs, functions)
+            )
 
             for chunk in stream:
                 if getattr(chunk, "choices", None):
@@ -129,14 +123,69 @@ class LLMProvider(LLMProviderBase):
                     content = getattr(delta, "content", "")
                     tool_calls = getattr(delta, "tool_calls", None)
                     yield content, tool_calls
-                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
-                    usage_info = getattr(chunk, "usage", None)
-                    logger.bind(tag=TAG).info(
-                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
-                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
-                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
-                    )
+                else:
+                    self._log_usage(chunk)
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
             yield f"【OpenAI服务响应异常: {e}】", None
+
+    def _async_client(self):
+        return get_async_openai(self.base_url, self.api_key, self.timeout)
+
+    async def aresponse(self, session_id, dialogue, **kwargs):
+        try:
+            stream = await self._async_client().chat.completions.create(
+                **self._request_params(dialogue, kwargs)
+            )
+            try:
+                think_filter = ThinkFilter()
+                async for chunk in stream:
+                    content = think_filter.feed(self._chunk_content(chunk))
+                    if content:
+                        yield content
+            finally:
+                # 打断时立即断开上游请求，连接归还连接池
+                await stream.close()
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in response generation: {e}")
+
+    async def aresponse_with_functions(self, session_id, dialogue, functions=None, **kwargs):
+        try:
+            stream = await self._async_client().chat.completions.create(
+                **self._request_params(dialogue, kwargs, functions)
+            )
+            try:
+                async for chunk in stream:
+                    if getattr(chunk, "choices", None):
+                        delta = chunk.choices[0].delta
+                        content = getattr(delta, "content", "")
+                        tool_calls = getattr(delta, "tool_calls", None)
+                        yield content, tool_calls
+                    else:
+                        self._log_usage(chunk)
+            finally:
+                await stream.close()
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error in function call streaming: {e}")
+            yield f"【OpenAI服务响应异常: {e}】", None
+
+
+class ThinkFilter:
+    """过滤推理模型输出中<think>...</think>之间的思考内容"""
+
+    def __init__(self):
+        self.is_active = True
+
+    def feed(self, content):
+        if not content:
+            return content
+        if "<think>" in content:
+            self.is_active = False
+            content = content.split("<think>")[0]
+        if "</think>" in content:
+            self.is_active = True
+            content = content.split("</think>")[-1]
+        return content if self.is_active else ""
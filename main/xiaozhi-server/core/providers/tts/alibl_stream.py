@@ -1,7 +1,6 @@
 import os
 import uuid
 import json
-import time
 import queue
 import asyncio
 import traceback
@@ -11,6 +10,7 @@ from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.tts import MarkdownCleaner
 from core.providers.tts.base import TTSProviderBase
+from core.providers.tts.ws_pool import get_ws_pool
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 
 TAG = __name__
@@ -29,9 +29,9 @@ class TTSProvider(TTSProviderBase):
 
         # WebSocket配置
         self.ws_url = "wss://dashscope.aliyuncs.com/api-ws/v1/inference/"
+        # 当前会话从连接池租用的上游连接
         self.ws = None
         self._monitor_task = None
-        self.last_active_time = None
 
         # 模型和音色配置
         self.model = config.get("model", "cosyvoice-v2")
@@ -65,32 +65,23 @@ class TTSProvider(TTSProviderBase):
             sample_rate=self.sample_rate, channels=1, frame_size_ms=60
         )
 
-    async def _ensure_connection(self):
-        """确保WebSocket连接可用，支持60秒内连接复用"""
-        try:
-            current_time = time.time()
-            if self.ws and current_time - self.last_active_time < 60:
-                # 一分钟内才可以复用链接进行连续对话
-                logger.bind(tag=TAG).info(f"使用已有链接...")
-                return self.ws
-            logger.bind(tag=TAG).info("开始建立新连接...")
-
-            self.ws = await websockets.connect(
-                self.ws_url,
-                additional_headers=self.header,
-                ping_interval=30,
-                ping_timeout=10,
-                close_timeout=10,
-            )
-
-            logger.bind(tag=TAG).info("WebSocket连接建立成功")
-            self.last_active_time = current_time
-            return self.ws
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
-            self.ws = None
-            self.last_active_time = None
-            raise
+        # 同一API Key的所有设备共用上游连接池，一条连接同时只服务一个会话
+        self.pool = get_ws_pool(
+            f"alibl_stream:{self.ws_url}:{self.api_key}",
+            max_connections=int(config.get("pool_max_connections", 64)),
+            min_idle=int(config.get("pool_min_idle", 1)),
+            idle_timeout=float(config.get("pool_idle_timeout", 50)),
+        )
+
+    def _connect(self):
+        """新建上游连接，供连接池调用"""
+        return websockets.connect(
+            self.ws_url,
+            additional_headers=self.header,
+            ping_interval=30,
+            ping_timeout=10,
+            close_timeout=10,
+        )
 
     def tts_text_priority_thread(self):
         """流式TTS文本处理线程"""
@@ -153,7 +144,7 @@ class TTSProvider(TTSProviderBase):
                     )
                     if message.content_file and os.path.exists(message.content_file):
                         # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+                        self.handle_audio_file_source(message.content_file, message.content_detail)
 
                 if message.sentence_type == SentenceType.LAST:
                     try:
@@ -196,7 +187,6 @@ class TTSProvider(TTSProviderBase):
             }
 
             await self.ws.send(json.dumps(continue_task_message))
-            self.last_active_time = time.time()
             logger.bind(tag=TAG).debug(f"已发送文本: {filtered_text}")
 
         except Exception as e:
@@ -222,8 +212,8 @@ class TTSProvider(TTSProviderBase):
                 logger.bind(tag=TAG).info("检测到未完成的上个会话，关闭监听任务...")
                 await self.close()
 
-            # 确保连接可用
-            await self._ensure_connection()
+            # 从连接池租用上游连接（通常是预热好的连接）
+            self.ws = await self.pool.open_session(session_id, self._connect)
 
             # 启动监听任务
             self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
@@ -254,7 +244,6 @@ class TTSProvider(TTSProviderBase):
             }
 
             await self.ws.send(json.dumps(run_task_message))
-            self.last_active_time = time.time()
             logger.bind(tag=TAG).info("会话启动请求已发送")
         except Exception as e:
             logger.bind(tag=TAG).error(f"启动会话失败: {str(e)}")
@@ -279,7 +268,6 @@ class TTSProvider(TTSProviderBase):
                 }
 
                 await self.ws.send(json.dumps(finish_task_message))
-                self.last_active_time = time.time()
                 logger.bind(tag=TAG).info("会话结束请求已发送")
                 # 等待监听任务完成
                 if self._monitor_task:
@@ -317,16 +305,15 @@ class TTSProvider(TTSProviderBase):
             except:
                 pass
             self.ws = None
-            self.last_active_time = None
 
     async def _start_monitor_tts_response(self):
         """监听TTS响应"""
+        session = self.ws
+        session_finished = False
         try:
-            session_finished = False
             while not self.conn.stop_event.is_set():
                 try:
-                    msg = await self.ws.recv()
-                    self.last_active_time = time.time()
+                    msg = await session.recv()
 
                     # 检查客户端是否中止
                     if self.conn.client_abort:
@@ -378,15 +365,15 @@ class TTSProvider(TTSProviderBase):
                     )
                     break
 
-            # 仅在连接异常且非正常结束时才关闭连接
-            if not session_finished and self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
         # 监听任务退出时清理引用
         finally:
+            # 正常结束的会话把连接归还连接池，异常时直接关闭
+            if session_finished:
+                session.release()
+            else:
+                await session.close()
+            if self.ws is session:
+                self.ws = None
             self._monitor_task = None
 
     def to_tts(self, text: str) -> list:
@@ -14,6 +14,7 @@ import os
 from datetime import datetime
 from urllib import parse
 from core.providers.tts.base import TTSProviderBase
+from core.providers.tts.ws_pool import get_ws_pool
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from core.utils.tts import MarkdownCleaner
 from core.utils import opus_encoder_utils, textUtils
@@ -127,9 +128,9 @@ class TTSProvider(TTSProviderBase):
         else:
             # 默认使用wss协议
             self.ws_url = f"wss://{self.host}/ws/v1"
+        # 当前会话从连接池租用的上游连接
         self.ws = None
         self._monitor_task = None
-        self.last_active_time = None
 
         # 专属tts设置
         self.task_id = uuid.uuid4().hex
@@ -139,6 +140,15 @@ class TTSProvider(TTSProviderBase):
             sample_rate=16000, channels=1, frame_size_ms=60
         )
 
+        # 同一AppKey的所有设备共用上游连接池，一条连接同时只服务一个会话
+        # 服务端约10秒无数据会断开空闲连接，空闲超过8秒的连接不再复用
+        self.pool = get_ws_pool(
+            f"aliyun_stream:{self.ws_url}:{self.appkey}",
+            max_connections=int(config.get("pool_max_connections", 64)),
+            min_idle=int(config.get("pool_min_idle", 1)),
+            idle_timeout=float(config.get("pool_idle_timeout", 8)),
+        )
+
         # Token管理
         if self.access_key_id and self.access_key_secret:
             self._refresh_token()
@@ -177,36 +187,18 @@ class TTSProvider(TTSProviderBase):
             return False
         return time.time() > self.expire_time
 
-    async def _ensure_connection(self):
-        """确保WebSocket连接可用"""
-        try:
-            if self._is_token_expired():
-                logger.bind(tag=TAG).warning("Token已过期，正在自动刷新...")
-                self._refresh_token()
-            current_time = time.time()
-            if self.ws and current_time - self.last_active_time < 10:
-                # 10秒内才可以复用链接进行连续对话
-                self.task_id = uuid.uuid4().hex
-                logger.bind(tag=TAG).info(f"使用已有链接..., task_id: {self.task_id}")
-                return self.ws
-            logger.bind(tag=TAG).debug("开始建立新连接...")
-
-            self.ws = await websockets.connect(
-                self.ws_url,
-                additional_headers={"X-NLS-Token": self.token},
-                ping_interval=30,
-                ping_timeout=10,
-                close_timeout=10,
-            )
-            self.task_id = uuid.uuid4().hex
-            logger.bind(tag=TAG).debug(f"WebSocket连接建立成功, task_id: {self.task_id}")
-            self.last_active_time = time.time()
-            return self.ws
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
-            self.ws = None
-            self.last_active_time = None
-            raise
+    def _connect(self):
+        """新建上游连接，供连接池调用"""
+        if self._is_token_expired():
+            logger.bind(tag=TAG).warning("Token已过期，正在自动刷新...")
+            self._refresh_token()
+        return websockets.connect(
+            self.ws_url,
+            additional_headers={"X-NLS-Token": self.token},
+            ping_interval=30,
+            ping_timeout=10,
+            close_timeout=10,
+        )
 
     def tts_text_priority_thread(self):
         """流式文本处理线程"""
@@ -262,7 +254,7 @@ class TTSProvider(TTSProviderBase):
                     )
                     if message.content_file and os.path.exists(message.content_file):
                         # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+                        self.handle_audio_file_source(message.content_file, message.content_detail)
                 if message.sentence_type == SentenceType.LAST:
                     try:
                         logger.bind(tag=TAG).debug("开始结束TTS会话...")
@@ -299,7 +291,6 @@ class TTSProvider(TTSProviderBase):
                 "payload": {"text": filtered_text},
             }
             await self.ws.send(json.dumps(run_request))
-            self.last_active_time = time.time()
             return
 
         except Exception as e:
@@ -326,8 +317,9 @@ class TTSProvider(TTSProviderBase):
                 )
                 await self.close()
 
-            # 建立新连接
-            await self._ensure_connection()
+            # 从连接池租用上游连接（通常是预热好的连接）
+            self.task_id = uuid.uuid4().hex
+            self.ws = await self.pool.open_session(self.task_id, self._connect)
 
             # 启动监听任务
             self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
@@ -351,7 +343,6 @@ class TTSProvider(TTSProviderBase):
                 },
             }
             await self.ws.send(json.dumps(start_request))
-            self.last_active_time = time.time()
             logger.bind(tag=TAG).debug("会话启动请求已发送")
         except Exception as e:
             logger.bind(tag=TAG).error(f"启动会话失败: {str(e)}")
@@ -374,7 +365,6 @@ class TTSProvider(TTSProviderBase):
                 }
                 await self.ws.send(json.dumps(stop_request))
                 logger.bind(tag=TAG).debug("会话结束请求已发送")
-                self.last_active_time = time.time()
                 if self._monitor_task:
                     try:
                         await self._monitor_task
@@ -408,16 +398,15 @@ class TTSProvider(TTSProviderBase):
             except:
                 pass
             self.ws = None
-            self.last_active_time = None
 
     async def _start_monitor_tts_response(self):
         """监听TTS响应"""
+        session = self.ws
+        session_finished = False  # 标记会话是否正常结束
         try:
-            session_finished = False  # 标记会话是否正常结束
             while not self.conn.stop_event.is_set():
                 try:
-                    msg = await self.ws.recv()
-                    self.last_active_time = time.time()
+                    msg = await session.recv()
                     # 检查客户端是否中止
                     if self.conn.client_abort:
                         logger.bind(tag=TAG).info("收到打断信息，终止监听TTS响应")
@@ -460,15 +449,15 @@ class TTSProvider(TTSProviderBase):
                         f"处理TTS响应时出错: {e}\n{traceback.format_exc()}"
                     )
                     break
-            # 仅在连接异常时才关闭
-            if not session_finished and self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
         # 监听任务退出时清理引用
         finally:
+            # 正常结束的会话把连接归还连接池，异常时直接关闭
+            if session_finished:
+                session.release()
+            else:
+                await session.close()
+            if self.ws is session:
+                self.ws = None
             self._monitor_task = None
 
     def to_tts(self, text: str) -> list:
@@ -9,14 +9,26 @@ import traceback
 from core.utils import p3
 from datetime import datetime
 from core.utils import textUtils
-from typing import Callable, Any
+from typing import AsyncIterator, Callable, Any
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
+from core.utils.turn_trace import current_turn
 from core.utils.output_counter import add_device_output
+from core.utils.cache.tts_cache import get_tts_cache, config_fingerprint
+from core.utils.tts_runtime import (
+    get_tts_runtime,
+    run_in_thread_loop,
+    iterate_in_thread_loop,
+)
+from core.providers.tts.pipeline import SentencePipeline
+from core.providers.tts.segmenter import TextSegmenter
+from core.providers.tts.file_source import FileAudioSource
 from core.handle.reportHandle import enqueue_tts_report
-from core.handle.sendAudioHandle import sendAudioMessage
+from core.handle.sendAudioHandle import sendAudioMessage, sendAudioFrame
 from core.utils.util import audio_bytes_to_data_stream, audio_to_data_stream
+from core.utils.audio_decode import decode_stream_to_pcm
+from core.utils.opus_encoder_utils import OpusEncoderUtils
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
     SentenceType,
@@ -28,7 +40,18 @@ TAG = __name__
 logger = setup_logging()
 
 
+def _not_cancelled() -> bool:
+    return False
+
+
 class TTSProviderBase(ABC):
+    # text_to_speak内部全部是非阻塞IO（aiohttp、异步SDK）时置为True，
+    # 请求放到共享的TTS运行时执行；否则在本连接TTS线程复用的事件循环中执行
+    async_io_safe = False
+    # 实现了text_to_speak_stream（边合成边返回音频数据块）时置为True，
+    # 数据块到达后立即解码、编码送入播放队列，不用等整句合成完
+    audio_stream_supported = False
+
     def __init__(self, config, delete_audio_file):
         self.interface_type = InterfaceType.NON_STREAM
         self.conn = None
@@ -37,37 +60,33 @@ class TTSProviderBase(ABC):
         self.output_file = config.get("output_dir", "tmp/")
         self.tts_text_queue = queue.Queue()
         self.tts_audio_queue = queue.Queue()
+        # 非流式TTS的分句合成流水线，在tts_text_priority_thread中创建
+        self.pipeline = None
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
 
-        self.tts_text_buff = []
-        self.punctuations = (
-            "。",
-            "？",
-            "?",
-            "！",
-            "!",
-            "；",
-            ";",
-            "：",
-        )
-        self.first_sentence_punctuations = (
-            "，",
-            "~",
-            "、",
-            ",",
-            "。",
-            "？",
-            "?",
-            "！",
-            "!",
-            "；",
-            ";",
-            "：",
-        )
+        # 流式文本分句器，open_audio_channels时按连接配置重建
+        self.segmenter = TextSegmenter()
         self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
+        # TTS缓存键的实例部分：类型、音色、语速等配置
+        self.cache_fingerprint = config_fingerprint(
+            config.get("type", self.__class__.__module__), config
+        )
+
+    def run_text_to_speak(self, text, output_file):
+        """同步执行一次text_to_speak"""
+        return self._run_tts_coroutine(self.text_to_speak(text, output_file))
+
+    def _run_tts_coroutine(self, coro):
+        if self.async_io_safe:
+            return get_tts_runtime().run(coro)
+        return run_in_thread_loop(coro)
+
+    def _iterate_tts_stream(self, stream):
+        """在事件循环中读取异步生成器，数据在调用方线程中逐个处理"""
+        if self.async_io_safe:
+            return get_tts_runtime().iterate(stream)
+        return iterate_in_thread_loop(stream)
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -82,76 +101,153 @@ class TTSProviderBase(ABC):
     def handle_audio_file(self, file_audio: bytes, text):
         self.before_stop_play_files.append((file_audio, text))
 
-    def to_tts_stream(self, text, opus_handler: Callable[[bytes], None] = None) -> None:
+    def handle_audio_file_source(self, tts_file, text):
+        """音频文件不预先解码，排到待播放列表中，播放时再按需读取"""
+        self.before_stop_play_files.append((self._open_audio_file(tts_file), text))
+
+    def _open_audio_file(self, tts_file) -> FileAudioSource:
+        return FileAudioSource(
+            tts_file,
+            is_opus=self.conn.audio_format != "pcm",
+            delete_after=self.delete_audio_file
+            and tts_file.startswith(self.output_file),
+        )
+
+    def _get_tts_cache(self, text, audio_format):
+        """返回(缓存, 缓存键)，未开启缓存或文本不适合缓存时返回(None, None)"""
+        cache = get_tts_cache(self.conn.config) if self.conn else None
+        if cache is None:
+            return None, None
+        key = cache.make_key(self.cache_fingerprint, text, audio_format)
+        return (cache, key) if key else (None, None)
+
+    def _cache_recorder(self, opus_handler, frames: list):
+        """在原有回调之外记录一份音频帧，合成成功后写入缓存"""
+
+        def handler(data):
+            frames.append(data)
+            if opus_handler:
+                opus_handler(data)
+
+        return handler
+
+    def to_tts_stream(
+        self,
+        text,
+        opus_handler: Callable[[bytes], None] = None,
+        audio_queue=None,
+        is_cancelled: Callable[[], bool] = None,
+    ) -> None:
+        """合成一句话，audio_queue为空时句子开始标记写入tts_audio_queue，流水线合成时写入对应的job
+
+        is_cancelled返回True时（用户打断）停止重试和解码，不再输出音频
+        """
         text = MarkdownCleaner.clean_markdown(text)
-        max_repeat_time = 5
-        if self.delete_audio_file:
-            # 需要删除文件的直接转为音频数据
-            while max_repeat_time > 0:
-                try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
-                    if audio_bytes:
-                        self.tts_audio_queue.put((SentenceType.FIRST, None, text))
-                        audio_bytes_to_data_stream(
-                            audio_bytes,
-                            file_type=self.audio_file_type,
-                            is_opus=True,
-                            callback=opus_handler,
-                        )
-                        break
-                    else:
-                        max_repeat_time -= 1
-                except Exception as e:
-                    logger.bind(tag=TAG).warning(
-                        f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
-                    )
-                    max_repeat_time -= 1
-            if max_repeat_time > 0:
-                logger.bind(tag=TAG).info(
-                    f"语音生成成功: {text}，重试{5 - max_repeat_time}次"
-                )
-            else:
-                logger.bind(tag=TAG).error(
-                    f"语音生成失败: {text}，请检查网络或服务是否正常"
-                )
+        is_cancelled = is_cancelled or _not_cancelled
+        audio_queue = audio_queue if audio_queue is not None else self.tts_audio_queue
+        handler = opus_handler or self.handle_opus
+        audio_format = (
+            "pcm"
+            if not self.delete_audio_file and self.conn and self.conn.audio_format == "pcm"
+            else "opus"
+        )
+        cache, cache_key = self._get_tts_cache(text, audio_format)
+        if cache is not None:
+            cached_frames = cache.get(cache_key)
+            if cached_frames:
+                # 命中缓存，音频帧直接送入播放队列
+                logger.bind(tag=TAG).info(f"语音命中缓存: {text}")
+                audio_queue.put((SentenceType.FIRST, None, text))
+                for frame in cached_frames:
+                    handler(frame)
+                return None
+        if self.delete_audio_file and self.audio_stream_supported:
+            frames = []
+            recorder = (
+                self._cache_recorder(handler, frames) if cache is not None else handler
+            )
+            if self._stream_text_to_speak(text, audio_queue, recorder, is_cancelled):
+                if cache is not None:
+                    cache.put(cache_key, frames)
             return None
-        else:
-            tmp_file = self.generate_filename()
-            try:
-                while not os.path.exists(tmp_file) and max_repeat_time > 0:
-                    try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
-                    except Exception as e:
-                        logger.bind(tag=TAG).warning(
-                            f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
-                        )
-                        # 未执行成功，删除文件
-                        if os.path.exists(tmp_file):
-                            os.remove(tmp_file)
-                        max_repeat_time -= 1
 
-                if max_repeat_time > 0:
-                    logger.bind(tag=TAG).info(
-                        f"语音生成成功: {text}:{tmp_file}，重试{5 - max_repeat_time}次"
+        # 整句解码到本地缓冲区后再写入句子开始标记和音频帧，
+        # 解码中途失败重试时不会重复播放前半句，缓存里也只会存入完整的句子
+        frames = self._synthesize_frames(text, is_cancelled)
+        if is_cancelled():
+            return None
+        if frames is None:
+            if not self.delete_audio_file:
+                audio_queue.put((SentenceType.FIRST, None, text))
+            return None
+        audio_queue.put((SentenceType.FIRST, None, text))
+        for frame in frames:
+            handler(frame)
+        if cache is not None:
+            cache.put(cache_key, frames)
+        return None
+
+    def _synthesize_frames(self, text, is_cancelled: Callable[[], bool] = None):
+        """合成一句话并解码为音频帧列表，最多尝试5次，全部失败或被打断时返回None"""
+        is_cancelled = is_cancelled or _not_cancelled
+        max_repeat_time = 5
+        tmp_file = None if self.delete_audio_file else self.generate_filename()
+        for attempt in range(1, max_repeat_time + 1):
+            if is_cancelled():
+                logger.bind(tag=TAG).info(f"语音合成已打断: {text}")
+                self._remove_file(tmp_file)
+                return None
+            # 每次尝试都从空列表开始，失败尝试解码出的帧不会混进结果
+            frames = []
+            try:
+                if self.delete_audio_file:
+                    # 需要删除文件的直接转为音频数据
+                    audio_bytes = self.run_text_to_speak(text, None)
+                    if not audio_bytes or is_cancelled():
+                        continue
+                    audio_bytes_to_data_stream(
+                        audio_bytes,
+                        file_type=self.audio_file_type,
+                        is_opus=True,
+                        callback=frames.append,
                     )
                 else:
-                    logger.bind(tag=TAG).error(
-                        f"语音生成失败: {text}，请检查网络或服务是否正常"
-                    )
-                    self.tts_audio_queue.put((SentenceType.FIRST, None, text))
-                self._process_audio_file_stream(tmp_file, callback=opus_handler)
+                    self.run_text_to_speak(text, tmp_file)
+                    if not os.path.exists(tmp_file) or is_cancelled():
+                        continue
+                    self._process_audio_file_stream(tmp_file, callback=frames.append)
             except Exception as e:
-                logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
-                return None
-    
+                logger.bind(tag=TAG).warning(
+                    f"语音生成失败{attempt}次: {text}，错误: {e}"
+                )
+                # 未执行成功，删除文件
+                self._remove_file(tmp_file)
+                continue
+            logger.bind(tag=TAG).info(
+                f"语音生成成功: {text}，重试{attempt - 1}次"
+            )
+            return frames
+        logger.bind(tag=TAG).error(f"语音生成失败: {text}，请检查网络或服务是否正常")
+        return None
+
+    @staticmethod
+    def _remove_file(path):
+        if path and os.path.exists(path):
+            os.remove(path)
+
     def to_tts(self, text):
         text = MarkdownCleaner.clean_markdown(text)
         max_repeat_time = 5
         if self.delete_audio_file:
+            cache, cache_key = self._get_tts_cache(text, "opus")
+            if cache is not None:
+                cached_frames = cache.get(cache_key)
+                if cached_frames:
+                    return list(cached_frames)
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = self.run_text_to_speak(text, None)
                     if audio_bytes:
                         audio_datas = []
                         audio_bytes_to_data_stream(
@@ -160,6 +256,8 @@ class TTSProviderBase(ABC):
                             is_opus=True,
                             callback=lambda data: audio_datas.append(data)
                         )
+                        if cache is not None:
+                            cache.put(cache_key, audio_datas)
                         return audio_datas
                     else:
                         max_repeat_time -= 1
@@ -182,7 +280,7 @@ class TTSProviderBase(ABC):
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        self.run_text_to_speak(text, tmp_file)
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -210,6 +308,68 @@ class TTSProviderBase(ABC):
     async def text_to_speak(self, text, output_file):
         pass
 
+    async def text_to_speak_stream(self, text) -> AsyncIterator[bytes]:
+        """流式合成，按到达顺序返回audio_file_type格式的音频数据块
+
+        默认整句合成后作为一个数据块返回；能边合成边返回的子类重写本方法，并将audio_stream_supported置为True
+        """
+        audio_bytes = await self.text_to_speak(text, None)
+        if audio_bytes:
+            yield audio_bytes
+
+    def _stream_text_to_speak(
+        self, text, audio_queue, opus_handler, is_cancelled: Callable[[], bool] = None
+    ) -> bool:
+        """流式合成一句话，第一段音频到达时写入句子开始标记
+
+        已经开始播放的句子出错时不再重试，避免重复播放前半句；被打断时立即停止。
+
+        Returns:
+            bool: 是否合成成功
+        """
+        handler = opus_handler or self.handle_opus
+        is_cancelled = is_cancelled or _not_cancelled
+        started = False
+
+        for attempt in range(1, 6):
+            if is_cancelled():
+                logger.bind(tag=TAG).info(f"语音合成已打断: {text}")
+                return False
+            # 事件循环只负责网络请求和ffmpeg管道读写，Opus编码和回调在本线程执行
+            pcm_stream = self._iterate_tts_stream(
+                decode_stream_to_pcm(
+                    self.text_to_speak_stream(text), self.audio_file_type
+                )
+            )
+            encoder = OpusEncoderUtils(sample_rate=16000, channels=1, frame_size_ms=60)
+            try:
+                for pcm in pcm_stream:
+                    if is_cancelled():
+                        break
+                    if not started:
+                        started = True
+                        audio_queue.put((SentenceType.FIRST, None, text))
+                    encoder.encode_pcm_to_opus_stream(pcm, False, handler)
+                if is_cancelled():
+                    # 打断时只合成了半句，不能写入缓存
+                    logger.bind(tag=TAG).info(f"语音合成已打断: {text}")
+                    return False
+                if started:
+                    encoder.encode_pcm_to_opus_stream(b"", True, handler)
+                    logger.bind(tag=TAG).info(f"语音生成成功: {text}，重试{attempt - 1}次")
+                    return True
+            except Exception as e:
+                logger.bind(tag=TAG).warning(
+                    f"语音生成失败{attempt}次: {text}，错误: {e}"
+                )
+            finally:
+                pcm_stream.close()
+                encoder.close()
+            if started:
+                return False
+        logger.bind(tag=TAG).error(f"语音生成失败: {text}，请检查网络或服务是否正常")
+        return False
+
     def audio_to_pcm_data_stream(
         self, audio_file_path, callback: Callable[[Any], Any] = None
     ):
@@ -252,6 +412,7 @@ class TTSProviderBase(ABC):
 
     async def open_audio_channels(self, conn):
         self.conn = conn
+        self.segmenter = TextSegmenter.from_config(conn.config.get("tts_segment"))
         # tts 消化线程
         self.tts_priority_thread = threading.Thread(
             target=self.tts_text_priority_thread, daemon=True
@@ -267,6 +428,11 @@ class TTSProviderBase(ABC):
     # 这里默认是非流式的处理方式
     # 流式处理方式请在子类中重写
     def tts_text_priority_thread(self):
+        # 最多同时合成的句子数，1表示逐句串行合成
+        lookahead = int(self.conn.config.get("tts_lookahead", 1) or 1)
+        self.pipeline = SentencePipeline(
+            self.tts_audio_queue, lookahead, name=f"tts-{self.conn.session_id[:8]}"
+        )
         while not self.conn.stop_event.is_set():
             try:
                 message = self.tts_text_queue.get(timeout=1)
@@ -278,25 +444,23 @@ class TTSProviderBase(ABC):
                 if message.sentence_type == SentenceType.FIRST:
                     # 初始化参数
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
+                    self.segmenter.reset()
                     self.tts_audio_first_sentence = True
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
+                    segment_text = self._get_segment_text(message.content_detail)
                     if segment_text:
-                        self.to_tts_stream(segment_text, opus_handler=self.handle_opus)
+                        self._submit_text(segment_text)
                 elif ContentType.FILE == message.content_type:
-                    self._process_remaining_text_stream(opus_handler=self.handle_opus)
+                    self._submit_text(self._pop_remaining_text())
                     tts_file = message.content_file
                     if tts_file and os.path.exists(tts_file):
-                        self._process_audio_file_stream(
-                            tts_file, callback=self.handle_opus
+                        # 文件按播放进度读取，不整体解码进播放队列
+                        self.pipeline.put(
+                            (SentenceType.MIDDLE, self._open_audio_file(tts_file), None)
                         )
                 if message.sentence_type == SentenceType.LAST:
-                    self._process_remaining_text_stream(opus_handler=self.handle_opus)
-                    self.tts_audio_queue.put(
+                    self._submit_text(self._pop_remaining_text())
+                    self.pipeline.put(
                         (message.sentence_type, [], message.content_detail)
                     )
 
@@ -308,6 +472,23 @@ class TTSProviderBase(ABC):
                 )
                 continue
 
+    def _submit_text(self, text):
+        """把一句话交给流水线合成，音频按提交顺序进入播放队列"""
+        if text:
+            self.pipeline.submit(
+                lambda job: self.to_tts_stream(
+                    text,
+                    opus_handler=job.handle_opus,
+                    audio_queue=job,
+                    is_cancelled=job.is_cancelled,
+                )
+            )
+
+    def cancel_pending(self):
+        """打断时丢弃流水线中尚未播放的句子"""
+        if self.pipeline:
+            self.pipeline.cancel()
+
     def _audio_play_priority_thread(self):
         # 需要上报的文本和音频列表
         enqueue_text = None
@@ -326,6 +507,8 @@ class TTSProviderBase(ABC):
 
                 if self.conn.client_abort:
                     logger.bind(tag=TAG).debug("收到打断信号，跳过当前音频数据")
+                    if isinstance(audio_datas, FileAudioSource):
+                        audio_datas.close()
                     enqueue_text, enqueue_audio = None, []
                     continue
 
@@ -337,6 +520,13 @@ class TTSProviderBase(ABC):
                     enqueue_audio = []
                     enqueue_text = text
 
+                if isinstance(audio_datas, FileAudioSource):
+                    self._play_audio_source(audio_datas)
+                    continue
+
+                if audio_datas:
+                    current_turn(self.conn).mark("tts_first_audio")
+
                 # 收集上报音频数据
                 if isinstance(audio_datas, bytes) and enqueue_audio is not None:
                     enqueue_audio.append(audio_datas)
@@ -355,6 +545,22 @@ class TTSProviderBase(ABC):
             except Exception as e:
                 logger.bind(tag=TAG).error(f"audio_play_priority_thread: {text} {e}")
 
+    def _play_audio_source(self, source: FileAudioSource):
+        """逐帧播放音频文件：流控队列积压到预读上限时暂停读取，打断后立即停止"""
+        read_ahead = int(self.conn.config.get("tts_file_read_ahead", 10))
+        try:
+            for frame in source:
+                if self.conn.client_abort or self.conn.stop_event.is_set():
+                    logger.bind(tag=TAG).debug("收到打断信号，停止播放音频文件")
+                    break
+                current_turn(self.conn).mark("tts_first_audio")
+                future = asyncio.run_coroutine_threadsafe(
+                    sendAudioFrame(self.conn, frame, read_ahead), self.conn.loop
+                )
+                future.result()
+        finally:
+            source.close()
+
     async def start_session(self, session_id):
         pass
 
@@ -363,47 +569,17 @@ class TTSProviderBase(ABC):
 
     async def close(self):
         """资源清理方法"""
+        if self.pipeline:
+            self.pipeline.close()
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff)
-        current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-        last_punct_pos = -1
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
-
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(
-                segment_text_raw
-            )
-            self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = current_text
-            self.is_first_sentence = True  # 重置标志
-            return segment_text
-        else:
-            return None
+    def _get_segment_text(self, delta):
+        """追加LLM新输出的文本，返回可以送去合成的句子"""
+        segment_text_raw = self.segmenter.feed(delta)
+        if segment_text_raw:
+            return textUtils.get_string_no_punctuation_or_emoji(segment_text_raw)
+        return None
 
     def _process_audio_file_stream(
         self, tts_file, callback: Callable[[Any], Any]
@@ -443,12 +619,15 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                self.to_tts_stream(segment_text, opus_handler=opus_handler)
-                self.processed_chars += len(full_text)
-                return True
+        segment_text = self._pop_remaining_text()
+        if segment_text:
+            self.to_tts_stream(segment_text, opus_handler=opus_handler)
+            return True
         return False
+
+    def _pop_remaining_text(self):
+        """取出缓冲区中尚未合成的剩余文本"""
+        remaining_text = self.segmenter.flush()
+        if remaining_text:
+            return textUtils.get_string_no_punctuation_or_emoji(remaining_text) or None
+        return None
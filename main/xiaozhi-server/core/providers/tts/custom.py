@@ -1,8 +1,8 @@
 import os
 import json
 import uuid
-import requests
 from config.logger import setup_logging
+from core.utils.tts_runtime import get_tts_runtime, write_audio_file
 from datetime import datetime
 from core.providers.tts.base import TTSProviderBase
 
@@ -10,6 +10,8 @@ TAG = __name__
 logger = setup_logging()
 
 class TTSProvider(TTSProviderBase):
+    async_io_safe = True
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         self.url = config.get("url")
@@ -38,17 +40,25 @@ class TTSProvider(TTSProviderBase):
                 v = v.replace("{prompt_text}", text)
             request_params[k] = v
 
+        session = get_tts_runtime().session(self.url)
         if self.method.upper() == "POST":
-            resp = requests.post(self.url, json=request_params, headers=self.headers)
+            request = session.post(self.url, json=request_params, headers=self.headers)
         else:
-            resp = requests.get(self.url, params=request_params, headers=self.headers)
-        if resp.status_code == 200:
+            # 查询参数只接受字符串和数字，其余类型按requests的方式转成字符串
+            query = {
+                k: v if isinstance(v, (str, int, float)) and not isinstance(v, bool) else str(v)
+                for k, v in request_params.items()
+            }
+            request = session.get(self.url, params=query, headers=self.headers)
+        async with request as resp:
+            status = resp.status
+            content = await resp.read()
+        if status == 200:
             if output_file:
-                with open(output_file, "wb") as file:
-                    file.write(resp.content)
+                await write_audio_file(output_file, content)
             else:
-                return resp.content
+                return content
         else:
-            error_msg = f"Custom TTS请求失败: {resp.status_code} - {resp.text}"
+            error_msg = f"Custom TTS请求失败: {status} - {content.decode(errors='ignore')}"
             logger.bind(tag=TAG).error(error_msg)
             raise Exception(error_msg)  # 抛出异常，让调用方捕获
@@ -1,8 +1,8 @@
 import uuid
 import json
 import base64
-import requests
 from core.utils.util import check_model_key
+from core.utils.tts_runtime import get_tts_runtime, write_audio_file
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
 
@@ -11,6 +11,8 @@ logger = setup_logging()
 
 
 class TTSProvider(TTSProviderBase):
+    async_io_safe = True
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         if config.get("appid"):
@@ -67,20 +69,23 @@ class TTSProvider(TTSProviderBase):
         }
 
         try:
-            resp = requests.post(
-                self.api_url, json.dumps(request_json), headers=self.header
-            )
-            if "data" in resp.json():
-                data = resp.json()["data"]
+            session = get_tts_runtime().session(self.api_url)
+            async with session.post(
+                self.api_url, data=json.dumps(request_json), headers=self.header
+            ) as resp:
+                status = resp.status
+                content = await resp.read()
+            result = json.loads(content)
+            if "data" in result:
+                data = result["data"]
                 audio_bytes = base64.b64decode(data)
                 if output_file:
-                    with open(output_file, "wb") as file_to_save:
-                        file_to_save.write(audio_bytes)
+                    await write_audio_file(output_file, audio_bytes)
                 else:
                     return audio_bytes
             else:
                 raise Exception(
-                    f"{__name__} status_code: {resp.status_code} response: {resp.content}"
+                    f"{__name__} status_code: {status} response: {content}"
                 )
         except Exception as e:
             raise Exception(f"{__name__} error: {e}")
@@ -3,9 +3,13 @@ import uuid
 import edge_tts
 from datetime import datetime
 from core.providers.tts.base import TTSProviderBase
+from core.utils.tts_runtime import write_audio_file
 
 
 class TTSProvider(TTSProviderBase):
+    async_io_safe = True
+    audio_stream_supported = True
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         if config.get("private_voice"):
@@ -23,24 +27,23 @@ class TTSProvider(TTSProviderBase):
     async def text_to_speak(self, text, output_file):
         try:
             communicate = edge_tts.Communicate(text, voice=self.voice)
+            audio_chunks = []
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":  # 只处理音频数据块
+                    audio_chunks.append(chunk["data"])
             if output_file:
-                # 确保目录存在并创建空文件
-                os.makedirs(os.path.dirname(output_file), exist_ok=True)
-                with open(output_file, "wb") as f:
-                    pass
-
-                # 流式写入音频数据
-                with open(output_file, "ab") as f:  # 改为追加模式避免覆盖
-                    async for chunk in communicate.stream():
-                        if chunk["type"] == "audio":  # 只处理音频数据块
-                            f.write(chunk["data"])
+                # 文件在线程池中写入，不阻塞共享事件循环
+                await write_audio_file(output_file, b"".join(audio_chunks))
             else:
                 # 返回音频二进制数据
-                audio_bytes = b""
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        audio_bytes += chunk["data"]
-                return audio_bytes
+                return b"".join(audio_chunks)
         except Exception as e:
             error_msg = f"Edge TTS请求失败: {e}"
-            raise Exception(error_msg)  # 抛出异常，让调用方捕获
\ No newline at end of file
+            raise Exception(error_msg)  # 抛出异常，让调用方捕获
+
+    async def text_to_speak_stream(self, text):
+        """边合成边返回MP3数据块"""
+        communicate = edge_tts.Communicate(text, voice=self.voice)
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                yield chunk["data"]
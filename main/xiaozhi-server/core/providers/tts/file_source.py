@@ -0,0 +1,53 @@
+"""
+按需读取的音频文件
+音乐等长音频不再一次性解码成全部音频帧放进播放队列，播放队列里只放这个对象，
+由播放线程按发送进度逐帧读取，每个连接的内存占用与音频时长无关。
+"""
+
+import os
+from typing import Iterator, Optional
+from core.utils import p3
+from core.utils.audio_decode import decode_to_pcm_chunks
+from core.utils.util import iter_pcm_chunks_to_data
+
+
+class FileAudioSource:
+    """音频文件的惰性帧源，只能迭代一次"""
+
+    def __init__(self, file_path: str, is_opus: bool = True, delete_after: bool = False):
+        """
+        Args:
+            file_path: 音频文件路径
+            is_opus: 输出Opus帧还是PCM帧（p3文件始终输出Opus帧）
+            delete_after: 播放结束或被打断后是否删除文件
+        """
+        self.file_path = file_path
+        self.is_opus = is_opus
+        self.delete_after = delete_after
+        self._frames: Optional[Iterator[bytes]] = None
+        self._closed = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self._closed:
+            return
+        if self.file_path.endswith(".p3"):
+            self._frames = p3.iter_opus_frames_from_file(self.file_path)
+        else:
+            self._frames = iter_pcm_chunks_to_data(
+                decode_to_pcm_chunks(self.file_path), self.is_opus
+            )
+        try:
+            yield from self._frames
+        finally:
+            self.close()
+
+    def close(self):
+        """停止读取并释放文件映射、编码器等资源"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._frames is not None:
+            self._frames.close()
+            self._frames = None
+        if self.delete_after and os.path.exists(self.file_path):
+            os.remove(self.file_path)
@@ -1,5 +1,5 @@
 import base64
-import requests
+import asyncio
 import ormsgpack
 from pathlib import Path
 from pydantic import BaseModel, Field, conint, model_validator
@@ -7,6 +7,7 @@ from typing_extensions import Annotated
 from typing import Literal
 from core.utils.util import check_model_key, parse_string_to_list
 from core.providers.tts.base import TTSProviderBase
+from core.utils.tts_runtime import get_tts_runtime, write_audio_file
 from config.logger import setup_logging
 
 TAG = __name__
@@ -78,6 +79,7 @@ def read_ref_text(ref_text):
 
 
 class TTSProvider(TTSProviderBase):
+    async_io_safe = True
 
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
@@ -135,10 +137,16 @@ class TTSProvider(TTSProviderBase):
         self.seed = int(config.get("seed")) if config.get("seed") else None
         self.api_url = config.get("api_url", "http://127.0.0.1:8080/v1/tts")
 
-    async def text_to_speak(self, text, output_file):
-        # Prepare reference data
+    def _load_references(self):
         byte_audios = [audio_to_bytes(ref_audio) for ref_audio in self.reference_audio]
         ref_texts = [read_ref_text(ref_text) for ref_text in self.reference_text]
+        return byte_audios, ref_texts
+
+    async def text_to_speak(self, text, output_file):
+        # Prepare reference data，参考音频在线程池中读取，不阻塞共享事件循环
+        byte_audios, ref_texts = await asyncio.get_running_loop().run_in_executor(
+            None, self._load_references
+        )
 
         data = {
             "text": text,
@@ -161,7 +169,8 @@ class TTSProvider(TTSProviderBase):
 
         pydantic_data = ServeTTSRequest(**data)
 
-        response = requests.post(
+        session = get_tts_runtime().session(self.api_url)
+        async with session.post(
             self.api_url,
             data=ormsgpack.packb(
                 pydantic_data, option=ormsgpack.OPT_SERIALIZE_PYDANTIC
@@ -170,19 +179,20 @@ class TTSProvider(TTSProviderBase):
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/msgpack",
             },
-        )
+        ) as response:
+            status = response.status
+            content = await response.read()
 
-        if response.status_code == 200:
-            audio_content = response.content
+        if status == 200:
+            audio_content = content
 
             if output_file:
-                with open(output_file, "wb") as audio_file:
-                    audio_file.write(audio_content)
+                await write_audio_file(output_file, audio_content)
             else:
                 return audio_content
 
         else:
-            error_msg = f"Request failed with status code {response.status_code}"
+            error_msg = f"Request failed with status code {status}"
             print(error_msg)
-            print(response.json())
+            print(content.decode(errors="ignore"))
             raise Exception(error_msg)
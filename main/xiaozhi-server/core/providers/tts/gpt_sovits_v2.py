@@ -1,5 +1,5 @@
-import requests
 from config.logger import setup_logging
+from core.utils.tts_runtime import get_tts_runtime, write_audio_file
 from core.providers.tts.base import TTSProviderBase
 from core.utils.util import parse_string_to_list
 
@@ -8,6 +8,8 @@ logger = setup_logging()
 
 
 class TTSProvider(TTSProviderBase):
+    async_io_safe = True
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         self.url = config.get("url")
@@ -90,14 +92,16 @@ class TTSProvider(TTSProviderBase):
             "repetition_penalty": self.repetition_penalty,
         }
 
-        resp = requests.post(self.url, json=request_json)
-        if resp.status_code == 200:
+        session = get_tts_runtime().session(self.url)
+        async with session.post(self.url, json=request_json) as resp:
+            status = resp.status
+            content = await resp.read()
+        if status == 200:
             if output_file:
-                with open(output_file, "wb") as file:
-                    file.write(resp.content)
+                await write_audio_file(output_file, content)
             else:
-                return resp.content
+                return content
         else:
-            error_msg = f"GPT_SoVITS_V2 TTS请求失败: {resp.status_code} - {resp.text}"
+            error_msg = f"GPT_SoVITS_V2 TTS请求失败: {status} - {content.decode(errors='ignore')}"
             logger.bind(tag=TAG).error(error_msg)
             raise Exception(error_msg)
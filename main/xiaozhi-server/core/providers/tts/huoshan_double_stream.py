@@ -11,6 +11,7 @@ from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.util import check_model_key
 from core.providers.tts.base import TTSProviderBase
+from core.providers.tts.ws_pool import get_ws_pool
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 from asyncio import Task
 
@@ -72,6 +73,9 @@ EVENT_TTSSentenceEnd = 351
 
 EVENT_TTSResponse = 352
 
+# 被取代的会话等待服务端确认结束的最长时间（秒）
+STALE_SESSION_TIMEOUT = 10
+
 
 class Header:
     def __init__(
@@ -139,17 +143,28 @@ class Response:
         return super().__str__()
 
 
+def _route_response(msg):
+    """连接池按会话ID分发上游消息，解析结果直接交给对应会话"""
+    try:
+        res = TTSProvider.parser_response(msg)
+    except Exception:
+        # 解析失败的原样交出，由会话监听任务处理
+        return None, msg
+    return res.optional.sessionId, res
+
+
 class TTSProvider(TTSProviderBase):
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
+        # 当前会话租用的上游连接
         self.ws = None
         self.interface_type = InterfaceType.DUAL_STREAM
-        self._monitor_task = None  # 监听任务引用
+        self._monitor_task = None  # 当前会话的监听任务引用
+        self._monitor_tasks = set()
         self.appId = config.get("appid")
         self.access_token = config.get("access_token")
         self.cluster = config.get("cluster")
         self.resource_id = config.get("resource_id")
-        self.activate_session = False
         if config.get("private_voice"):
             self.voice = config.get("private_voice")
         else:
@@ -168,6 +183,17 @@ class TTSProvider(TTSProviderBase):
         self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
             sample_rate=16000, channels=1, frame_size_ms=60
         )
+        # 同一账号的所有设备共用上游连接池，会话按会话ID在连接上分发
+        self.pool = get_ws_pool(
+            f"huoshan_double_stream:{self.ws_url}:{self.appId}:{self.resource_id}",
+            max_connections=int(config.get("pool_max_connections", 64)),
+            max_sessions_per_connection=int(
+                config.get("pool_max_sessions_per_connection", 1)
+            ),
+            min_idle=int(config.get("pool_min_idle", 1)),
+            idle_timeout=float(config.get("pool_idle_timeout", 50)),
+            route=_route_response,
+        )
         model_key_msg = check_model_key("TTS", self.access_token)
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
@@ -180,34 +206,17 @@ class TTSProvider(TTSProviderBase):
             self.ws = None
             raise
 
-    async def _ensure_connection(self):
-        """建立新的WebSocket连接，并启动监听任务（仅第一次）"""
-        try:
-            if self.ws:
-                logger.bind(tag=TAG).info(f"使用已有链接...")
-                return self.ws
-            logger.bind(tag=TAG).debug("开始建立新连接...")
-            ws_header = {
-                "X-Api-App-Key": self.appId,
-                "X-Api-Access-Key": self.access_token,
-                "X-Api-Resource-Id": self.resource_id,
-                "X-Api-Connect-Id": uuid.uuid4(),
-            }
-            self.ws = await websockets.connect(
-                self.ws_url, additional_headers=ws_header, max_size=1000000000
-            )
-            logger.bind(tag=TAG).debug("WebSocket连接建立成功")
-            
-            # 连接建立成功后，启动监听任务
-            if self._monitor_task is None or self._monitor_task.done():
-                logger.bind(tag=TAG).debug("启动监听任务...")
-                self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
-            
-            return self.ws
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
-            self.ws = None
-            raise
+    def _connect(self):
+        """新建上游连接，供连接池调用"""
+        ws_header = {
+            "X-Api-App-Key": self.appId,
+            "X-Api-Access-Key": self.access_token,
+            "X-Api-Resource-Id": self.resource_id,
+            "X-Api-Connect-Id": str(uuid.uuid4()),
+        }
+        return websockets.connect(
+            self.ws_url, additional_headers=ws_header, max_size=1000000000
+        )
 
     def tts_text_priority_thread(self):
         """火山引擎双流式TTS的文本处理线程"""
@@ -274,7 +283,7 @@ class TTSProvider(TTSProviderBase):
                     )
                     if message.content_file and os.path.exists(message.content_file):
                         # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+                        self.handle_audio_file_source(message.content_file, message.content_detail)
                 if message.sentence_type == SentenceType.LAST:
                     try:
                         logger.bind(tag=TAG).debug("开始结束TTS会话...")
@@ -299,7 +308,7 @@ class TTSProvider(TTSProviderBase):
         """发送文本到TTS服务"""
         try:
             # 建立新连接
-            if self.ws is None:
+            if self.ws is None or self.ws.released:
                 logger.bind(tag=TAG).warning(f"WebSocket连接不存在，终止发送文本")
                 return
 
@@ -321,23 +330,19 @@ class TTSProvider(TTSProviderBase):
 
     async def start_session(self, session_id):
         logger.bind(tag=TAG).debug(f"开始会话～～{session_id}")
-        try:       
-            # 等待上一个会话结束，最多等待3次
-            for _ in range(3):
-                if not self.activate_session:
-                    break
-                logger.bind(tag=TAG).debug(f"等待上一个会话结束...")
-                await asyncio.sleep(0.1)
-            else:
-                # 等待超时，强制清除连接状态
-                logger.bind(tag=TAG).debug("等待上一个会话超时，清除连接状态...")
-                await self.close()
-            
-            # 设置会话激活标志
-            self.activate_session = True
-            
-            # 确保连接建立
-            await self._ensure_connection()
+        try:
+            # 上一个会话未结束时取消它，它的监听任务收到取消确认后归还连接
+            if self.ws and not self.ws.released:
+                logger.bind(tag=TAG).debug("上一个会话未结束，发送取消请求")
+                await self.cancel_session(self.ws.session_id)
+
+            # 从连接池租用上游连接（通常是预热好的连接）
+            self.ws = await self.pool.open_session(session_id, self._connect)
+            self._monitor_task = asyncio.create_task(
+                self._start_monitor_tts_response(self.ws)
+            )
+            self._monitor_tasks.add(self._monitor_task)
+            self._monitor_task.add_done_callback(self._monitor_tasks.discard)
 
             header = Header(
                 message_type=FULL_CLIENT_REQUEST,
@@ -361,7 +366,7 @@ class TTSProvider(TTSProviderBase):
     async def finish_session(self, session_id):
         logger.bind(tag=TAG).debug(f"关闭会话～～{session_id}")
         try:
-            if self.ws:
+            if self.ws and not self.ws.released:
                 header = Header(
                     message_type=FULL_CLIENT_REQUEST,
                     message_type_specific_flags=MsgTypeFlagWithEvent,
@@ -383,7 +388,7 @@ class TTSProvider(TTSProviderBase):
     async def cancel_session(self,session_id):
         logger.bind(tag=TAG).debug(f"取消会话，释放服务端资源～～{session_id}")
         try:
-            if self.ws:
+            if self.ws and not self.ws.released:
                 header = Header(
                     message_type=FULL_CLIENT_REQUEST,
                     message_type_specific_flags=MsgTypeFlagWithEvent,
@@ -403,47 +408,62 @@ class TTSProvider(TTSProviderBase):
 
     async def close(self):
         """资源清理方法"""
-        self.activate_session = False
-        # 取消监听任务
-        if self._monitor_task:
+        # 取消所有会话的监听任务
+        for task in list(self._monitor_tasks):
             try:
-                self._monitor_task.cancel()
-                await self._monitor_task
+                task.cancel()
+                await task
             except asyncio.CancelledError:
                 pass
             except Exception as e:
                 logger.bind(tag=TAG).warning(f"关闭时取消监听任务错误: {e}")
-            self._monitor_task = None
+        self._monitor_task = None
 
+        # 未正常结束的会话所在连接状态未知，不再放回连接池
         if self.ws:
-            try:
-                await self.ws.close()
-            except:
-                pass
+            await self.ws.close()
             self.ws = None
 
-    async def _start_monitor_tts_response(self):
-        """监听TTS响应 - 长期运行"""
+    async def _start_monitor_tts_response(self, session):
+        """监听一个会话的TTS响应，会话结束后把连接归还连接池"""
+        session_id = session.session_id
+        reusable = False
         try:
             while not self.conn.stop_event.is_set():
                 try:
-                    # 确保 `recv()` 运行在同一个 event loop
-                    msg = await self.ws.recv()
-                    res = self.parser_response(msg)
+                    # 被新会话取代的会话只等待服务端确认结束，超时则放弃这条连接
+                    timeout = (
+                        None
+                        if self.conn.sentence_id == session_id
+                        else STALE_SESSION_TIMEOUT
+                    )
+                    res = await asyncio.wait_for(session.recv(), timeout)
+                    if not isinstance(res, Response):
+                        res = self.parser_response(res)
                     self.print_response(res, "send_text res:")
 
-                    # 只处理当前活跃会话的响应
-                    if res.optional.sessionId and self.conn.sentence_id != res.optional.sessionId:
-                        # 如果是会话结束相关事件，即使会话ID不匹配也要重置状态
-                        if res.optional.event in [EVENT_SessionCanceled, EVENT_SessionFailed, EVENT_SessionFinished]:
-                            logger.bind(tag=TAG).debug(f"收到残余下行结束响应重置会话状态～～")
-                            self.activate_session = False
+                    if res.optional.event in [
+                        EVENT_SessionCanceled,
+                        EVENT_SessionFailed,
+                        EVENT_SessionFinished,
+                    ]:
+                        # 只有当前活跃会话需要播放收尾的音频文件
+                        if (
+                            res.optional.event == EVENT_SessionFinished
+                            and self.conn.sentence_id == session_id
+                        ):
+                            logger.bind(tag=TAG).debug(f"会话结束～～")
+                            self._process_before_stop_play_files()
+                        else:
+                            logger.bind(tag=TAG).debug(f"会话已释放～～{session_id}")
+                        reusable = True
+                        break
+
+                    # 已被新会话取代的会话，丢弃残余的下行数据
+                    if self.conn.sentence_id != session_id:
                         continue
 
-                    if res.optional.event == EVENT_SessionCanceled:
-                        logger.bind(tag=TAG).debug(f"释放服务端资源成功～～")
-                        self.activate_session = False
-                    elif res.optional.event == EVENT_TTSSentenceStart:
+                    if res.optional.event == EVENT_TTSSentenceStart:
                         json_data = json.loads(res.payload.decode("utf-8"))
                         self.tts_text = json_data.get("text", "")
                         logger.bind(tag=TAG).debug(f"句子语音生成开始: {self.tts_text}")
@@ -457,29 +477,26 @@ class TTSProvider(TTSProviderBase):
                         self.wav_to_opus_data_audio_raw_stream(res.payload, callback=self.handle_opus)
                     elif res.optional.event == EVENT_TTSSentenceEnd:
                         logger.bind(tag=TAG).info(f"句子语音生成成功：{self.tts_text}")
-                    elif res.optional.event == EVENT_SessionFinished:
-                        logger.bind(tag=TAG).debug(f"会话结束～～")
-                        self.activate_session = False
-                        self._process_before_stop_play_files()
                 except websockets.ConnectionClosed:
                     logger.bind(tag=TAG).warning("WebSocket连接已关闭")
                     break
+                except asyncio.TimeoutError:
+                    logger.bind(tag=TAG).warning(f"等待会话结束超时: {session_id}")
+                    break
                 except Exception as e:
                     logger.bind(tag=TAG).error(
                         f"Error in _start_monitor_tts_response: {e}"
                     )
                     traceback.print_exc()
                     break
-            # 连接异常时关闭WebSocket
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
-        # 监听任务退出时清理引用
         finally:
-            self._monitor_task = None
+            # 正常结束的会话归还连接，异常退出的连接直接关闭
+            if reusable:
+                session.release()
+            else:
+                await session.close()
+            if self.ws is session:
+                self.ws = None
 
     async def send_event(
         self,
@@ -514,7 +531,8 @@ class TTSProvider(TTSProviderBase):
         return await self.send_event(self.ws, header, optional, payload)
 
     # 读取 res 数组某段 字符串内容
-    def read_res_content(self, res: bytes, offset: int):
+    @staticmethod
+    def read_res_content(res: bytes, offset: int):
         content_size = int.from_bytes(res[offset : offset + 4], "big", signed=True)
         offset += 4
         content = res[offset : offset + content_size].decode('utf-8')
@@ -522,14 +540,16 @@ class TTSProvider(TTSProviderBase):
         return content, offset
 
     # 读取 payload
-    def read_res_payload(self, res: bytes, offset: int):
+    @staticmethod
+    def read_res_payload(res: bytes, offset: int):
         payload_size = int.from_bytes(res[offset : offset + 4], "big", signed=True)
         offset += 4
         payload = res[offset : offset + payload_size]
         offset += payload_size
         return payload, offset
 
-    def parser_response(self, res) -> Response:
+    @staticmethod
+    def parser_response(res) -> Response:
         if isinstance(res, str):
             raise RuntimeError(res)
         response = Response(Header(), Optional())
@@ -556,9 +576,9 @@ class TTSProvider(TTSProviderBase):
                     return response
                 # read connectionId
                 elif optional.event == EVENT_ConnectionStarted:
-                    optional.connectionId, offset = self.read_res_content(res, offset)
+                    optional.connectionId, offset = TTSProvider.read_res_content(res, offset)
                 elif optional.event == EVENT_ConnectionFailed:
-                    optional.response_meta_json, offset = self.read_res_content(
+                    optional.response_meta_json, offset = TTSProvider.read_res_content(
                         res, offset
                     )
                 elif (
@@ -566,20 +586,20 @@ class TTSProvider(TTSProviderBase):
                     or optional.event == EVENT_SessionFailed
                     or optional.event == EVENT_SessionFinished
                 ):
-                    optional.sessionId, offset = self.read_res_content(res, offset)
-                    optional.response_meta_json, offset = self.read_res_content(
+                    optional.sessionId, offset = TTSProvider.read_res_content(res, offset)
+                    optional.response_meta_json, offset = TTSProvider.read_res_content(
                         res, offset
                     )
                 else:
-                    optional.sessionId, offset = self.read_res_content(res, offset)
-                    response.payload, offset = self.read_res_payload(res, offset)
+                    optional.sessionId, offset = TTSProvider.read_res_content(res, offset)
+                    response.payload, offset = TTSProvider.read_res_payload(res, offset)
 
         elif header.message_type == ERROR_INFORMATION:
             optional.errorCode = int.from_bytes(
                 res[offset : offset + 4], "big", signed=True
             )
             offset += 4
-            response.payload, offset = self.read_res_payload(res, offset)
+            response.payload, offset = TTSProvider.read_res_payload(res, offset)
         return response
 
     async def start_connection(self):
@@ -1,14 +1,13 @@
 import os
 import time
 import queue
-import aiohttp
-import asyncio
 import requests
 import traceback
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
 from core.providers.tts.base import TTSProviderBase
-from core.utils import opus_encoder_utils, textUtils
+from core.utils.tts_runtime import get_tts_runtime
+from core.utils import opus_encoder_utils
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 
 TAG = __name__
@@ -41,12 +40,10 @@ class TTSProvider(TTSProviderBase):
                 if message.sentence_type == SentenceType.FIRST:
                     # 初始化参数
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
+                    self.segmenter.reset()
                     self.before_stop_play_files.clear()
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
+                    segment_text = self._get_segment_text(message.content_detail)
                     if segment_text:
                         self.to_tts_single_stream(segment_text)
 
@@ -56,7 +53,7 @@ class TTSProvider(TTSProviderBase):
                     )
                     if message.content_file and os.path.exists(message.content_file):
                         # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+                        self.handle_audio_file_source(message.content_file, message.content_detail)
                 if message.sentence_type == SentenceType.LAST:
                     # 处理剩余的文本
                     self._process_remaining_text_stream(True)
@@ -74,15 +71,9 @@ class TTSProvider(TTSProviderBase):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                self.to_tts_single_stream(segment_text, is_last)
-                self.processed_chars += len(full_text)
-            else:
-                self._process_before_stop_play_files()
+        segment_text = self._pop_remaining_text()
+        if segment_text:
+            self.to_tts_single_stream(segment_text, is_last)
         else:
             self._process_before_stop_play_files()
 
@@ -91,7 +82,7 @@ class TTSProvider(TTSProviderBase):
             max_repeat_time = 5
             text = MarkdownCleaner.clean_markdown(text)
             try:
-                asyncio.run(self.text_to_speak(text, is_last))
+                self._speak_stream(text, is_last)
             except Exception as e:
                 logger.bind(tag=TAG).warning(
                     f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -111,9 +102,51 @@ class TTSProvider(TTSProviderBase):
         finally:
             return None
 
-    async def text_to_speak(self, text, is_last):
-        """流式处理TTS音频，每句只推送一次音频列表"""
-        await self._tts_request(text, is_last)
+    def _speak_stream(self, text, is_last):
+        """共享TTS运行时只负责网络IO，收到的PCM在本连接的TTS线程中编码为Opus"""
+        # 一帧 PCM 所需字节数：60 ms &times; 16 kHz &times; 1 ch &times; 2 B
+        frame_bytes = int(
+            self.opus_encoder.sample_rate
+            * self.opus_encoder.channels  # 1
+            * self.opus_encoder.frame_size_ms
+            / 1000
+            * 2
+        )  # 16-bit = 2 bytes
+        self.pcm_buffer.clear()
+        try:
+            for pcm_data in get_tts_runtime().iterate(self.text_to_speak_stream(text)):
+                # 拼到 buffer
+                self.pcm_buffer.extend(pcm_data)
+
+                # 够一帧就编码
+                while len(self.pcm_buffer) >= frame_bytes:
+                    frame = bytes(self.pcm_buffer[:frame_bytes])
+                    del self.pcm_buffer[:frame_bytes]
+
+                    self.opus_encoder.encode_pcm_to_opus_stream(
+                        frame, end_of_stream=False, callback=self.handle_opus
+                    )
+
+            # flush 剩余不足一帧的数据
+            if self.pcm_buffer:
+                self.opus_encoder.encode_pcm_to_opus_stream(
+                    bytes(self.pcm_buffer),
+                    end_of_stream=True,
+                    callback=self.handle_opus,
+                )
+                self.pcm_buffer.clear()
+
+            # 如果是最后一段，输出音频获取完毕
+            if is_last:
+                self._process_before_stop_play_files()
+
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"TTS请求异常: {e}")
+            self.tts_audio_queue.put((SentenceType.LAST, [], None))
+
+    async def text_to_speak(self, text, output_file):
+        """整句合成，返回PCM数据"""
+        return b"".join([pcm async for pcm in self.text_to_speak_stream(text)])
 
     async def close(self):
         """资源清理"""
@@ -121,7 +154,8 @@ class TTSProvider(TTSProviderBase):
         if hasattr(self, "opus_encoder"):
             self.opus_encoder.close()
 
-    async def _tts_request(self, text: str, is_last: bool) -> None:
+    async def text_to_speak_stream(self, text):
+        """流式请求TTS，按到达顺序返回PCM数据块"""
         params = {
             "tts_text": text,
             "spk_id": self.voice,
@@ -136,67 +170,21 @@ class TTSProvider(TTSProviderBase):
             "Content-Type": "application/json",
         }
 
-        # 一帧 PCM 所需字节数：60 ms &times; 16 kHz &times; 1 ch &times; 2 B = 1 920
-        frame_bytes = int(
-            self.opus_encoder.sample_rate
-            * self.opus_encoder.channels  # 1
-            * self.opus_encoder.frame_size_ms
-            / 1000
-            * 2
-        )  # 16-bit = 2 bytes
+        session = get_tts_runtime().session(self.api_url)
+        async with session.get(
+            self.api_url, params=params, headers=headers, timeout=10
+        ) as resp:
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    self.api_url, params=params, headers=headers, timeout=10
-                ) as resp:
-
-                    if resp.status != 200:
-                        logger.bind(tag=TAG).error(
-                            f"TTS请求失败: {resp.status}, {await resp.text()}"
-                        )
-                        self.tts_audio_queue.put((SentenceType.LAST, [], None))
-                        return
-
-                    self.pcm_buffer.clear()
-                    self.tts_audio_queue.put((SentenceType.FIRST, [], text))
-
-                    # 兼容 iter_chunked / iter_chunks / iter_any
-                    async for chunk in resp.content.iter_any():
-                        data = chunk[0] if isinstance(chunk, (list, tuple)) else chunk
-                        if not data:
-                            continue
-
-                        # 拼到 buffer
-                        self.pcm_buffer.extend(data)
-
-                        # 够一帧就编码
-                        while len(self.pcm_buffer) >= frame_bytes:
-                            frame = bytes(self.pcm_buffer[:frame_bytes])
-                            del self.pcm_buffer[:frame_bytes]
-
-                            self.opus_encoder.encode_pcm_to_opus_stream(
-                                frame,
-                                end_of_stream=False,
-                                callback=self.handle_opus
-                            )
-
-                    # flush 剩余不足一帧的数据
-                    if self.pcm_buffer:
-                        self.opus_encoder.encode_pcm_to_opus_stream(
-                            bytes(self.pcm_buffer),
-                            end_of_stream=True,
-                            callback=self.handle_opus
-                        )
-                        self.pcm_buffer.clear()
-
-                    # 如果是最后一段，输出音频获取完毕
-                    if is_last:
-                        self._process_before_stop_play_files()
+            if resp.status != 200:
+                raise Exception(f"TTS请求失败: {resp.status}, {await resp.text()}")
 
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"TTS请求异常: {e}")
-            self.tts_audio_queue.put((SentenceType.LAST, [], None))
+            self.tts_audio_queue.put((SentenceType.FIRST, [], text))
+
+            # 兼容 iter_chunked / iter_chunks / iter_any
+            async for chunk in resp.content.iter_any():
+                data = chunk[0] if isinstance(chunk, (list, tuple)) else chunk
+                if data:
+                    yield data
 
     def to_tts(self, text: str) -> list:
         """非流式TTS处理，用于测试及保存音频文件的场景
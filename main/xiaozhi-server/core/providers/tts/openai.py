@@ -1,5 +1,5 @@
-import requests
 from core.utils.util import check_model_key
+from core.utils.tts_runtime import get_tts_runtime, write_audio_file
 from core.providers.tts.base import TTSProviderBase
 from config.logger import setup_logging
 
@@ -8,6 +8,8 @@ logger = setup_logging()
 
 
 class TTSProvider(TTSProviderBase):
+    async_io_safe = True
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         self.api_key = config.get("api_key")
@@ -41,14 +43,15 @@ class TTSProvider(TTSProviderBase):
             "response_format": "wav",
             "speed": self.speed,
         }
-        response = requests.post(self.api_url, json=data, headers=headers)
-        if response.status_code == 200:
-            if output_file:
-                with open(output_file, "wb") as audio_file:
-                    audio_file.write(response.content)
+        session = get_tts_runtime().session(self.api_url)
+        async with session.post(self.api_url, json=data, headers=headers) as response:
+            content = await response.read()
+            if response.status == 200:
+                if output_file:
+                    await write_audio_file(output_file, content)
+                else:
+                    return content
             else:
-                return response.content
-        else:
-            raise Exception(
-                f"OpenAI TTS请求失败: {response.status_code} - {response.text}"
-            )
+                raise Exception(
+                    f"OpenAI TTS请求失败: {response.status} - {content.decode(errors='ignore')}"
+                )
@@ -0,0 +1,164 @@
+"""
+分句合成流水线
+非流式TTS逐句合成时，后一句要等前一句合成完才开始请求，慢句子前后会出现停顿。
+流水线最多同时合成K句，合成结果按句子顺序送入播放队列：
+队首句子的音频边合成边播放，后面的句子先缓存，轮到它时再转发。
+"""
+
+import queue
+import threading
+import concurrent.futures
+from typing import Any, Callable, Optional
+from config.logger import setup_logging
+from core.providers.tts.dto.dto import SentenceType
+
+TAG = __name__
+logger = setup_logging()
+
+_END = object()
+# 转发线程等待队首句子时检查打断的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.1
+
+
+def close_audio_item(item):
+    """关闭被丢弃的播放队列消息中的音频文件（FileAudioSource），释放文件句柄并删除临时文件"""
+    audio = item[1] if isinstance(item, tuple) and len(item) > 1 else None
+    if callable(getattr(audio, "close", None)):
+        audio.close()
+
+
+class PipelineJob:
+    """流水线中的一句话，合成结果先放在自己的队列里，由转发线程按顺序取出"""
+
+    def __init__(self, pipeline: "SentencePipeline"):
+        self.pipeline = pipeline
+        self.generation = pipeline.generation
+        self.items: "queue.Queue[Any]" = queue.Queue()
+        self.future: Optional[concurrent.futures.Future] = None
+
+    def is_cancelled(self) -> bool:
+        """打断后返回True，合成函数据此停止重试和解码"""
+        return self.generation != self.pipeline.generation
+
+    def put(self, item):
+        """与tts_audio_queue.put相同的接口，to_tts_stream可以直接写入"""
+        self.items.put(item)
+
+    def handle_opus(self, opus_data: bytes):
+        self.items.put((SentenceType.MIDDLE, opus_data, None))
+
+    def close(self):
+        self.items.put(_END)
+
+
+class SentencePipeline:
+    """有界预合成流水线，每个TTS实例（即每个连接）一个"""
+
+    def __init__(self, output_queue: queue.Queue, lookahead: int, name: str = "tts"):
+        """
+        Args:
+            output_queue: 最终的播放队列
+            lookahead: 最多同时合成的句子数，1表示逐句串行
+            name: 线程名前缀
+        """
+        self.output_queue = output_queue
+        self.lookahead = max(1, lookahead)
+        self.generation = 0
+        self._slots = threading.Semaphore(self.lookahead)
+        self._jobs: "queue.Queue[Optional[PipelineJob]]" = queue.Queue()
+        # 打断后旧句子正在进行的请求不能中途停止，多留一倍线程，新句子不用排在它们后面
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.lookahead * 2, thread_name_prefix=f"{name}-synth"
+        )
+        self._forwarder = threading.Thread(
+            target=self._forward, name=f"{name}-pipeline", daemon=True
+        )
+        self._forwarder.start()
+
+    def submit(self, fn: Callable[[PipelineJob], None]):
+        """提交一句话的合成任务，fn把音频写入传入的job并在job.is_cancelled()时尽快返回；
+        已有K句未播放完时阻塞等待"""
+        self._slots.acquire()
+        job = PipelineJob(self)
+        try:
+            job.future = self._executor.submit(self._run, fn, job)
+        except RuntimeError:
+            # 流水线已关闭
+            job.close()
+        else:
+            # 还没开始执行就被取消的任务不会自己结束，在这里补上结束标记
+            job.future.add_done_callback(lambda f: f.cancelled() and job.close())
+        self._jobs.put(job)
+
+    def put(self, item):
+        """按顺序插入一条不需要合成的消息（如句子结束标记）"""
+        self._slots.acquire()
+        job = PipelineJob(self)
+        job.put(item)
+        job.close()
+        self._jobs.put(job)
+
+    def cancel(self):
+        """打断时调用：丢弃所有未播放的句子，尚未开始的合成直接取消，
+        正在合成的句子通过job.is_cancelled()得知打断后自行结束"""
+        self.generation += 1
+
+    def close(self):
+        self.cancel()
+        self._jobs.put(None)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn: Callable[[PipelineJob], None], job: PipelineJob):
+        try:
+            if not job.is_cancelled():
+                fn(job)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"分句合成失败: {e}")
+        finally:
+            job.close()
+
+    def _forward(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                self._forward_job(job)
+            finally:
+                self._slots.release()
+
+    def _forward_job(self, job: PipelineJob):
+        """按顺序转发一句话的音频；句子被打断时立即让出名额，剩余数据在后台丢弃"""
+        while True:
+            if job.is_cancelled():
+                self._discard(job)
+                return
+            try:
+                item = job.items.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is _END:
+                return
+            if job.is_cancelled():
+                close_audio_item(item)
+                self._discard(job)
+                return
+            self.output_queue.put(item)
+
+    def _discard(self, job: PipelineJob):
+        if job.future is None or job.future.done():
+            self._drain(job)
+            return
+        job.future.cancel()
+        # 合成结束（或取消）后结束标记已写入，再一次性清空
+        job.future.add_done_callback(lambda f: self._drain(job))
+
+    def _drain(self, job: PipelineJob):
+        while True:
+            try:
+                item = job.items.get_nowait()
+            except queue.Empty:
+                return
+            if item is _END:
+                return
+            close_audio_item(item)
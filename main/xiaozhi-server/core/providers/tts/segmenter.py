@@ -0,0 +1,110 @@
+"""
+流式文本分句
+LLM逐token输出时，原来每来一个token都把整段回复重新拼接一遍，再对未处理部分逐个标点rfind，
+耗时随回复长度平方增长。分句器只扫描新到的文本，待切分的文本按片段保存，
+切出一句时才拼接这一句，每个字符只被扫描和拼接一次。
+"""
+
+import time
+from typing import Dict, List, Optional
+
+# 句子结束标点
+SENTENCE_PUNCTUATIONS = frozenset("。？?！!；;：")
+# 首句额外允许切分的标点，让首句尽早送去合成
+FIRST_SENTENCE_PUNCTUATIONS = SENTENCE_PUNCTUATIONS | frozenset("，~、,")
+
+
+class TextSegmenter:
+    """增量分句器，每轮对话开始时reset，每个token调用feed，结束时调用flush"""
+
+    def __init__(
+        self,
+        first_min_chars: int = 0,
+        first_comma_split: bool = True,
+        first_max_wait_ms: int = 0,
+    ):
+        """
+        Args:
+            first_min_chars: 首句至少累积的字数，不足时不在逗号等处切分
+            first_comma_split: 首句是否在逗号、顿号等处切分
+            first_max_wait_ms: 首句从收到第一个字起最长等待时间（毫秒），
+                超时后在下一个token到达时直接切分，0表示不限制
+        """
+        self.first_min_chars = max(0, first_min_chars)
+        self.first_comma_split = first_comma_split
+        self.first_max_wait = max(0, first_max_wait_ms) / 1000
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "TextSegmenter":
+        """按配置文件中的tts_segment创建"""
+        config = config or {}
+        return cls(
+            first_min_chars=int(config.get("first_min_chars", 0)),
+            first_comma_split=bool(config.get("first_comma_split", True)),
+            first_max_wait_ms=int(config.get("first_max_wait_ms", 0)),
+        )
+
+    def reset(self):
+        """开始新一轮回复"""
+        self._chunks: List[str] = []
+        # 待切分文本的总长度
+        self._pending = 0
+        # 待切分文本中最后一个可切分位置（切分点之后的长度），-1表示没有
+        self._cut = -1
+        self.is_first_sentence = True
+        self._first_text_time = 0.0
+
+    def feed(self, delta: str) -> Optional[str]:
+        """追加一段新文本，有可切分的句子时返回切出的文本（可能包含多句）"""
+        if not delta:
+            return None
+        if self._pending == 0 and self.is_first_sentence:
+            self._first_text_time = time.monotonic()
+
+        punctuations = (
+            FIRST_SENTENCE_PUNCTUATIONS
+            if self.is_first_sentence and self.first_comma_split
+            else SENTENCE_PUNCTUATIONS
+        )
+        for i, char in enumerate(delta):
+            if char not in punctuations:
+                continue
+            if (
+                self.is_first_sentence
+                and char not in SENTENCE_PUNCTUATIONS
+                and self._pending + i + 1 < self.first_min_chars
+            ):
+                continue
+            self._cut = self._pending + i + 1
+        self._chunks.append(delta)
+        self._pending += len(delta)
+
+        if self._cut == -1 and self._first_wait_expired():
+            self._cut = self._pending
+        if self._cut == -1:
+            return None
+        return self._take(self._cut)
+
+    def flush(self) -> Optional[str]:
+        """取出剩余的全部文本"""
+        if self._pending == 0:
+            return None
+        return self._take(self._pending)
+
+    def _first_wait_expired(self) -> bool:
+        return (
+            self.is_first_sentence
+            and self.first_max_wait > 0
+            and self._pending >= self.first_min_chars
+            and time.monotonic() - self._first_text_time >= self.first_max_wait
+        )
+
+    def _take(self, length: int) -> str:
+        text = "".join(self._chunks)
+        segment, rest = text[:length], text[length:]
+        self._chunks = [rest] if rest else []
+        self._pending = len(rest)
+        self._cut = -1
+        self.is_first_sentence = False
+        return segment
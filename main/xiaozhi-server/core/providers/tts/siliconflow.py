@@ -1,8 +1,10 @@
-import requests
 from core.providers.tts.base import TTSProviderBase
+from core.utils.tts_runtime import get_tts_runtime, write_audio_file
 
 
 class TTSProvider(TTSProviderBase):
+    async_io_safe = True
+
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         self.model = config.get("model")
@@ -32,13 +34,13 @@ class TTSProvider(TTSProviderBase):
             "Content-Type": "application/json",
         }
         try:
-            response = requests.request(
-                "POST", self.api_url, json=request_json, headers=headers
-            )
-            data = response.content
+            session = get_tts_runtime().session(self.api_url)
+            async with session.post(
+                self.api_url, json=request_json, headers=headers
+            ) as response:
+                data = await response.read()
             if output_file:
-                with open(output_file, "wb") as file_to_save:
-                    file_to_save.write(data)
+                await write_audio_file(output_file, data)
             else:
                 return data
         except Exception as e:
@@ -0,0 +1,261 @@
+"""
+上游WebSocket连接池
+双流式TTS原先每个设备连接各自持有一条上游WebSocket和一个监听任务，新会话开始时才建连。
+连接池按TTS服务（地址+账号）在进程内共享：每条上游连接只有一个读取任务，按会话ID把消息
+分发给对应会话；协议不带会话ID的，一条连接同时只租给一个会话。池中保持少量预热连接，
+首句合成不再等待TCP/TLS握手，上游连接数受max_connections限制，与设备连接数无关。
+"""
+
+import time
+import asyncio
+import websockets
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 建立上游连接的协程工厂，每次调用返回一条新连接
+Connector = Callable[[], Awaitable[Any]]
+# 解析上游消息，返回 (会话ID, 交给会话的数据)；会话ID为None时交给连接上唯一的会话
+Router = Callable[[Any], Tuple[Optional[str], Any]]
+
+
+class PooledSession:
+    """一次TTS会话对上游连接的租用，send/recv/close与websocket连接用法一致"""
+
+    def __init__(self, connection: "_PooledConnection", session_id: str):
+        self._connection = connection
+        self.session_id = session_id
+        self._inbox: "asyncio.Queue[Any]" = asyncio.Queue()
+        self.released = False
+
+    async def send(self, data):
+        if self.released:
+            raise websockets.ConnectionClosedError(None, None)
+        await self._connection.ws.send(data)
+
+    async def recv(self):
+        """接收分发给本会话的消息，上游连接断开时抛出ConnectionClosed"""
+        item = await self._inbox.get()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def release(self):
+        """会话正常结束，上游连接放回池中复用"""
+        self._connection.pool._release(self, reusable=True)
+
+    async def close(self):
+        """会话异常结束，上游连接状态不可信，直接关闭"""
+        self._connection.pool._release(self, reusable=False)
+
+
+class _PooledConnection:
+    """池中的一条上游连接"""
+
+    def __init__(self, pool: "WebSocketPool", ws):
+        self.pool = pool
+        self.ws = ws
+        self.sessions: Dict[str, PooledSession] = {}
+        self.idle_since = time.monotonic()
+        self.closed = False
+        self.reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        error: BaseException = websockets.ConnectionClosedError(None, None)
+        try:
+            while True:
+                msg = await self.ws.recv()
+                self._dispatch(msg)
+        except websockets.ConnectionClosed as e:
+            error = e
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"{self.pool.name}上游连接读取失败: {e}")
+            error = e
+        finally:
+            self.pool._on_connection_lost(self, error)
+
+    def _dispatch(self, msg):
+        session_id, item = self.pool.route(msg) if self.pool.route else (None, msg)
+        if session_id is not None:
+            session = self.sessions.get(session_id)
+        elif len(self.sessions) == 1:
+            session = next(iter(self.sessions.values()))
+        else:
+            session = None
+        if session is None:
+            # 已结束会话的残余消息
+            logger.bind(tag=TAG).debug(f"{self.pool.name}丢弃无主消息: {session_id}")
+            return
+        session._inbox.put_nowait(item)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.reader.cancel()
+        asyncio.ensure_future(self._close_ws())
+
+    async def _close_ws(self):
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+
+class WebSocketPool:
+    """同一TTS服务的上游连接池，只在事件循环线程中使用"""
+
+    def __init__(
+        self,
+        name: str,
+        max_connections: int = 64,
+        max_sessions_per_connection: int = 1,
+        min_idle: int = 1,
+        idle_timeout: float = 50,
+        route: Optional[Router] = None,
+    ):
+        """
+        Args:
+            name: 池名称，用于日志
+            max_connections: 上游连接数上限，超出时新会话排队等待
+            max_sessions_per_connection: 每条连接同时承载的会话数，需要route按会话ID分发
+            min_idle: 有会话开始时保持的预热空闲连接数
+            idle_timeout: 空闲超过该时长（秒）的连接不再复用，应小于服务端的空闲断开时间
+            route: 按会话ID分发消息的解析函数
+        """
+        self.name = name
+        self.max_connections = max(1, max_connections)
+        self.max_sessions_per_connection = (
+            max(1, max_sessions_per_connection) if route else 1
+        )
+        self.min_idle = max(0, min_idle)
+        self.idle_timeout = idle_timeout
+        self.route = route
+        self._connections: List[_PooledConnection] = []
+        self._connecting = 0
+        self._connector: Optional[Connector] = None
+        self._changed = asyncio.Event()
+
+    async def open_session(
+        self, session_id: str, connector: Connector, timeout: float = 10
+    ) -> PooledSession:
+        """为会话租用一条上游连接，优先使用预热连接，没有可用连接时新建或排队等待
+
+        Args:
+            session_id: 会话ID，需与上游消息中的会话ID一致
+            connector: 建连工厂，同时用于后台预热（凭证可能更新，总是用最新的）
+            timeout: 排队等待的最长时间（秒）
+        """
+        self._connector = connector
+        deadline = time.monotonic() + timeout
+        while True:
+            connection = self._pick()
+            if connection is None and self._total() < self.max_connections:
+                connection = await self._open()
+            if connection is not None and not connection.closed:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{self.name}上游连接已满（{self.max_connections}）")
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+        session = PooledSession(connection, session_id)
+        connection.sessions[session_id] = session
+        self._warm_up()
+        return session
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections": len(self._connections),
+            "idle": sum(1 for c in self._connections if not c.sessions),
+            "sessions": sum(len(c.sessions) for c in self._connections),
+        }
+
+    def _total(self) -> int:
+        return len(self._connections) + self._connecting
+
+    def _pick(self) -> Optional[_PooledConnection]:
+        """选出承载会话最少的可用连接，顺便淘汰空闲过久的连接"""
+        now = time.monotonic()
+        best = None
+        for connection in list(self._connections):
+            if not connection.sessions and now - connection.idle_since > self.idle_timeout:
+                self._discard(connection)
+                continue
+            if len(connection.sessions) >= self.max_sessions_per_connection:
+                continue
+            if best is None or len(connection.sessions) < len(best.sessions):
+                best = connection
+        return best
+
+    async def _open(self) -> _PooledConnection:
+        self._connecting += 1
+        try:
+            ws = await self._connector()
+        finally:
+            self._connecting -= 1
+            self._changed.set()
+        connection = _PooledConnection(self, ws)
+        self._connections.append(connection)
+        logger.bind(tag=TAG).debug(f"{self.name}新建上游连接，当前{self.stats()}")
+        return connection
+
+    def _warm_up(self):
+        """补足预热的空闲连接"""
+        idle = sum(1 for c in self._connections if not c.sessions) + self._connecting
+        for _ in range(min(self.min_idle - idle, self.max_connections - self._total())):
+            asyncio.ensure_future(self._open_idle())
+
+    async def _open_idle(self):
+        try:
+            await self._open()
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"{self.name}预热上游连接失败: {e}")
+
+    def _release(self, session: PooledSession, reusable: bool):
+        if session.released:
+            return
+        session.released = True
+        connection = session._connection
+        connection.sessions.pop(session.session_id, None)
+        if not reusable or connection.closed:
+            # 唤醒仍在等待消息的会话监听任务
+            session._inbox.put_nowait(websockets.ConnectionClosedError(None, None))
+            self._discard(connection)
+        elif not connection.sessions:
+            connection.idle_since = time.monotonic()
+        self._changed.set()
+
+    def _discard(self, connection: _PooledConnection):
+        if connection in self._connections:
+            self._connections.remove(connection)
+        connection.close()
+        self._changed.set()
+
+    def _on_connection_lost(self, connection: _PooledConnection, error: BaseException):
+        connection.closed = True
+        if connection in self._connections:
+            self._connections.remove(connection)
+        for session in list(connection.sessions.values()):
+            session._inbox.put_nowait(error)
+        self._changed.set()
+
+
+_pools: Dict[str, WebSocketPool] = {}
+
+
+def get_ws_pool(key: str, **kwargs) -> WebSocketPool:
+    """按服务标识获取进程内共享的连接池，参数只在首次创建时生效"""
+    pool = _pools.get(key)
+    if pool is None:
+        pool = WebSocketPool(name=key.split(":", 1)[0], **kwargs)
+        _pools[key] = pool
+    return pool
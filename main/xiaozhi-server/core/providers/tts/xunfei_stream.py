@@ -15,6 +15,7 @@ from core.utils import opus_encoder_utils
 from core.utils.tts import MarkdownCleaner
 from urllib.parse import urlencode, urlparse
 from core.providers.tts.base import TTSProviderBase
+from core.providers.tts.ws_pool import get_ws_pool
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 
 TAG = __name__
@@ -106,7 +107,7 @@ class TTSProvider(TTSProviderBase):
         remain = config.get("remain", "0")
         self.remain = int(remain) if remain else 0
 
-        # WebSocket配置
+        # WebSocket配置，当前会话从连接池租用的上游连接
         self.ws = None
         self._monitor_task = None
 
@@ -122,28 +123,25 @@ class TTSProvider(TTSProviderBase):
         if not all([self.app_id, self.api_key, self.api_secret]):
             raise ValueError("讯飞TTS需要配置app_id、api_key和api_secret")
 
-    async def _ensure_connection(self):
-        """确保WebSocket连接可用"""
-        try:
-            logger.bind(tag=TAG).info("开始建立新连接...")
-
-            # 生成认证URL
-            auth_url = XunfeiWSAuth.create_auth_url(
-                self.api_key, self.api_secret, self.api_url
-            )
-
-            self.ws = await websockets.connect(
-                auth_url,
-                ping_interval=30,
-                ping_timeout=10,
-                close_timeout=10,
-            )
-            logger.bind(tag=TAG).info("WebSocket连接建立成功")
-            return self.ws
-        except Exception as e:
-            logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
-            self.ws = None
-            raise
+        # 讯飞的连接每个会话只能用一次，连接池只负责提前建好连接，省去首句的握手时间
+        self.pool = get_ws_pool(
+            f"xunfei_stream:{self.api_url}:{self.app_id}",
+            max_connections=int(config.get("pool_max_connections", 64)),
+            min_idle=int(config.get("pool_min_idle", 1)),
+            idle_timeout=float(config.get("pool_idle_timeout", 5)),
+        )
+
+    def _connect(self):
+        """新建上游连接，供连接池调用（每次重新生成认证URL）"""
+        auth_url = XunfeiWSAuth.create_auth_url(
+            self.api_key, self.api_secret, self.api_url
+        )
+        return websockets.connect(
+            auth_url,
+            ping_interval=30,
+            ping_timeout=10,
+            close_timeout=10,
+        )
 
     def tts_text_priority_thread(self):
         """流式文本处理线程"""
@@ -208,7 +206,7 @@ class TTSProvider(TTSProviderBase):
                     )
                     if message.content_file and os.path.exists(message.content_file):
                         # 先处理文件音频数据
-                        self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
+                        self.handle_audio_file_source(message.content_file, message.content_detail)
 
                 # 处理会话结束
                 if message.sentence_type == SentenceType.LAST:
@@ -267,8 +265,8 @@ class TTSProvider(TTSProviderBase):
                 )
                 await self.close()
 
-            # 建立新连接
-            await self._ensure_connection()
+            # 从连接池取出预先建好的连接
+            self.ws = await self.pool.open_session(session_id, self._connect)
 
             # 启动监听任务
             self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
@@ -326,10 +324,11 @@ class TTSProvider(TTSProviderBase):
 
     async def _start_monitor_tts_response(self):
         """监听TTS响应"""
+        session = self.ws
         try:
             while not self.conn.stop_event.is_set():
                 try:
-                    msg = await self.ws.recv()
+                    msg = await session.recv()
 
                     # 检查客户端是否中止
                     if self.conn.client_abort:
@@ -393,15 +392,12 @@ class TTSProvider(TTSProviderBase):
                     )
                     break
 
-            # 链接不可复用
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
         # 监听任务退出时清理引用
         finally:
+            # 链接不可复用
+            await session.close()
+            if self.ws is session:
+                self.ws = None
             self._monitor_task = None
 
     def to_tts(self, text: str) -> list:
@@ -1,5 +1,50 @@
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Optional, Callable, List
+
+
+class VADSessionPool:
+    """VAD会话池：回收已释放的连接会话，新连接直接复用，避免每次连接都重新分配解码器和状态"""
+
+    def __init__(self, factory: Callable[[], "VADSession"], max_idle: int = 256):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle: List["VADSession"] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> "VADSession":
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+        if session is None:
+            session = self.factory()
+            session.pool = self
+        return session
+
+    def release(self, session: "VADSession"):
+        session.reset()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(session)
+
+
+class VADSession:
+    """单个连接独占的VAD会话，持有解码器、模型状态等不能在连接间共享的资源"""
+
+    pool: Optional[VADSessionPool] = None
+    # 最近一次检测时解码出的PCM帧
+    last_pcm: Optional[bytes] = None
+
+    def reset(self):
+        """归还会话池前重置所有状态"""
+        pass
+
+    def clear_buffer(self):
+        """一句话结束后清空未检测的音频"""
+        pass
+
+    def release(self):
+        if self.pool is not None:
+            self.pool.release(self)
 
 
 class VADProviderBase(ABC):
@@ -7,3 +52,27 @@ class VADProviderBase(ABC):
     def is_vad(self, conn, data) -> bool:
         """检测音频数据中的语音活动"""
         pass
+
+    async def is_vad_async(self, conn, data) -> bool:
+        """在事件循环中检测语音活动，支持批量推理的实现可在等待结果时让出事件循环"""
+        return self.is_vad(conn, data)
+
+    def pop_decoded_pcm(self, conn) -> Optional[bytes]:
+        """取出最近一次检测时解码出的PCM帧，供ASR复用，没有解码时返回None"""
+        session = getattr(conn, "vad_session", None)
+        if session is None:
+            return None
+        pcm_frame = getattr(session, "last_pcm", None)
+        session.last_pcm = None
+        return pcm_frame
+
+    def release_session(self, conn):
+        """连接关闭时归还该连接占用的VAD会话"""
+        session = getattr(conn, "vad_session", None)
+        if session is not None:
+            conn.vad_session = None
+            session.release()
+
+    def close(self):
+        """配置更新替换VAD实例时调用，释放推理线程等服务器级资源"""
+        pass
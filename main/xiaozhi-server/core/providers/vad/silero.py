@@ -1,13 +1,169 @@
 import time
+import queue
+import asyncio
+import threading
+import concurrent.futures
 import numpy as np
 import torch
 import opuslib_next
+from typing import List, Tuple
 from config.logger import setup_logging
-from core.providers.vad.base import VADProviderBase
+from core.utils.audio_buffer import PCMRingBuffer
+from core.providers.vad.base import VADProviderBase, VADSession, VADSessionPool
 
 TAG = __name__
 logger = setup_logging()
 
+# Silero 16k模型每次推理的采样点数
+CHUNK_SAMPLES = 512
+# 16k模型的上下文采样点数，模型不提供时使用
+DEFAULT_CONTEXT_SIZE = 64
+
+
+class SileroStreamState:
+    """单个连接的Silero循环状态，保存在模型之外，便于多连接合并推理"""
+
+    def __init__(self, context_size: int):
+        self.context_size = context_size
+        self.reset()
+
+    def reset(self):
+        self.state = torch.zeros((2, 1, 128), dtype=torch.float32)
+        self.context = torch.zeros((1, self.context_size), dtype=torch.float32)
+
+
+class SileroVADSession(VADSession):
+    """连接独占的Silero会话：Opus解码器 + 模型循环状态 + 待检测音频缓冲区"""
+
+    def __init__(self, context_size: int):
+        self.decoder = opuslib_next.Decoder(16000, 1)
+        self.stream_state = SileroStreamState(context_size)
+        self.audio_buffer = PCMRingBuffer()
+        self.last_pcm = None
+
+    def reset(self):
+        self.decoder.reset_state()
+        self.stream_state.reset()
+        self.audio_buffer.clear()
+        self.last_pcm = None
+
+    def clear_buffer(self):
+        self.audio_buffer.clear()
+
+
+class _BatchRequest:
+    __slots__ = ("stream_state", "chunks", "probs", "future")
+
+    def __init__(self, stream_state: SileroStreamState, chunks: List[np.ndarray]):
+        self.stream_state = stream_state
+        self.chunks = chunks
+        self.probs = []
+        self.future = concurrent.futures.Future()
+
+
+class SileroBatchScheduler:
+    """跨连接批量VAD推理调度器
+
+    在一个很短的时间窗口内收集所有连接待检测的32ms音频块，
+    合并成一次批量前向推理，循环状态由各连接的SileroStreamState自行保存。
+    """
+
+    def __init__(self, provider, interval_ms: int, max_batch_size: int):
+        self.provider = provider
+        self.interval = interval_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="silero-vad-batch", daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self, stream_state: SileroStreamState, chunks: List[np.ndarray]
+    ) -> concurrent.futures.Future:
+        """提交一个连接的若干音频块，返回按顺序排列的语音概率列表的Future"""
+        request = _BatchRequest(stream_state, chunks)
+        if not chunks:
+            request.future.set_result([])
+            return request.future
+        with self._lock:
+            if self._closed:
+                request.future.set_exception(RuntimeError("VAD批量推理已关闭"))
+            else:
+                self._queue.put(request)
+        return request.future
+
+    def close(self):
+        """停止推理线程并释放对模型的引用，仍在排队的请求以异常结束"""
+        pending = []
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._queue.put(None)
+        error = RuntimeError("VAD批量推理已关闭")
+        for request in pending:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    def _collect(self) -> Tuple[List[_BatchRequest], bool]:
+        """收集一批请求，第二个返回值表示收到了关闭信号"""
+        request = self._queue.get()
+        if request is None:
+            return [], True
+        batch = [request]
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self._collect()
+            if batch:
+                self._process(batch)
+        self.provider = None
+
+    def _process(self, batch: List[_BatchRequest]):
+        try:
+            # 同一连接的多个块之间存在状态依赖，按步推进，每步合并所有连接的一个块
+            step = 0
+            while True:
+                active = [r for r in batch if step < len(r.chunks)]
+                if not active:
+                    break
+                probs = self.provider._forward(
+                    [r.stream_state for r in active],
+                    [r.chunks[step] for r in active],
+                )
+                for request, prob in zip(active, probs):
+                    request.probs.append(prob)
+                step += 1
+            for request in batch:
+                request.future.set_result(request.probs)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"VAD批量推理失败: {e}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
 
 class VADProvider(VADProviderBase):
     def __init__(self, config):
@@ -19,12 +175,12 @@ class VADProvider(VADProviderBase):
             force_reload=False,
         )
 
-        self.decoder = opuslib_next.Decoder(16000, 1)
-
         # 处理空字符串的情况
         threshold = config.get("threshold", "0.5")
         threshold_low = config.get("threshold_low", "0.2")
         min_silence_duration_ms = config.get("min_silence_duration_ms", "1000")
+        batch_interval_ms = config.get("batch_interval_ms", "10")
+        max_batch_size = config.get("max_batch_size", "64")
 
         self.vad_threshold = float(threshold) if threshold else 0.5
         self.vad_threshold_low = float(threshold_low) if threshold_low else 0.2
@@ -36,65 +192,163 @@ class VADProvider(VADProviderBase):
         # 至少要多少帧才算有语音
         self.frame_window_threshold = 3
 
-    def __del__(self):
-        if hasattr(self, 'decoder') and self.decoder is not None:
-            try:
-                del self.decoder
-            except Exception:
-                pass
+        # 16k子模型接收(输入, 状态)并返回(输出, 新状态)，状态可以放在模型外部
+        # 这是silero-vad打包模型的内部结构，不同版本可能没有，此时回退到逐连接直接调用模型
+        self.net = getattr(self.model, "_model", None)
+        context_size = getattr(self.net, "context_size_samples", None)
+        if self.net is None or context_size is None:
+            logger.bind(tag=TAG).warning(
+                "当前silero-vad模型不支持外部保存循环状态，已关闭批量推理，回退到逐连接推理"
+            )
+            self.net = None
+            context_size = DEFAULT_CONTEXT_SIZE
+        self.context_size = int(context_size)
+        # 回退模式下循环状态保存在模型内部，同一时间只能有一个连接推理
+        self._model_lock = threading.Lock()
+
+        # 每个连接独占一个会话，连接关闭后归还会话池复用
+        self.session_pool = VADSessionPool(
+            lambda: SileroVADSession(self.context_size)
+        )
+
+        # 跨连接批量推理，窗口设为0时每个连接直接推理
+        batch_interval_ms = int(batch_interval_ms) if batch_interval_ms else 0
+        max_batch_size = int(max_batch_size) if max_batch_size else 64
+        self.scheduler = None
+        if batch_interval_ms > 0 and self.net is not None:
+            self.scheduler = SileroBatchScheduler(
+                self, batch_interval_ms, max_batch_size
+            )
+
+    def close(self):
+        """停止批量推理线程，仍在使用本实例的连接改为逐连接直接推理"""
+        scheduler, self.scheduler = self.scheduler, None
+        if scheduler is not None:
+            scheduler.close()
+
+    def _get_session(self, conn) -> SileroVADSession:
+        session = getattr(conn, "vad_session", None)
+        if session is None:
+            session = self.session_pool.acquire()
+            conn.vad_session = session
+        return session
+
+    def _forward(
+        self, stream_states: List[SileroStreamState], chunks: List[np.ndarray]
+    ) -> List[float]:
+        """对多个连接的音频块执行一次批量推理，并回写各连接的循环状态"""
+        audio = np.stack(chunks).astype(np.float32)
+        audio *= 1.0 / 32768.0
+        audio = torch.from_numpy(audio)
+        context = torch.cat([s.context for s in stream_states], dim=0)
+        state = torch.cat([s.state for s in stream_states], dim=1)
+        x = torch.cat([context, audio], dim=1)
+        with torch.no_grad():
+            out, new_state = self.net(x, state)
+        for i, stream_state in enumerate(stream_states):
+            stream_state.state = new_state[:, i : i + 1]
+            stream_state.context = x[i : i + 1, -self.context_size :]
+        return out.view(-1).tolist()
+
+    def _forward_model(self, chunk: np.ndarray) -> float:
+        """不支持外部状态时直接调用模型推理一个音频块"""
+        audio = torch.from_numpy(chunk.astype(np.float32) / 32768.0)
+        with self._model_lock, torch.no_grad():
+            return self.model(audio, 16000).item()
+
+    def _split_chunks(
+        self, session: SileroVADSession, opus_packet
+    ) -> List[np.ndarray]:
+        """解码Opus并切分出缓冲区中所有完整的512采样点音频块
+
+        返回的是缓冲区内的int16视图，推理完成前同一连接不会写入新数据，视图保持有效
+        """
+        pcm_frame = session.decoder.decode(opus_packet, 960)
+        session.last_pcm = pcm_frame  # 保留解码结果，ASR等环节直接复用
+        session.audio_buffer.write(pcm_frame)  # 将新数据加入缓冲区
+
+        chunks = []
+        while len(session.audio_buffer) >= CHUNK_SAMPLES:
+            # 提取前512个采样点
+            chunks.append(session.audio_buffer.read(CHUNK_SAMPLES))
+        return chunks
+
+    def _update_voice_state(self, conn, speech_probs: List[float]) -> bool:
+        client_have_voice = False
+        for speech_prob in speech_probs:
+            # 双阈值判断
+            if speech_prob >= self.vad_threshold:
+                is_voice = True
+            elif speech_prob <= self.vad_threshold_low:
+                is_voice = False
+            else:
+                is_voice = conn.last_is_voice
+
+            # 声音没低于最低值则延续前一个状态，判断为有声音
+            conn.last_is_voice = is_voice
+
+            # 更新滑动窗口
+            conn.client_voice_window.append(is_voice)
+            client_have_voice = (
+                conn.client_voice_window.count(True) >= self.frame_window_threshold
+            )
+
+            # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
+            if conn.client_have_voice and not client_have_voice:
+                stop_duration = time.time() * 1000 - conn.last_activity_time
+                if stop_duration >= self.silence_threshold_ms:
+                    conn.client_voice_stop = True
+            if client_have_voice:
+                conn.client_have_voice = True
+                conn.last_activity_time = time.time() * 1000
+
+        return client_have_voice
+
+    def _infer(
+        self, session: SileroVADSession, chunks: List[np.ndarray]
+    ) -> List[float]:
+        if not chunks:
+            return []
+        scheduler = self.scheduler
+        if scheduler is not None:
+            return scheduler.submit(session.stream_state, chunks).result()
+        if self.net is None:
+            return [self._forward_model(chunk) for chunk in chunks]
+        return [
+            self._forward([session.stream_state], [chunk])[0] for chunk in chunks
+        ]
 
     def is_vad(self, conn, opus_packet):
         # 手动模式：直接返回True，不进行实时VAD检测，所有音频都缓存
         if conn.client_listen_mode == "manual":
             return True
-            
+
         try:
-            pcm_frame = self.decoder.decode(opus_packet, 960)
-            conn.client_audio_buffer.extend(pcm_frame)  # 将新数据加入缓冲区
-
-            # 处理缓冲区中的完整帧（每次处理512采样点）
-            client_have_voice = False
-            while len(conn.client_audio_buffer) >= 512 * 2:
-                # 提取前512个采样点（1024字节）
-                chunk = conn.client_audio_buffer[: 512 * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
-
-                # 转换为模型需要的张量格式
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
-                audio_tensor = torch.from_numpy(audio_float32)
-
-                # 检测语音活动
-                with torch.no_grad():
-                    speech_prob = self.model(audio_tensor, 16000).item()
-
-                # 双阈值判断
-                if speech_prob >= self.vad_threshold:
-                    is_voice = True
-                elif speech_prob <= self.vad_threshold_low:
-                    is_voice = False
-                else:
-                    is_voice = conn.last_is_voice
-
-                # 声音没低于最低值则延续前一个状态，判断为有声音
-                conn.last_is_voice = is_voice
-
-                # 更新滑动窗口
-                conn.client_voice_window.append(is_voice)
-                client_have_voice = (
-                    conn.client_voice_window.count(True) >= self.frame_window_threshold
-                )
+            session = self._get_session(conn)
+            chunks = self._split_chunks(session, opus_packet)
+            speech_probs = self._infer(session, chunks)
+            return self._update_voice_state(conn, speech_probs)
+        except opuslib_next.OpusError as e:
+            logger.bind(tag=TAG).info(f"解码错误: {e}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
 
-                # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.last_activity_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.last_activity_time = time.time() * 1000
+    async def is_vad_async(self, conn, opus_packet):
+        # 手动模式：直接返回True，不进行实时VAD检测，所有音频都缓存
+        if conn.client_listen_mode == "manual":
+            return True
 
-            return client_have_voice
+        try:
+            session = self._get_session(conn)
+            chunks = self._split_chunks(session, opus_packet)
+            scheduler = self.scheduler
+            if scheduler is not None and chunks:
+                # 等待批量推理结果期间让出事件循环，其他连接得以提交到同一批次
+                future = scheduler.submit(session.stream_state, chunks)
+                speech_probs = await asyncio.wrap_future(future)
+            else:
+                speech_probs = self._infer(session, chunks)
+            return self._update_voice_state(conn, speech_probs)
         except opuslib_next.OpusError as e:
             logger.bind(tag=TAG).info(f"解码错误: {e}")
         except Exception as e:
@@ -25,6 +25,7 @@ class AudioRateController:
         self.logger = logger
         self.queue_empty_event = asyncio.Event()  # 队列清空事件
         self.queue_empty_event.set()  # 初始为空状态
+        self.dequeue_event = asyncio.Event()  # 有包出队（或队列被清空）
 
     def reset(self):
         """重置控制器状态"""
@@ -36,6 +37,7 @@ class AudioRateController:
         self.play_position = 0
         self.start_timestamp = time.time()
         self.queue_empty_event.set()  # 队列已清空
+        self.dequeue_event.set()
 
     def add_audio(self, opus_packet):
         """添加音频包到队列"""
@@ -52,6 +54,21 @@ class AudioRateController:
         self.queue.append(("message", message_callback))
         self.queue_empty_event.clear()  # 队列非空，清除事件
 
+    async def wait_for_space(self, max_pending, timeout=None):
+        """
+        等待队列中的待发送项少于max_pending，用于长音频按播放进度读取
+
+        Returns:
+            bool: 是否已有空位，超时返回False
+        """
+        while len(self.queue) >= max_pending:
+            self.dequeue_event.clear()
+            try:
+                await asyncio.wait_for(self.dequeue_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
     def _get_elapsed_ms(self):
         """获取已经过的时间（毫秒）"""
         if self.start_timestamp is None:
@@ -76,6 +93,7 @@ class AudioRateController:
                 # 消息类型：立即发送，不占用播放时间
                 _, message_callback = item
                 self.queue.pop(0)
+                self.dequeue_event.set()
                 try:
                     await message_callback()
                 except Exception as e:
@@ -108,6 +126,7 @@ class AudioRateController:
 
                 # 时间已到，从队列移除并发送
                 self.queue.pop(0)
+                self.dequeue_event.set()
                 self.play_position += self.frame_duration
 
                 try:
@@ -0,0 +1,235 @@
+"""
+音频缓冲区
+为VAD、ASR预录和手动模式录音提供预分配、无拷贝的缓冲区，避免每个音频包都重新分配内存
+"""
+
+import io
+import wave
+import numpy as np
+import opuslib_next
+from config.logger import setup_logging
+from typing import Iterable, List, Optional
+
+TAG = __name__
+logger = setup_logging()
+
+
+class PCMRingBuffer:
+    """预分配的16位PCM缓冲区
+
+    写入时拷贝一次到预分配数组，读取时直接返回numpy视图，不再产生新的bytes对象。
+    空间不足时只把未读出的尾部数据搬回数组开头，保证读出的视图始终连续。
+    注意：读出的视图在下一次写入之前有效。
+    """
+
+    def __init__(self, capacity: int = 16000):
+        """
+        Args:
+            capacity: 初始容量（采样点数），默认1秒16kHz音频
+        """
+        self._buf = np.zeros(capacity, dtype=np.int16)
+        self._read = 0
+        self._write = 0
+
+    def __len__(self) -> int:
+        """未读出的采样点数"""
+        return self._write - self._read
+
+    def write(self, pcm) -> None:
+        """写入PCM数据，支持bytes/bytearray/memoryview或int16数组"""
+        if isinstance(pcm, np.ndarray):
+            samples = pcm
+        else:
+            samples = np.frombuffer(memoryview(pcm), dtype=np.int16)
+        n = len(samples)
+        if n == 0:
+            return
+        if self._write + n > len(self._buf):
+            self._make_room(n)
+        self._buf[self._write : self._write + n] = samples
+        self._write += n
+
+    def read(self, n: int) -> Optional[np.ndarray]:
+        """读出n个采样点，数据不足时返回None"""
+        if len(self) < n:
+            return None
+        view = self._buf[self._read : self._read + n]
+        self._read += n
+        return view
+
+    def clear(self) -> None:
+        self._read = 0
+        self._write = 0
+
+    def _make_room(self, n: int) -> None:
+        pending = len(self)
+        if pending + n > len(self._buf):
+            # 容量不够，按倍数扩容
+            capacity = len(self._buf)
+            while pending + n > capacity:
+                capacity *= 2
+            buf = np.zeros(capacity, dtype=np.int16)
+            buf[:pending] = self._buf[self._read : self._write]
+            self._buf = buf
+        elif pending:
+            self._buf[:pending] = self._buf[self._read : self._write]
+        self._read = 0
+        self._write = pending
+
+
+class Utterance(list):
+    """一句话的音频
+
+    本身是原始音频包列表，可以直接传给任何接收List[bytes]的接口；
+    同时保存接收过程中VAD已经解码好的PCM帧，ASR、声纹、WAV导出和上报共用这一份PCM，
+    不再各自重复解码Opus。
+    """
+
+    # 边说边识别时已提前识别的分段，由ASR在说话结束时合并
+    incremental = None
+
+    def __init__(
+        self,
+        packets: Iterable[bytes] = (),
+        pcm_frames: Optional[List[Optional[bytes]]] = None,
+        audio_format: str = "opus",
+    ):
+        super().__init__(packets)
+        if audio_format == "pcm":
+            pcm_frames = list(self)
+        elif pcm_frames is not None and (
+            len(pcm_frames) != len(self) or any(f is None for f in pcm_frames)
+        ):
+            # 接收时有包没解码（如手动模式），使用时整句重新解码
+            pcm_frames = None
+        self._pcm_frames = pcm_frames
+        self._pcm = None
+        self._wav = None
+
+    @classmethod
+    def wrap(cls, audio_data: List[bytes], audio_format: str = "opus") -> "Utterance":
+        """把普通音频包列表包装成Utterance，已经是Utterance时原样返回"""
+        if isinstance(audio_data, Utterance):
+            return audio_data
+        return cls(audio_data, audio_format=audio_format)
+
+    def tail(self, start: int) -> "Utterance":
+        """从第start个音频包开始截取，已解码的PCM帧一并带上"""
+        pcm_frames = self._pcm_frames
+        if pcm_frames is not None and len(pcm_frames) == len(self):
+            pcm_frames = pcm_frames[start:]
+        else:
+            pcm_frames = None
+        return Utterance(self[start:], pcm_frames)
+
+    @property
+    def pcm_frames(self) -> List[bytes]:
+        """逐包的PCM帧，接收时缺少解码结果的话整句重新解码一次"""
+        if self._pcm_frames is None:
+            self._pcm_frames = self._decode_all()
+        return self._pcm_frames
+
+    @property
+    def pcm(self) -> bytes:
+        """整句PCM数据"""
+        if self._pcm is None:
+            self._pcm = b"".join(self.pcm_frames)
+        return self._pcm
+
+    def to_wav(self) -> bytes:
+        """整句PCM封装为16kHz单声道WAV"""
+        if self._wav is None:
+            pcm = self.pcm
+            if len(pcm) % 2 != 0:
+                pcm = pcm[:-1]
+            wav_buffer = io.BytesIO()
+            with wave.open(wav_buffer, "wb") as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(16000)
+                wav_file.writeframes(pcm)
+            self._wav = wav_buffer.getvalue()
+        return self._wav
+
+    def _decode_all(self) -> List[bytes]:
+        decoder = opuslib_next.Decoder(16000, 1)
+        pcm_frames = []
+        for i, opus_packet in enumerate(self):
+            if not opus_packet:
+                continue
+            try:
+                pcm_frames.append(decoder.decode(opus_packet, 960))
+            except opuslib_next.OpusError as e:
+                logger.bind(tag=TAG).warning(f"Opus解码错误，跳过数据包 {i}: {e}")
+        return pcm_frames
+
+
+class PacketRingBuffer:
+    """音频包历史缓冲区
+
+    保存的是原始音频包的引用，不拷贝数据。静音期间只需保留最近几个包作为预录，
+    keep_last只移动起始位置，累计丢弃的包足够多时才整体压缩一次，摊还O(1)。
+    每个包可附带VAD已解码的PCM帧，一句话结束时连同PCM一起交给ASR。
+    """
+
+    _COMPACT_THRESHOLD = 256
+
+    def __init__(self):
+        self._items: List[bytes] = []
+        self._pcm: List[Optional[bytes]] = []
+        self._start = 0
+        # 每次清空加一，用于判断基于旧内容记录的位置是否已经失效
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._items) - self._start
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self):
+        for i in range(self._start, len(self._items)):
+            yield self._items[i]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._items[self._start + i] for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("PacketRingBuffer index out of range")
+        return self._items[self._start + index]
+
+    def append(self, packet: bytes, pcm_frame: Optional[bytes] = None) -> None:
+        self._items.append(packet)
+        self._pcm.append(pcm_frame)
+
+    def keep_last(self, n: int) -> None:
+        """只保留最近n个音频包"""
+        self._start = max(self._start, len(self._items) - n)
+        if self._start >= self._COMPACT_THRESHOLD:
+            del self._items[: self._start]
+            del self._pcm[: self._start]
+            self._start = 0
+
+    def copy(self) -> List[bytes]:
+        """以列表形式返回当前所有音频包"""
+        return self._items[self._start :]
+
+    def to_utterance(
+        self, audio_format: str = "opus", start: int = 0, end: Optional[int] = None
+    ) -> Utterance:
+        """把[start, end)范围内的音频包及其PCM帧打包成一句话，默认取全部"""
+        start = self._start + start
+        end = len(self._items) if end is None else self._start + end
+        return Utterance(
+            self._items[start:end],
+            self._pcm[start:end],
+            audio_format=audio_format,
+        )
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._pcm.clear()
+        self._start = 0
+        self.generation += 1
@@ -0,0 +1,280 @@
+"""
+进程内音频解码
+TTS返回的音频和本地音频文件统一转成16kHz单声道16位PCM：
+WAV直接解析，MP3/FLAC/Ogg Vorbis用miniaudio在进程内流式解码，重采样用numpy实现的多相sinc滤波，
+只有原生无法处理的格式才交给ffmpeg（pydub），避免每句话都启动一个ffmpeg子进程。
+边下载边播放的音频流（如Edge TTS的MP3分块）通过ffmpeg管道增量解码。
+"""
+
+import io
+import os
+import wave
+import asyncio
+import subprocess
+import numpy as np
+from pydub import AudioSegment
+from typing import AsyncIterator, Iterator, Optional, Union
+from config.logger import setup_logging
+
+try:
+    import miniaudio
+except ImportError:  # 未安装时全部交给ffmpeg处理
+    miniaudio = None
+
+TAG = __name__
+logger = setup_logging()
+
+TARGET_SAMPLE_RATE = 16000
+# 流式解码时每次读取的帧数（约0.24秒）
+STREAM_CHUNK_FRAMES = 3840
+# 增量解码时每次从ffmpeg读取的PCM字节数（约0.06秒）
+PIPE_READ_BYTES = 1920
+
+# miniaudio支持的压缩格式
+_MINIAUDIO_FORMATS = ("mp3", "flac", "ogg")
+
+AudioSource = Union[str, bytes]
+
+
+# 重采样低通滤波器：截止频率相对目标奈奎斯特频率的比例、每侧过零点数和Kaiser窗参数
+RESAMPLE_ROLLOFF = 0.945
+RESAMPLE_ZERO_CROSSINGS = 16
+RESAMPLE_KAISER_BETA = 8.6
+# 每次计算的输出采样点数，限制中间矩阵的内存占用
+RESAMPLE_BLOCK = 16000
+
+
+def _resample_taps(up: int, down: int):
+    """多相窗函数sinc滤波器：返回每个相位的滤波系数表和每侧的输入采样点数"""
+    # 降采样时截止频率随比例降低，先滤掉目标采样率无法表示的高频，避免混叠
+    cutoff = min(1.0, up / down) * RESAMPLE_ROLLOFF
+    half_width = int(np.ceil(RESAMPLE_ZERO_CROSSINGS / cutoff))
+    phases = np.arange(up, dtype=np.float64)[:, None] / up
+    offsets = phases + (half_width - 1) - np.arange(2 * half_width)[None, :]
+    window = np.i0(
+        RESAMPLE_KAISER_BETA * np.sqrt(np.clip(1 - (offsets / half_width) ** 2, 0, None))
+    ) / np.i0(RESAMPLE_KAISER_BETA)
+    taps = cutoff * np.sinc(cutoff * offsets) * window
+    # 每个相位归一化，保证直流增益为1
+    taps /= taps.sum(axis=1, keepdims=True)
+    return taps.astype(np.float32), half_width
+
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """按有理数比例做带限重采样（多相窗函数sinc插值），输入输出均为float32"""
+    ratio = np.gcd(sample_rate, target_rate)
+    up, down = target_rate // ratio, sample_rate // ratio
+    taps, half_width = _resample_taps(up, down)
+    padded = np.concatenate(
+        [
+            np.zeros(half_width - 1, dtype=np.float32),
+            samples.astype(np.float32, copy=False),
+            np.zeros(half_width + 1, dtype=np.float32),
+        ]
+    )
+    target_len = (len(samples) * up) // down
+    output = np.empty(target_len, dtype=np.float32)
+    span = np.arange(2 * half_width)
+    for start in range(0, target_len, RESAMPLE_BLOCK):
+        n = np.arange(start, min(start + RESAMPLE_BLOCK, target_len))
+        base, phase = np.divmod(n * down, up)
+        window = padded[base[:, None] + span[None, :]]
+        output[start : start + len(n)] = np.einsum("ij,ij->i", window, taps[phase])
+    return output
+
+
+def to_mono_16k(samples: np.ndarray, sample_rate: int, channels: int) -> np.ndarray:
+    """多声道交错的int16采样转为16kHz单声道
+
+    下混取各声道平均，其他采样率用带抗混叠低通的多相sinc重采样。
+    """
+    if channels > 1:
+        usable = len(samples) - len(samples) % channels
+        samples = samples[:usable].reshape(-1, channels).mean(axis=1)
+    samples = samples.astype(np.float32, copy=False)
+
+    if sample_rate != TARGET_SAMPLE_RATE and len(samples):
+        samples = resample(samples, sample_rate, TARGET_SAMPLE_RATE)
+
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+
+
+def _read_wav(source: AudioSource) -> Optional[np.ndarray]:
+    """解析PCM编码的WAV，非PCM编码（如浮点、ADPCM）返回None"""
+    f = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    try:
+        with wave.open(f, "rb") as wav:
+            channels = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            sample_rate = wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if sample_width == 2:
+        samples = np.frombuffer(raw, dtype="<i2")
+    elif sample_width == 1:
+        samples = ((np.frombuffer(raw, dtype=np.uint8).astype(np.int16) - 128) << 8)
+    elif sample_width == 4:
+        samples = (np.frombuffer(raw, dtype="<i4") >> 16).astype(np.int16)
+    else:
+        return None
+    return to_mono_16k(samples, sample_rate, channels)
+
+
+def _stream_miniaudio(source: AudioSource) -> Iterator[bytes]:
+    """miniaudio流式解码，直接输出16kHz单声道16位PCM"""
+    kwargs = dict(
+        output_format=miniaudio.SampleFormat.SIGNED16,
+        nchannels=1,
+        sample_rate=TARGET_SAMPLE_RATE,
+        frames_to_read=STREAM_CHUNK_FRAMES,
+    )
+    if isinstance(source, (bytes, bytearray)):
+        stream = miniaudio.stream_memory(bytes(source), **kwargs)
+    else:
+        stream = miniaudio.stream_file(source, **kwargs)
+    for chunk in stream:
+        yield chunk.tobytes()
+
+
+def _decode_with_ffmpeg(source: AudioSource, file_type: str) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    # -nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
+    audio = AudioSegment.from_file(source, format=file_type, parameters=["-nostdin"])
+    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
+    audio = audio.set_channels(1).set_frame_rate(TARGET_SAMPLE_RATE).set_sample_width(2)
+    return audio.raw_data
+
+
+def _stream_with_ffmpeg(path: str) -> Iterator[bytes]:
+    """ffmpeg边解码边从标准输出读取，长音频文件不会整体解码进内存"""
+    process = subprocess.Popen(
+        [
+            AudioSegment.converter,
+            "-nostdin",
+            "-hide_banner",
+            "-loglevel", "error",
+            "-i", path,
+            "-f", "s16le",
+            "-ac", "1",
+            "-ar", str(TARGET_SAMPLE_RATE),
+            "pipe:1",
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            data = process.stdout.read(STREAM_CHUNK_FRAMES * 2)
+            if not data:
+                break
+            yield data
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg解码失败: {path}")
+    finally:
+        # 提前停止读取（如播放被打断）时结束ffmpeg进程
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def decode_to_pcm_chunks(source: AudioSource, file_type: str = None) -> Iterator[bytes]:
+    """把音频文件路径或音频二进制数据解码为16kHz单声道16位PCM分块
+
+    Args:
+        source: 音频文件路径或音频二进制数据
+        file_type: 音频格式（wav、mp3等），为空时按文件后缀判断
+    """
+    if not file_type and isinstance(source, str):
+        file_type = os.path.splitext(source)[1].lstrip(".")
+    file_type = (file_type or "").lower()
+
+    if file_type == "wav":
+        samples = _read_wav(source)
+        if samples is not None:
+            yield samples.tobytes()
+            return
+    elif file_type in _MINIAUDIO_FORMATS and miniaudio is not None:
+        stream = _stream_miniaudio(source)
+        try:
+            first = next(stream, None)
+        except miniaudio.MiniaudioError as e:
+            logger.bind(tag=TAG).debug(f"进程内解码失败，改用ffmpeg: {e}")
+        else:
+            if first is not None:
+                yield first
+            yield from stream
+            return
+
+    if isinstance(source, str):
+        yield from _stream_with_ffmpeg(source)
+        return
+    yield _decode_with_ffmpeg(source, file_type or None)
+
+
+async def decode_stream_to_pcm(
+    chunks: AsyncIterator[bytes], file_type: str
+) -> AsyncIterator[bytes]:
+    """把陆续到达的音频数据块增量解码为16kHz单声道16位PCM
+
+    数据块写入ffmpeg的标准输入，同时读取标准输出，第一个数据块到达后几十毫秒就能拿到PCM。
+    miniaudio.stream_any配合StreamableSource也能增量解码，但它同步阻塞读取输入，
+    只能放在单独的线程里；ffmpeg在子进程中解码，可以直接在事件循环中读写管道。
+
+    Args:
+        chunks: 按顺序到达的音频数据块
+        file_type: 音频格式（mp3等）
+    """
+    process = await asyncio.create_subprocess_exec(
+        AudioSegment.converter,
+        "-hide_banner",
+        "-loglevel", "error",
+        # 不做格式探测和输入缓冲，尽早输出
+        "-probesize", "32",
+        "-analyzeduration", "0",
+        "-fflags", "nobuffer",
+        "-f", file_type,
+        "-i", "pipe:0",
+        "-f", "s16le",
+        "-ac", "1",
+        "-ar", str(TARGET_SAMPLE_RATE),
+        "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+
+    async def write_input():
+        try:
+            async for chunk in chunks:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        finally:
+            if not process.stdin.is_closing():
+                process.stdin.close()
+
+    writer = asyncio.create_task(write_input())
+    remainder = b""
+    try:
+        while True:
+            data = await process.stdout.read(PIPE_READ_BYTES)
+            if not data:
+                break
+            # 保证输出的都是完整的16位采样
+            data = remainder + data
+            usable = len(data) - len(data) % 2
+            remainder = data[usable:]
+            if usable:
+                yield data[:usable]
+        # 输入端的异常（如TTS请求失败）在这里抛给调用方
+        await writer
+        if await process.wait() != 0:
+            raise RuntimeError(f"ffmpeg增量解码失败，返回码{process.returncode}")
+    finally:
+        writer.cancel()
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
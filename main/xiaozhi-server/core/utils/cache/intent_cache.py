@@ -0,0 +1,257 @@
+"""
+跨设备共享的意图缓存
+原来的意图缓存以md5(设备ID + 原文)为键，不同设备的相同指令、换个说法的同一指令都无法命中。
+这里以归一化后的文本和工具集指纹为键，所有设备共享；精确未命中时再查找只差语气词的已知说法。
+每条记录统计LLM给出相同/不同结果的次数作为置信度，结果不稳定的说法不使用缓存。
+
+意图识别的LLM能看到最近几轮对话，同一句话在不同上下文中的意图可能不同，所以：
+- 相似匹配只允许“一下”和不改变句意的语气词不同，时间、地点、否定词等任何实义字不同都不匹配；
+  “了”“吗”“呢”“吧”会把指令变成疑问或陈述（“打开灯” / “打开灯了吗”），不能忽略；
+- 过短的说法和依赖上下文的回答（“好的”“这首”等）不缓存。
+"""
+
+import time
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 归一化时去掉的礼貌前缀和句尾语气词，不影响指令含义
+FILLER_PREFIXES = ("麻烦你", "麻烦", "请你", "请", "帮我", "给我")
+# 以前缀开头但本身是一个词的说法，前缀不能去掉（如“请问”不是“请”+“问”）
+PREFIX_WORDS = ("请问", "请教", "请假", "请客", "请求", "麻烦事")
+# 句尾的“呢”“吧”常表示疑问（“灯开了吧”），不去掉
+FILLER_SUFFIXES = ("一下吧", "一下", "呀", "啊", "哦", "嘛", "啦")
+# 句中去掉的虚词
+FILLER_CHARS = frozenset("把的")
+# 相似匹配时额外忽略的语气词，其余字必须完全相同；表示疑问、完成的了、吗、呢、吧不在其中
+SOFT_WORDS = ("一下",)
+SOFT_CHARS = frozenset("啊呀哦嘛啦呗哈")
+
+# 归一化后少于该字数的说法不缓存，过短的说法往往要结合上下文理解
+MIN_TEXT_LENGTH = 3
+# 对上一句话的回答，意图完全取决于上下文
+CONTEXT_REPLIES = frozenset(
+    (
+        "好", "好的", "好啊", "行", "行啊", "可以", "是", "是的", "对", "对的", "嗯", "嗯嗯",
+        "不", "不要", "不用", "不是", "不行", "没有", "算了", "继续", "没事", "知道了",
+    )
+)
+# 指代上文的词，包含时不缓存（如“这首歌再放一遍”）
+CONTEXT_WORDS = ("这个", "那个", "这首", "那首", "这些", "那些", "它", "刚才", "上一", "再来")
+
+
+def _strip_prefix(text: str) -> Optional[str]:
+    if text.startswith(PREFIX_WORDS):
+        return None
+    for prefix in FILLER_PREFIXES:
+        if text.startswith(prefix) and len(text) > len(prefix):
+            return text[len(prefix) :]
+    return None
+
+
+def normalize_text(text: str) -> str:
+    """统一全半角和大小写，去掉标点、空白和语气词"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(
+        c for c in text if not unicodedata.category(c).startswith(("P", "Z", "S", "C"))
+    )
+    changed = True
+    while changed and text:
+        changed = False
+        stripped = _strip_prefix(text)
+        if stripped is not None:
+            text = stripped
+            changed = True
+        for suffix in FILLER_SUFFIXES:
+            if text.endswith(suffix) and len(text) > len(suffix):
+                text = text[: -len(suffix)]
+                changed = True
+    stripped = "".join(c for c in text if c not in FILLER_CHARS)
+    return stripped or text
+
+
+def fuzzy_key(norm: str) -> str:
+    """相似匹配的键：再去掉句中的语气词，只差语气词的说法键相同"""
+    for word in SOFT_WORDS:
+        norm = norm.replace(word, "")
+    return "".join(c for c in norm if c not in SOFT_CHARS)
+
+
+def is_cacheable(norm: str) -> bool:
+    """过短或依赖上下文的说法不进入共享缓存"""
+    if len(norm) < MIN_TEXT_LENGTH or norm in CONTEXT_REPLIES:
+        return False
+    return not any(word in norm for word in CONTEXT_WORDS)
+
+
+def tools_fingerprint(prompt: str) -> str:
+    """工具集指纹：意图识别的系统提示词包含全部函数、音乐列表和智能设备列表"""
+    return hashlib.md5(prompt.encode()).hexdigest()
+
+
+class IntentCacheEntry:
+    def __init__(self, text: str, intent: str):
+        self.text = text
+        self.key = fuzzy_key(text)
+        self.intent = intent
+        # LLM对这个说法给出相同结果和不同结果的次数
+        self.agreements = 1
+        self.conflicts = 0
+        self.updated_at = time.time()
+
+    @property
+    def confidence(self) -> float:
+        return self.agreements / (self.agreements + self.conflicts)
+
+
+class IntentCache:
+    """按工具集分区的意图缓存，精确匹配加只差语气词的相似匹配"""
+
+    def __init__(
+        self,
+        fuzzy_match: bool = True,
+        min_confidence: float = 0.6,
+        ttl: float = 3600,
+        max_size: int = 5000,
+    ):
+        """
+        Args:
+            fuzzy_match: 是否匹配只差语气词的说法，关闭时只做精确匹配
+            min_confidence: 记录的最低置信度，低于时不使用缓存，重新请求LLM
+            ttl: 记录有效期（秒），0表示不过期
+            max_size: 最多保存的说法数，超出时淘汰最久未使用的
+        """
+        self.fuzzy_match = fuzzy_match
+        self.min_confidence = min_confidence
+        self.ttl = ttl
+        self.max_size = max(1, max_size)
+        self._entries: "OrderedDict[Tuple[str, str], IntentCacheEntry]" = OrderedDict()
+        # 相似匹配索引：(工具集指纹, 去掉语气词的键) -> 归一化说法
+        self._index: Dict[Tuple[str, str], Set[str]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "fuzzy_hits": 0, "misses": 0}
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "IntentCache":
+        config = config or {}
+        return cls(
+            fuzzy_match=bool(config.get("fuzzy_match", True)),
+            min_confidence=float(config.get("min_confidence", 0.6)),
+            ttl=float(config.get("ttl", 3600)),
+            max_size=int(config.get("max_size", 5000)),
+        )
+
+    def get(self, text: str, fingerprint: str) -> Optional[str]:
+        """查找缓存的意图，未命中或说法不适合缓存时返回None"""
+        norm = normalize_text(text)
+        if not is_cacheable(norm):
+            return None
+        with self._lock:
+            entry = self._entries.get((fingerprint, norm))
+            if entry is not None and self._expired(entry):
+                self._remove(fingerprint, norm)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end((fingerprint, norm))
+                if entry.confidence < self.min_confidence:
+                    self._stats["misses"] += 1
+                    return None
+                self._stats["hits"] += 1
+                return entry.intent
+
+            entry = self._nearest(norm, fingerprint)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end((fingerprint, entry.text))
+            self._stats["fuzzy_hits"] += 1
+        logger.bind(tag=TAG).debug(f"意图相似匹配: '{norm}' -> '{entry.text}'")
+        return entry.intent
+
+    def put(self, text: str, fingerprint: str, intent: str):
+        """记录LLM给出的意图，同一说法多次结果不同时降低置信度"""
+        norm = normalize_text(text)
+        if not is_cacheable(norm):
+            return
+        key = (fingerprint, norm)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                if entry.intent == intent:
+                    entry.agreements += 1
+                else:
+                    # 以最新结果为准，之前的分歧计入置信度
+                    entry.conflicts += entry.agreements
+                    entry.agreements = 1
+                    entry.intent = intent
+                entry.updated_at = time.time()
+                self._entries.move_to_end(key)
+                return
+            if entry is not None:
+                self._remove(fingerprint, norm)
+            entry = IntentCacheEntry(norm, intent)
+            self._entries[key] = entry
+            self._index.setdefault((fingerprint, entry.key), set()).add(norm)
+            while len(self._entries) > self.max_size:
+                (old_fingerprint, old_text), _ = next(iter(self._entries.items()))
+                self._remove(old_fingerprint, old_text)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, size=len(self._entries))
+
+    def _nearest(self, norm: str, fingerprint: str) -> Optional[IntentCacheEntry]:
+        """找出只差语气词、且置信度最高的已知说法"""
+        if not self.fuzzy_match:
+            return None
+        best = None
+        for candidate in self._index.get((fingerprint, fuzzy_key(norm)), ()):
+            entry = self._entries[(fingerprint, candidate)]
+            if self._expired(entry) or entry.confidence < self.min_confidence:
+                continue
+            if best is None or (entry.confidence, entry.agreements) > (
+                best.confidence,
+                best.agreements,
+            ):
+                best = entry
+        return best
+
+    def _expired(self, entry: IntentCacheEntry) -> bool:
+        return bool(self.ttl) and time.time() - entry.updated_at > self.ttl
+
+    def _remove(self, fingerprint: str, norm: str):
+        entry = self._entries.pop((fingerprint, norm), None)
+        if entry is None:
+            return
+        index_key = (fingerprint, entry.key)
+        postings = self._index.get(index_key)
+        if postings is not None:
+            postings.discard(norm)
+            if not postings:
+                del self._index[index_key]
+
+
+# 全局单例
+_intent_cache_instance = None
+
+
+def get_intent_cache(config: Optional[Dict] = None) -> IntentCache:
+    """
+    获取全局意图缓存实例（单例模式），所有设备共享
+
+    Args:
+        config: 意图缓存配置，只在首次创建时生效
+
+    Returns:
+        IntentCache实例
+    """
+    global _intent_cache_instance
+    if _intent_cache_instance is None:
+        _intent_cache_instance = IntentCache.from_config(config)
+    return _intent_cache_instance
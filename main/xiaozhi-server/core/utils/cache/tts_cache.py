@@ -0,0 +1,243 @@
+"""
+TTS音频缓存
+工具调用回复、播放提示、绑定提示、告别语等高频短句，合成一次后把Opus帧缓存下来，
+按 (TTS类型, 音色及参数, 规范化文本, 输出格式) 寻址，再次出现时直接送入播放队列，
+省去TTS请求和音频转码。内存层按字节数做LRU淘汰，磁盘层使用p3帧格式并按总大小淘汰最旧文件。
+"""
+
+import os
+import json
+import struct
+import hashlib
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 与音色、语速等无关的配置项，不参与缓存键计算
+_IGNORED_CONFIG_KEYS = {"output_dir", "api_key", "access_token", "token", "secret"}
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：全半角统一、去除首尾空白、合并连续空白"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return " ".join(text.split())
+
+
+def config_fingerprint(provider_type: str, config: dict) -> str:
+    """TTS实例的身份标识：类型加上影响发音的全部配置（音色、语速、音调、模型等）"""
+    params = {
+        k: v
+        for k, v in (config or {}).items()
+        if k not in _IGNORED_CONFIG_KEYS and not k.endswith("_key")
+    }
+    raw = json.dumps([provider_type, params], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """两级TTS音频缓存，进程内所有连接共享"""
+
+    def __init__(
+        self,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+        max_text_length: int = 50,
+    ):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.max_text_length = max_text_length
+        self._memory: "OrderedDict[str, List[bytes]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._scan_disk())
+
+    def make_key(self, fingerprint: str, text: str, audio_format: str) -> Optional[str]:
+        """生成缓存键，文本过长（一般是不会重复的LLM回复）时返回None表示不缓存"""
+        text = normalize_text(text)
+        if not text or len(text) > self.max_text_length:
+            return None
+        raw = f"{fingerprint}\0{audio_format}\0{text}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[bytes]]:
+        with self._lock:
+            frames = self._memory.get(key)
+            if frames is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return frames
+        frames = self._read_disk(key)
+        with self._lock:
+            if frames is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._put_memory(key, frames)
+        return frames
+
+    def put(self, key: str, frames: List[bytes]):
+        if not frames:
+            return
+        frames = list(frames)
+        with self._lock:
+            self._put_memory(key, frames)
+            self._stats["stores"] += 1
+        self._write_disk(key, frames)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_bytes"] = self._memory_bytes
+            stats["memory_entries"] = len(self._memory)
+            stats["disk_bytes"] = self._disk_bytes
+        return stats
+
+    def _put_memory(self, key: str, frames: List[bytes]):
+        size = sum(len(f) for f in frames)
+        if size > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= sum(len(f) for f in old)
+        self._memory[key] = frames
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= sum(len(f) for f in evicted)
+            self._stats["evictions"] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.p3")
+
+    def _read_disk(self, key: str) -> Optional[List[bytes]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # 更新访问时间，磁盘淘汰按最近访问排序
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.bind(tag=TAG).warning(f"读取TTS缓存失败: {path}, {e}")
+            return None
+        frames = []
+        offset = 0
+        while offset + 4 <= len(data):
+            _, _, length = struct.unpack_from(">BBH", data, offset)
+            offset += 4
+            frames.append(data[offset : offset + length])
+            offset += length
+        return frames or None
+
+    def _write_disk(self, key: str, frames: List[bytes]):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        # p3格式：每帧4字节头[类型, 保留, 2字节长度]加帧数据
+        data = b"".join(struct.pack(">BBH", 0, 0, len(f)) + f for f in frames)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 多进程、多线程可能同时写同一条缓存，各自写入唯一的临时文件后原子替换
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=f"{key}.", suffix=".tmp", dir=os.path.dirname(path)
+            )
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.bind(tag=TAG).warning(f"写入TTS缓存失败: {path}, {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+        with self._lock:
+            self._disk_bytes += len(data)
+            over_limit = self._disk_bytes > self.disk_max_bytes
+        if over_limit:
+            self._evict_disk()
+
+    def _scan_disk(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".p3"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_mtime, st.st_size
+
+    def _evict_disk(self):
+        """删除最久未访问的文件，直到总大小降到上限的90%"""
+        entries = sorted(self._scan_disk(), key=lambda e: e[1])
+        total = sum(size for _, _, size in entries)
+        target = int(self.disk_max_bytes * 0.9)
+        for path, _, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+        with self._lock:
+            self._disk_bytes = total
+
+
+_tts_cache: Optional[TTSAudioCache] = None
+# 创建当前缓存实例所用的配置，配置变化时重建
+_tts_cache_config: Optional[dict] = None
+_tts_cache_lock = threading.Lock()
+
+
+def get_tts_cache(config: dict) -> Optional[TTSAudioCache]:
+    """按配置获取进程内共享的TTS缓存，未开启时返回None
+
+    缓存配置变化（如服务端下发新配置）时按新配置重建实例，内存层随旧实例丢弃，磁盘层文件继续复用
+    """
+    global _tts_cache, _tts_cache_config
+    cache_config = config.get("tts_cache") or {}
+    if not cache_config.get("enabled", False):
+        return None
+    if _tts_cache is None or _tts_cache_config != cache_config:
+        with _tts_cache_lock:
+            if _tts_cache is None or _tts_cache_config != cache_config:
+                disk_dir = cache_config.get("disk_dir") or None
+                _tts_cache = TTSAudioCache(
+                    memory_max_bytes=int(cache_config.get("memory_max_mb", 64)) * 1024 * 1024,
+                    disk_dir=disk_dir,
+                    disk_max_bytes=int(cache_config.get("disk_max_mb", 512)) * 1024 * 1024,
+                    max_text_length=int(cache_config.get("max_text_length", 50)),
+                )
+                _tts_cache_config = dict(cache_config)
+                logger.bind(tag=TAG).info(
+                    f"TTS缓存已开启，内存上限{cache_config.get('memory_max_mb', 64)}MB，磁盘目录{disk_dir}"
+                )
+    return _tts_cache
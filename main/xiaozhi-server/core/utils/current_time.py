@@ -4,7 +4,8 @@
 """
 
 import cnlunar
-from datetime import datetime
+import functools
+from datetime import date, datetime
 
 WEEKDAY_MAP = {
     "Monday": "星期一",
@@ -44,17 +45,22 @@ def get_current_lunar_date() -> str:
     获取农历日期字符串
     """
     try:
-        now = datetime.now()
-        today_lunar = cnlunar.Lunar(now, godType="8char")
-        return "%s年%s%s" % (
-            today_lunar.lunarYearCn,
-            today_lunar.lunarMonthCn[:-1],
-            today_lunar.lunarDayCn,
-        )
+        return _lunar_date(date.today())
     except Exception:
         return "农历获取失败"
 
 
+@functools.lru_cache(maxsize=4)
+def _lunar_date(day: date) -> str:
+    """农历计算较慢，同一天只算一次"""
+    today_lunar = cnlunar.Lunar(datetime(day.year, day.month, day.day), godType="8char")
+    return "%s年%s%s" % (
+        today_lunar.lunarYearCn,
+        today_lunar.lunarMonthCn[:-1],
+        today_lunar.lunarDayCn,
+    )
+
+
 def get_current_time_info() -> tuple:
     """
     获取当前时间信息
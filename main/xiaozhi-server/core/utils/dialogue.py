@@ -1,7 +1,42 @@
 import uuid
 import re
-from typing import List, Dict
+import json
+import time
+import threading
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 每条消息除内容外的固定开销（角色、分隔符等），按token估算
+MESSAGE_TOKEN_OVERHEAD = 4
+
+# 摘要函数：(已有摘要, 新移出窗口的消息) -> 新摘要，失败时返回None
+Summarizer = Callable[[str, List["Message"]], Optional[str]]
+
+# 摘要失败后暂停压缩的秒数，连续失败时翻倍
+SUMMARY_RETRY_INTERVAL = 30
+# 连续失败达到次数后放弃压缩这批消息，直接丢弃
+SUMMARY_MAX_FAILURES = 3
+
+# 滚动摘要的提示词
+SUMMARY_PROMPT = (
+    "你是对话摘要助手。请把已有摘要和新增的对话合并成一段简洁的摘要，"
+    "保留用户的称呼、偏好、提到的事实、做过的操作和尚未完成的事情，"
+    "不超过{max_chars}字，只输出摘要内容。"
+)
+
+
+def estimate_tokens(text) -> int:
+    """快速估算token数：中文等非ASCII字符约1个token，ASCII字符约4个一个token"""
+    if not text:
+        return 0
+    if not isinstance(text, str):
+        text = json.dumps(text, ensure_ascii=False)
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return len(text) - ascii_chars + (ascii_chars + 3) // 4
 
 
 class Message:
@@ -18,11 +53,84 @@ class Message:
         self.content = content
         self.tool_calls = tool_calls
         self.tool_call_id = tool_call_id
+        # 已被压缩进滚动摘要，不再发送给LLM
+        self.summarized = False
+        # 序列化结果和token估算缓存，内容变化时重新计算
+        self._cached_content = None
+        self._llm_message = None
+        self._tokens = 0
+
+    def _refresh(self):
+        if self._llm_message is not None and self._cached_content is self.content:
+            return
+        if self.tool_calls is not None:
+            message = {"role": self.role, "tool_calls": self.tool_calls}
+            tokens = estimate_tokens(self.tool_calls)
+        elif self.role == "tool":
+            if self.tool_call_id is None:
+                self.tool_call_id = str(uuid.uuid4())
+            message = {
+                "role": self.role,
+                "tool_call_id": self.tool_call_id,
+                "content": self.content,
+            }
+            tokens = estimate_tokens(self.content)
+        else:
+            message = {"role": self.role, "content": self.content}
+            tokens = estimate_tokens(self.content)
+        self._cached_content = self.content
+        self._llm_message = message
+        self._tokens = tokens + MESSAGE_TOKEN_OVERHEAD
+
+    def to_llm_message(self) -> Dict:
+        """发送给LLM的消息格式，返回副本，调用方可以随意修改"""
+        self._refresh()
+        return dict(self._llm_message)
+
+    @property
+    def tokens(self) -> int:
+        """估算的token数"""
+        self._refresh()
+        return self._tokens
+
+
+def format_for_summary(summary: str, messages: List["Message"]) -> str:
+    """把已有摘要和待压缩的消息整理成摘要请求的用户提示词"""
+    lines = []
+    if summary:
+        lines.append(f"已有摘要：{summary}")
+    lines.append("新增对话：")
+    for m in messages:
+        if m.role == "user":
+            lines.append(f"用户：{m.content}")
+        elif m.role == "assistant" and m.content:
+            lines.append(f"助手：{m.content}")
+        elif m.role == "tool":
+            lines.append(f"工具结果：{m.content}")
+    return "\n".join(lines)
 
 
 class Dialogue:
-    def __init__(self):
+    def __init__(self, max_tokens: int = 0, summarizer: Summarizer = None):
+        """
+        Args:
+            max_tokens: 发送给LLM的历史消息token预算（不含系统提示词），0表示不限制
+            summarizer: 把移出窗口的对话压缩成摘要的函数，在后台线程中调用，
+                为空时移出窗口的对话直接丢弃
+        """
+        # 完整的对话记录（保存记忆时使用），发送给LLM的只是其中最近的一段
         self.dialogue: List[Message] = []
+        self.max_tokens = max(0, max_tokens)
+        self.summarizer = summarizer
+        # 更早对话的滚动摘要
+        self.summary = ""
+        self._summarizing = False
+        # 连续摘要失败的次数和下次允许重试的时间
+        self._summary_failures = 0
+        self._summary_retry_at = 0.0
+        # 渲染系统提示词末尾易变上下文（时间、天气等）的函数，每轮对话调用
+        self.context_renderer: Optional[Callable[[], str]] = None
+        self._summary_lock = threading.Lock()
         # 获取当前时间
         self.current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -30,20 +138,90 @@ class Dialogue:
         self.dialogue.append(message)
 
     def getMessages(self, m, dialogue):
-        if m.tool_calls is not None:
-            dialogue.append({"role": m.role, "tool_calls": m.tool_calls})
-        elif m.role == "tool":
-            dialogue.append(
-                {
-                    "role": m.role,
-                    "tool_call_id": (
-                        str(uuid.uuid4()) if m.tool_call_id is None else m.tool_call_id
-                    ),
-                    "content": m.content,
-                }
-            )
+        dialogue.append(m.to_llm_message())
+
+    def _window(self) -> List[Message]:
+        """选出发送给LLM的最近几轮对话
+
+        从最新的消息往前累加token，窗口只从用户消息处开始，工具调用和工具结果不会被拆开；
+        最近一轮对话超出预算时也完整保留。超出预算的更早对话交给后台压缩成摘要。
+        """
+        messages = [m for m in self.dialogue if m.role != "system"]
+        if not self.max_tokens:
+            return [m for m in messages if not m.summarized]
+
+        total = 0
+        start = None
+        # 压缩后保留一半预算，避免每轮对话都触发压缩
+        keep_start = None
+        for i in range(len(messages) - 1, -1, -1):
+            m = messages[i]
+            if m.summarized:
+                break
+            total += m.tokens
+            if m.role != "user":
+                continue
+            if total <= self.max_tokens or start is None:
+                start = i
+            if total <= self.max_tokens // 2 or keep_start is None:
+                keep_start = i
         else:
-            dialogue.append({"role": m.role, "content": m.content})
+            i = -1
+        if start is None:
+            # 窗口内没有用户消息（如只有开场白），全部保留
+            return messages[i + 1 :]
+
+        if start > i + 1:
+            # 有超出预算的更早消息。压缩到一半预算处，窗口内较早的几轮也一并写入摘要，
+            # 这几轮在摘要生成后才标记并移出窗口，此前仍完整发送，不会丢失上下文
+            self._fold(messages[i + 1 : keep_start])
+        return messages[start:]
+
+    def _fold(self, messages: List[Message]):
+        """在后台把移出窗口的消息压缩进滚动摘要，同一时间只有一个压缩任务"""
+        if not messages:
+            return
+        if self.summarizer is None:
+            for m in messages:
+                m.summarized = True
+            return
+        with self._summary_lock:
+            # 摘要失败后退避一段时间，不在每轮对话都请求LLM
+            if self._summarizing or time.time() < self._summary_retry_at:
+                return
+            self._summarizing = True
+
+        def run():
+            summary = None
+            try:
+                summary = self.summarizer(self.summary, messages)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"对话摘要生成失败: {e}")
+            with self._summary_lock:
+                if summary:
+                    self.summary = summary
+                    self._summary_failures = 0
+                    self._summary_retry_at = 0.0
+                    for m in messages:
+                        m.summarized = True
+                else:
+                    self._summary_failures += 1
+                    if self._summary_failures >= SUMMARY_MAX_FAILURES:
+                        # 多次失败后不再保留这批消息，窗口外的消息不会无限累积
+                        logger.bind(tag=TAG).warning(
+                            f"对话摘要连续失败{self._summary_failures}次，丢弃{len(messages)}条早期消息"
+                        )
+                        self._summary_failures = 0
+                        self._summary_retry_at = 0.0
+                        for m in messages:
+                            m.summarized = True
+                    else:
+                        self._summary_retry_at = time.time() + SUMMARY_RETRY_INTERVAL * (
+                            2 ** (self._summary_failures - 1)
+                        )
+                self._summarizing = False
+
+        threading.Thread(target=run, name="dialogue-summary", daemon=True).start()
 
     def get_llm_dialogue(self) -> List[Dict[str, str]]:
         # 直接调用get_llm_dialogue_with_memory，传入None作为memory_str
@@ -71,18 +249,15 @@ class Dialogue:
         )
 
         if system_message:
-            # 基础系统提示
-            enhanced_system_prompt = system_message.content
-            # 替换时间占位符
-            enhanced_system_prompt = enhanced_system_prompt.replace(
-                "{{current_time}}", datetime.now().strftime("%H:%M")
-            )
+            # 静态前缀：基础系统提示和说话人描述，会话期间保持不变，便于LLM服务端前缀缓存
+            static_prompt = system_message.content
+            current_time = datetime.now().strftime("%H:%M")
 
             # 添加说话人个性化描述
             try:
                 speakers = voiceprint_config.get("speakers", [])
                 if speakers:
-                    enhanced_system_prompt += "\n\n<speakers_info>"
+                    static_prompt += "\n\n<speakers_info>"
                     for speaker_str in speakers:
                         try:
                             parts = speaker_str.split(",", 2)
@@ -92,27 +267,47 @@ class Dialogue:
                                 description = (
                                     parts[2].strip() if len(parts) >= 3 else ""
                                 )
-                                enhanced_system_prompt += f"\n- {name}：{description}"
+                                static_prompt += f"\n- {name}：{description}"
                         except:
                             pass
-                    enhanced_system_prompt += "\n\n</speakers_info>"
+                    static_prompt += "\n\n</speakers_info>"
             except:
                 # 配置读取失败时忽略错误，不影响其他功能
                 pass
 
+            # 易变上下文：时间、天气、记忆、对话摘要，放在系统提示词末尾
+            context = self.context_renderer() if self.context_renderer else ""
+            context = context.replace("{{current_time}}", current_time)
+            if "{{current_time}}" in static_prompt:
+                # 时间每分钟都在变，不能留在静态前缀里，改为放到易变上下文中
+                static_prompt = static_prompt.replace(
+                    "{{current_time}}", "（见末尾的当前时间）"
+                )
+                context = f"当前时间：{current_time}\n{context}"
+
             # 使用正则表达式匹配 <memory> 标签，不管中间有什么内容
             if memory_str is not None:
-                enhanced_system_prompt = re.sub(
-                    r"<memory>.*?</memory>",
-                    f"<memory>\n{memory_str}\n</memory>",
-                    enhanced_system_prompt,
-                    flags=re.DOTALL,
-                )
-            dialogue.append({"role": "system", "content": enhanced_system_prompt})
+                memory_block = f"<memory>\n{memory_str}\n</memory>"
+                if "<memory>" in context:
+                    context = re.sub(
+                        r"<memory>.*?</memory>",
+                        lambda _: memory_block,
+                        context,
+                        flags=re.DOTALL,
+                    )
+                else:
+                    # 快速提示词或自定义模板中没有单独的上下文部分，记忆追加在末尾，静态前缀不变
+                    context += f"\n\n{memory_block}"
+            if self.summary:
+                context += f"\n\n<dialogue_summary>\n{self.summary}\n</dialogue_summary>"
+
+            system_prompt = static_prompt
+            if context.strip():
+                system_prompt = f"{static_prompt.rstrip()}\n\n{context.strip()}"
+            dialogue.append({"role": "system", "content": system_prompt})
 
-        # 添加用户和助手的对话
-        for m in self.dialogue:
-            if m.role != "system":  # 跳过原始的系统消息
-                self.getMessages(m, dialogue)
+        # 添加最近几轮用户和助手的对话
+        for m in self._window():
+            self.getMessages(m, dialogue)
 
         return dialogue
@@ -0,0 +1,125 @@
+"""
+微批推理调度器
+把很短时间内从多个连接到达的推理请求合并成一次批量调用，
+批量调用在独立线程中执行，不阻塞事件循环
+"""
+
+import time
+import queue
+import asyncio
+import threading
+import concurrent.futures
+from typing import Any, Callable, List
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class MicroBatcher:
+    """微批调度器
+
+    第一个请求到达后最多再等待max_wait_ms，期间到达的请求（最多max_batch_size个）
+    合并交给batch_fn一次处理，每个请求通过各自的Future拿到结果。
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: int = 10,
+        name: str = "micro-batcher",
+    ):
+        """
+        Args:
+            batch_fn: 批量处理函数，输入请求列表，按相同顺序返回结果列表
+            max_batch_size: 单批最多合并的请求数
+            max_wait_ms: 第一个请求到达后等待更多请求的最长时间（毫秒）
+            name: 工作线程名称
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit_nowait(self, item: Any) -> concurrent.futures.Future:
+        """提交请求，返回concurrent.futures.Future，关闭后提交的请求直接以异常结束"""
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._closed:
+                future.set_exception(RuntimeError("批处理器已关闭"))
+            else:
+                self._queue.put((item, future))
+        return future
+
+    async def submit(self, item: Any) -> Any:
+        """提交请求并等待结果"""
+        return await asyncio.wrap_future(self.submit_nowait(item))
+
+    def close(self):
+        """停止工作线程并释放batch_fn（及其绑定的模型），仍在排队的请求以异常结束
+
+        正在执行的批次会正常完成，调用方不必等待线程退出
+        """
+        pending = []
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._queue.put(None)
+        error = RuntimeError("批处理器已关闭")
+        for _, future in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def _collect(self):
+        """收集一批请求，第二个返回值表示收到了关闭信号"""
+        request = self._queue.get()
+        if request is None:
+            return [], True
+        batch = [request]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # 等待时间已到，只取已经在排队的请求
+                    request = self._queue.get_nowait()
+                else:
+                    request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self._collect()
+            # 已被调用方取消的请求不再处理
+            batch = [(item, f) for item, f in batch if f.set_running_or_notify_cancel()]
+            if batch:
+                self._process(batch)
+        self.batch_fn = None
+
+    def _process(self, batch):
+        try:
+            results = self.batch_fn([item for item, _ in batch])
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"批量推理失败: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
@@ -1,6 +1,7 @@
 from typing import Dict, Any
 from config.logger import setup_logging
 from core.utils import tts, llm, intent, memory, vad, asr
+from core.providers.asr.worker_pool import PooledASRProvider, POOLABLE_ASR_TYPES
 
 TAG = __name__
 logger = setup_logging()
@@ -120,10 +121,25 @@ def initialize_asr(config):
         if "type" not in config["ASR"][select_asr_module]
         else config["ASR"][select_asr_module]["type"]
     )
+    asr_config = config["ASR"][select_asr_module]
+    delete_audio_file = str(config.get("delete_audio", True)).lower() in ("true", "1", "yes")
+    worker_processes = int(asr_config.get("worker_processes") or 0)
+    if worker_processes > 0 and asr_type in POOLABLE_ASR_TYPES:
+        # 本地模型放到子进程池中推理，主进程只保留代理
+        new_asr = PooledASRProvider(
+            asr_type, asr_config, delete_audio_file, worker_processes
+        )
+        server_workers = int(config.get("server", {}).get("workers") or 1)
+        if server_workers > 1:
+            logger.bind(tag=TAG).warning(
+                f"每个WebSocket工作进程各自启动ASR推理池，共{server_workers * worker_processes}个推理子进程"
+            )
+        logger.bind(tag=TAG).info("ASR模块初始化完成")
+        return new_asr
     new_asr = asr.create_instance(
         asr_type,
-        config["ASR"][select_asr_module],
-        str(config.get("delete_audio", True)).lower() in ("true", "1", "yes"),
+        asr_config,
+        delete_audio_file,
     )
     logger.bind(tag=TAG).info("ASR模块初始化完成")
     return new_asr
@@ -0,0 +1,127 @@
+"""
+音乐库预转码
+音乐目录中的mp3/wav等文件在后台转码一次为p3格式（16kHz单声道60ms Opus帧），
+播放时直接通过mmap逐帧读取，不再每次点歌都完整解码并重新编码整首歌；
+同一首歌被多台设备同时播放时共享操作系统页缓存。
+"""
+
+import os
+import queue
+import struct
+import hashlib
+import threading
+from typing import Dict, Iterable, Optional
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class MusicLibrary:
+    """音乐文件到预转码p3文件的映射，转码在单个后台线程中排队执行"""
+
+    def __init__(self, cache_dir: str):
+        # 使用绝对路径，避免被TTS按输出目录前缀当作临时文件删除
+        self.cache_dir = os.path.abspath(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._ready: Dict[str, str] = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._tasks: "queue.Queue[str]" = queue.Queue()
+        self._worker = threading.Thread(
+            target=self._transcode_loop, name="music-indexer", daemon=True
+        )
+        self._worker.start()
+
+    def _cache_path(self, music_path: str) -> Optional[str]:
+        """缓存文件名由源文件路径、大小、修改时间决定，源文件变化后自动重新转码"""
+        try:
+            st = os.stat(music_path)
+        except OSError:
+            return None
+        raw = f"{os.path.abspath(music_path)}\0{st.st_size}\0{st.st_mtime_ns}"
+        digest = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.p3")
+
+    def index(self, music_paths: Iterable[str]):
+        """登记音乐文件，尚未转码的加入后台转码队列"""
+        for music_path in music_paths:
+            self._lookup(music_path, schedule=True)
+
+    def resolve(self, music_path: str) -> str:
+        """返回可直接播放的文件：已转码的返回p3文件，否则返回原文件并安排转码"""
+        return self._lookup(music_path, schedule=True) or music_path
+
+    def _lookup(self, music_path: str, schedule: bool) -> Optional[str]:
+        if music_path.lower().endswith(".p3"):
+            return music_path
+        cache_path = self._cache_path(music_path)
+        if cache_path is None:
+            return None
+        with self._lock:
+            if self._ready.get(music_path) == cache_path:
+                return cache_path
+        if os.path.exists(cache_path):
+            with self._lock:
+                self._ready[music_path] = cache_path
+            return cache_path
+        if schedule:
+            with self._lock:
+                if music_path in self._pending:
+                    return None
+                self._pending.add(music_path)
+            self._tasks.put(music_path)
+        return None
+
+    def _transcode_loop(self):
+        while True:
+            music_path = self._tasks.get()
+            try:
+                self._transcode(music_path)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"音乐预转码失败: {music_path}, {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(music_path)
+
+    def _transcode(self, music_path: str):
+        from core.utils.util import audio_to_data_stream
+
+        cache_path = self._cache_path(music_path)
+        if cache_path is None or os.path.exists(cache_path):
+            return
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+
+                def write_frame(opus_data: bytes):
+                    # p3格式：每帧4字节头[类型, 保留, 2字节长度]加帧数据
+                    f.write(struct.pack(">BBH", 0, 0, len(opus_data)))
+                    f.write(opus_data)
+
+                audio_to_data_stream(music_path, is_opus=True, callback=write_frame)
+            os.replace(tmp_path, cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            self._ready[music_path] = cache_path
+        logger.bind(tag=TAG).info(f"音乐预转码完成: {music_path}")
+
+
+_music_library: Optional[MusicLibrary] = None
+_music_library_lock = threading.Lock()
+
+
+def get_music_library(music_config: dict) -> Optional[MusicLibrary]:
+    """按play_music插件配置获取进程内共享的音乐库，未开启预转码时返回None"""
+    global _music_library
+    if not music_config.get("transcode_cache", True):
+        return None
+    if _music_library is None:
+        with _music_library_lock:
+            if _music_library is None:
+                _music_library = MusicLibrary(
+                    music_config.get("cache_dir", "tmp/music_cache")
+                )
+    return _music_library
@@ -4,11 +4,127 @@ Opus编码工具类
 """
 
 import logging
+import threading
 import traceback
 import numpy as np
 from opuslib_next import Encoder
 from opuslib_next import constants
-from typing import Optional, Callable, Any
+from typing import Dict, Iterator, List, Optional, Callable, Any, Tuple
+
+# 每种编码参数最多保留的空闲编码器数量
+MAX_IDLE_ENCODERS = 32
+
+
+class OpusEncoderPool:
+    """Opus编码器池
+
+    创建编码器需要分配并初始化libopus状态，逐句创建开销不小；
+    编码器用完后重置状态放回池中，按 (采样率, 通道数, 应用模式, 码率, 复杂度, 信号类型) 区分。
+    """
+
+    def __init__(self, max_idle: int = MAX_IDLE_ENCODERS):
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple, List[Encoder]] = {}
+        self._leased: Dict[int, Tuple] = {}
+        self._lock = threading.Lock()
+
+    def acquire(
+        self,
+        sample_rate: int,
+        channels: int,
+        application: int = constants.APPLICATION_AUDIO,
+        bitrate: Optional[int] = None,
+        complexity: Optional[int] = None,
+        signal: Optional[int] = None,
+    ) -> Encoder:
+        """取出一个编码器，参数为None的项保持libopus默认值"""
+        key = (sample_rate, channels, application, bitrate, complexity, signal)
+        with self._lock:
+            idle = self._idle.get(key)
+            encoder = idle.pop() if idle else None
+        if encoder is None:
+            encoder = Encoder(sample_rate, channels, application)
+            if bitrate is not None:
+                encoder.bitrate = bitrate
+            if complexity is not None:
+                encoder.complexity = complexity
+            if signal is not None:
+                encoder.signal = signal
+        with self._lock:
+            self._leased[id(encoder)] = key
+        return encoder
+
+    def release(self, encoder: Encoder):
+        """重置编码器状态后放回池中（码率等设置不受重置影响）"""
+        with self._lock:
+            key = self._leased.pop(id(encoder), None)
+        if key is None:
+            return
+        try:
+            encoder.reset_state()
+        except Exception as e:
+            logging.error(f"重置Opus编码器失败: {e}")
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(encoder)
+
+
+_encoder_pool = OpusEncoderPool()
+
+
+def get_opus_encoder_pool() -> OpusEncoderPool:
+    """获取进程内共享的Opus编码器池"""
+    return _encoder_pool
+
+
+class PcmFrameSplitter:
+    """把任意长度的PCM分块切成固定长度的帧
+
+    整帧部分直接在输入数组上reshape，不复制数据；不足一帧的尾部样本留在固定大小的缓冲区，
+    与下一块拼成完整帧，不会随数据量增长反复分配内存。
+    """
+
+    def __init__(self, frame_samples: int):
+        self.frame_samples = frame_samples
+        self._carry = np.zeros(frame_samples, dtype=np.int16)
+        self._carry_len = 0
+
+    def feed(self, samples: np.ndarray) -> Iterator[np.ndarray]:
+        """输入一块样本，依次产出完整帧；产出的帧在下次调用前有效"""
+        if self._carry_len:
+            take = min(self.frame_samples - self._carry_len, len(samples))
+            self._carry[self._carry_len : self._carry_len + take] = samples[:take]
+            self._carry_len += take
+            samples = samples[take:]
+            if self._carry_len < self.frame_samples:
+                return
+            self._carry_len = 0
+            yield self._carry
+
+        full = len(samples) // self.frame_samples
+        if full:
+            yield from samples[: full * self.frame_samples].reshape(
+                full, self.frame_samples
+            )
+
+        rest = len(samples) - full * self.frame_samples
+        if rest:
+            self._carry[:rest] = samples[full * self.frame_samples :]
+            self._carry_len = rest
+
+    def flush(self) -> Optional[np.ndarray]:
+        """取出剩余样本，不足一帧的部分补零；没有剩余时返回None"""
+        if not self._carry_len:
+            return None
+        self._carry[self._carry_len :] = 0
+        self._carry_len = 0
+        return self._carry
+
+    def reset(self):
+        self._carry_len = 0
+
 
 class OpusEncoderUtils:
     """PCM到Opus的编码器"""
@@ -34,25 +150,31 @@ class OpusEncoderUtils:
         self.bitrate = 24000  # bps
         self.complexity = 10  # 最高质量
 
-        # 缓冲区初始化为空
-        self.buffer = np.array([], dtype=np.int16)
+        # 不足一帧的样本暂存在固定大小的缓冲区
+        self.splitter = PcmFrameSplitter(self.total_frame_size)
+        # 编码器关闭后会归还编码器池，编码与归还互斥，避免同一编码器被两个连接同时使用
+        self._encoder_lock = threading.Lock()
 
         try:
-            # 创建Opus编码器
-            self.encoder = Encoder(
-                sample_rate, channels, constants.APPLICATION_AUDIO  # 音频优化模式
+            # 从编码器池取出Opus编码器
+            self.encoder = get_opus_encoder_pool().acquire(
+                sample_rate,
+                channels,
+                constants.APPLICATION_AUDIO,  # 音频优化模式
+                bitrate=self.bitrate,
+                complexity=self.complexity,
+                signal=constants.SIGNAL_VOICE,  # 语音信号优化
             )
-            self.encoder.bitrate = self.bitrate
-            self.encoder.complexity = self.complexity
-            self.encoder.signal = constants.SIGNAL_VOICE  # 语音信号优化
         except Exception as e:
             logging.error(f"初始化Opus编码器失败: {e}")
             raise RuntimeError("初始化失败") from e
 
     def reset_state(self):
         """重置编码器状态"""
-        self.encoder.reset_state()
-        self.buffer = np.array([], dtype=np.int16)
+        with self._encoder_lock:
+            if self.encoder is not None:
+                self.encoder.reset_state()
+        self.splitter.reset()
 
     def encode_pcm_to_opus_stream(self, pcm_data: bytes, end_of_stream: bool, callback: Callable[[Any], Any]):
         """
@@ -69,46 +191,31 @@ class OpusEncoderUtils:
         # 将字节数据转换为short数组
         new_samples = self._convert_bytes_to_shorts(pcm_data)
 
-        # 校验PCM数据
-        self._validate_pcm_data(new_samples)
-
-        # 将新数据追加到缓冲区
-        self.buffer = np.append(self.buffer, new_samples)
-
-        offset = 0
-
-        # 处理所有完整帧
-        while offset <= len(self.buffer) - self.total_frame_size:
-            frame = self.buffer[offset : offset + self.total_frame_size]
+        # 处理所有完整帧，不足一帧的样本留到下次
+        for frame in self.splitter.feed(new_samples):
             output = self._encode(frame)
             if output:
                 callback(output)
-            offset += self.total_frame_size
-
-        # 保留未处理的样本
-        self.buffer = self.buffer[offset:]
 
-        # 流结束时处理剩余数据
-        if end_of_stream and len(self.buffer) > 0:
-            # 创建最后一帧并用0填充
-            last_frame = np.zeros(self.total_frame_size, dtype=np.int16)
-            last_frame[: len(self.buffer)] = self.buffer
-
-            output = self._encode(last_frame)
-            if output:
-                callback(output)
-            self.buffer = np.array([], dtype=np.int16)
+        # 流结束时处理剩余数据，最后一帧用0填充
+        if end_of_stream:
+            last_frame = self.splitter.flush()
+            if last_frame is not None:
+                output = self._encode(last_frame)
+                if output:
+                    callback(output)
 
     def _encode(self, frame: np.ndarray) -> Optional[bytes]:
         """编码一帧音频数据"""
         try:
-            # 编码器已释放，跳过编码
-            if not hasattr(self, 'encoder') or self.encoder is None:
-                return None
-            # 将numpy数组转换为bytes
-            frame_bytes = frame.tobytes()
-            # opuslib要求输入字节数必须是channels*2的倍数
-            encoded = self.encoder.encode(frame_bytes, self.frame_size)
+            with self._encoder_lock:
+                # 编码器已释放，跳过编码
+                if not hasattr(self, 'encoder') or self.encoder is None:
+                    return None
+                # 将numpy数组转换为bytes
+                frame_bytes = frame.tobytes()
+                # opuslib要求输入字节数必须是channels*2的倍数
+                encoded = self.encoder.encode(frame_bytes, self.frame_size)
             return encoded
         except Exception as e:
             logging.error(f"Opus编码失败: {e}")
@@ -120,20 +227,13 @@ class OpusEncoderUtils:
         # 假设输入是小端字节序的16位PCM
         return np.frombuffer(bytes_data, dtype=np.int16)
 
-    def _validate_pcm_data(self, pcm_shorts: np.ndarray) -> None:
-        """验证PCM数据是否有效"""
-        # 16位PCM数据范围是 -32768 到 32767
-        if np.any((pcm_shorts < -32768) | (pcm_shorts > 32767)):
-            invalid_samples = pcm_shorts[(pcm_shorts < -32768) | (pcm_shorts > 32767)]
-            logging.warning(f"发现无效PCM样本: {invalid_samples[:5]}...")
-            # 在实际应用中可以选择裁剪而不是抛出异常
-            # np.clip(pcm_shorts, -32768, 32767, out=pcm_shorts)
-
     def close(self):
         """关闭编码器并释放资源"""
         if hasattr(self, 'encoder') and self.encoder:
             try:
-                del self.encoder
-                self.encoder = None
+                with self._encoder_lock:
+                    encoder, self.encoder = self.encoder, None
+                # 归还编码器池，供其他连接复用
+                get_opus_encoder_pool().release(encoder)
             except Exception as e:
                 logging.error(f"Error releasing Opus encoder: {e}")
\ No newline at end of file
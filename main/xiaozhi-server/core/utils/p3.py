@@ -1,3 +1,5 @@
+import os
+import mmap
 import struct
 
 def decode_opus_from_file(input_file):
@@ -56,4 +58,47 @@ def decode_opus_from_bytes(input_bytes):
         total_frames += 1
 
     total_duration = (total_frames * frame_duration_ms) / 1000.0
-    return opus_datas, total_duration
\ No newline at end of file
+    return opus_datas, total_duration
+
+
+def iter_opus_frames(buffer):
+    """
+    逐帧遍历p3格式的数据（bytes或mmap），不复制整个文件。
+    """
+    offset = 0
+    size = len(buffer)
+    while offset + 4 <= size:
+        _, _, data_len = struct.unpack_from('>BBH', buffer, offset)
+        offset += 4
+        if offset + data_len > size:
+            raise ValueError(f"Data length({size - offset}) mismatch({data_len}) in the file.")
+        yield buffer[offset:offset + data_len]
+        offset += data_len
+
+
+def iter_opus_frames_from_file(input_file):
+    """
+    按需逐帧读取p3文件中的 Opus 数据。
+    文件通过mmap映射，多个连接同时播放同一文件时共享操作系统页缓存。
+    """
+    with open(input_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter_opus_frames(mm)
+
+
+def decode_opus_from_file_stream(input_file, callback):
+    """
+    从p3文件中逐帧读取 Opus 数据并回调。
+    """
+    for opus_data in iter_opus_frames_from_file(input_file):
+        callback(opus_data)
+
+
+def decode_opus_from_bytes_stream(input_bytes, callback):
+    """
+    从p3二进制数据中逐帧读取 Opus 数据并回调。
+    """
+    for opus_data in iter_opus_frames(input_bytes):
+        callback(opus_data)
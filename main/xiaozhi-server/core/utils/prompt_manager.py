@@ -1,15 +1,41 @@
 """
 系统提示词管理器模块
 负责管理和更新系统提示词，包括快速初始化和异步增强功能
+
+提示词分为两部分：模板中<context>之前的人设、工具规则、表情列表等是静态前缀，
+一个设备的整个会话期间逐字节不变；<context>及之后的时间、天气、记忆等是易变上下文，
+每轮对话重新渲染并放在系统提示词末尾。这样每轮请求的开头保持一致，
+支持前缀缓存的推理服务（vLLM、Ollama、OpenAI等）可以命中缓存，降低首字延迟。
 """
 
 import os
-from typing import Dict, Any
+import re
+import functools
+from typing import Dict, Any, Tuple
 from config.logger import setup_logging
-from jinja2 import Template
+from jinja2 import Environment, Template
 
 TAG = __name__
 
+# 模板中易变上下文的起始标记，需单独成行（正文中提到的`<context>`不算）
+VOLATILE_MARKER = re.compile(r"^<context>", re.MULTILINE)
+
+_jinja_env = Environment()
+
+
+@functools.lru_cache(maxsize=32)
+def compile_template(source: str) -> Template:
+    """编译并缓存Jinja模板，同一模板内容只编译一次"""
+    return _jinja_env.from_string(source)
+
+
+def split_template(source: str) -> Tuple[str, str]:
+    """把模板拆成静态前缀和易变上下文两部分，没有标记时整个模板都是静态的"""
+    match = VOLATILE_MARKER.search(source)
+    if match is None:
+        return source, ""
+    return source[: match.start()].rstrip() + "\n", source[match.start() :]
+
 WEEKDAY_MAP = {
     "Monday": "星期一",
     "Tuesday": "星期二",
@@ -204,12 +230,45 @@ class PromptManager:
     def build_enhanced_prompt(
         self, user_prompt: str, device_id: str, client_ip: str = None, *args, **kwargs
     ) -> str:
-        """构建增强的系统提示词"""
+        """构建增强系统提示词的静态前缀，易变上下文由build_context在每轮对话时生成"""
         if not self.base_prompt_template:
             return user_prompt
 
         try:
-            # 获取最新的时间信息（不缓存）
+            static_template, _ = split_template(self.base_prompt_template)
+            enhanced_prompt = compile_template(static_template).render(
+                base_prompt=user_prompt,
+                # 自定义模板在静态部分使用当前时间的，每轮对话时再替换
+                current_time="{{current_time}}",
+                emojiList=EMOJI_List,
+                device_id=device_id,
+                *args,
+                **kwargs,
+            )
+            device_cache_key = f"device_prompt:{device_id}"
+            self.cache_manager.set(
+                self.CacheType.DEVICE_PROMPT, device_cache_key, enhanced_prompt
+            )
+            self.logger.bind(tag=TAG).info(
+                f"构建增强提示词成功，长度: {len(enhanced_prompt)}"
+            )
+            return enhanced_prompt
+
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"构建增强提示词失败: {e}")
+            return user_prompt
+
+    def build_context(self, device_id: str, client_ip: str = None) -> str:
+        """渲染提示词末尾的易变上下文（时间、日期、天气、位置等），每轮对话调用"""
+        if not self.base_prompt_template:
+            return ""
+        _, volatile_template = split_template(self.base_prompt_template)
+        if not volatile_template:
+            return ""
+
+        try:
+            from .current_time import get_current_time
+
             today_date, today_weekday, lunar_date = self._get_current_time_info()
 
             # 获取缓存的上下文信息
@@ -229,11 +288,8 @@ class PromptManager:
                         or ""
                     )
 
-            # 替换模板变量
-            template = Template(self.base_prompt_template)
-            enhanced_prompt = template.render(
-                base_prompt=user_prompt,
-                current_time="{{current_time}}",
+            return compile_template(volatile_template).render(
+                current_time=get_current_time(),
                 today_date=today_date,
                 today_weekday=today_weekday,
                 lunar_date=lunar_date,
@@ -243,18 +299,7 @@ class PromptManager:
                 device_id=device_id,
                 client_ip=client_ip,
                 dynamic_context=self.context_data,
-                *args,
-                **kwargs,
             )
-            device_cache_key = f"device_prompt:{device_id}"
-            self.cache_manager.set(
-                self.CacheType.DEVICE_PROMPT, device_cache_key, enhanced_prompt
-            )
-            self.logger.bind(tag=TAG).info(
-                f"构建增强提示词成功，长度: {len(enhanced_prompt)}"
-            )
-            return enhanced_prompt
-
         except Exception as e:
-            self.logger.bind(tag=TAG).error(f"构建增强提示词失败: {e}")
-            return user_prompt
+            self.logger.bind(tag=TAG).error(f"构建提示词上下文失败: {e}")
+            return ""
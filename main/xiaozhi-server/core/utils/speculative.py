@@ -0,0 +1,65 @@
+"""
+推测执行的LLM回复
+intent_llm模式下，原来要等意图识别的LLM请求返回后才开始请求对话LLM，每轮对话有两次串行的LLM往返。
+意图识别期间先发出对话请求，收到的token缓存起来不播放：
+意图是continue_chat时从缓存接着播放，识别出其他意图时取消请求并丢弃缓存。
+"""
+
+import asyncio
+from typing import AsyncIterator, Optional
+
+_END = object()
+
+
+class SpeculativeStream:
+    """在后台预读LLM流式回复，接口与LLM的异步生成器相同（async for和aclose）"""
+
+    def __init__(self, query: str, responses: AsyncIterator):
+        """
+        Args:
+            query: 发起请求时的用户消息，确认时用于核对是否为同一轮对话
+            responses: LLM的异步流式回复
+        """
+        self.query = query
+        self._responses = responses
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._error: Optional[Exception] = None
+        self._task = asyncio.get_running_loop().create_task(self._prefetch())
+
+    async def _prefetch(self):
+        try:
+            async for item in self._responses:
+                self._queue.put_nowait(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 读取时再抛出，与直接请求LLM时的行为一致
+            self._error = e
+        finally:
+            try:
+                await self._responses.aclose()
+            finally:
+                self._queue.put_nowait(_END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self._queue.get()
+        if item is _END:
+            # 保留结束标记，重复读取时也能结束
+            self._queue.put_nowait(_END)
+            if self._error is not None:
+                raise self._error
+            raise StopAsyncIteration
+        return item
+
+    def cancel(self):
+        """放弃推测结果，立即断开上游LLM请求"""
+        if not self._task.done():
+            self._task.cancel()
+
+    async def aclose(self):
+        self.cancel()
+        # 等待上游请求关闭，预读任务的取消不传给调用方
+        await asyncio.wait([self._task])
@@ -0,0 +1,172 @@
+"""
+TTS异步IO运行时
+进程内所有TTS请求共用一个后台事件循环和按服务地址复用的HTTP连接池，
+每句话不再新建事件循环、新建会话和重新握手TLS。
+"""
+
+import os
+import queue
+import asyncio
+import threading
+import concurrent.futures
+from urllib.parse import urlsplit
+from typing import AsyncIterator, Awaitable, Dict, Iterator, Optional, TypeVar
+import aiohttp
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+T = TypeVar("T")
+
+# 每个服务地址的最大并发连接数，超出的请求在连接池中排队
+MAX_CONNECTIONS_PER_HOST = 32
+# 空闲连接保持时间（秒）
+KEEPALIVE_TIMEOUT = 60
+
+
+class TTSRuntime:
+    """后台事件循环加HTTP连接池，由各连接的TTS线程同步提交协程"""
+
+    def __init__(
+        self,
+        max_connections_per_host: int = MAX_CONNECTIONS_PER_HOST,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+    ):
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="tts-runtime", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def submit(self, coro: Awaitable[T]) -> concurrent.futures.Future:
+        """提交协程到后台事件循环，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """在后台事件循环中执行协程并同步等待结果，供TTS线程调用"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("不能在TTS运行时线程内同步等待")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, stream: AsyncIterator[T]) -> Iterator[T]:
+        """在后台事件循环中读取异步生成器，在调用线程中同步逐个返回
+
+        事件循环里只做网络IO，解码、Opus编码和回调等CPU工作留在调用方的TTS线程，
+        不会拖慢其他连接。调用方提前结束迭代时取消后台读取。
+        """
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("不能在TTS运行时线程内同步等待")
+        items = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in stream:
+                    items.put((True, item))
+            finally:
+                items.put((False, None))
+
+        future = self.submit(pump())
+        try:
+            while True:
+                more, item = items.get()
+                if not more:
+                    break
+                yield item
+            # 抛出读取过程中的异常
+            future.result()
+        finally:
+            future.cancel()
+
+    def session(self, url: str) -> aiohttp.ClientSession:
+        """获取目标服务地址的共享会话，必须在运行时事件循环内调用"""
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        session = self._sessions.get(origin)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=0,
+                limit_per_host=self.max_connections_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[origin] = session
+        return session
+
+    async def _close_sessions(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        for session in sessions:
+            await session.close()
+
+    def close(self):
+        self.run(self._close_sessions(), timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+_runtime: Optional[TTSRuntime] = None
+_runtime_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def get_tts_runtime() -> TTSRuntime:
+    """获取进程内共享的TTS运行时"""
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = TTSRuntime()
+    return _runtime
+
+
+def _write_file(path: str, data: bytes):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+async def write_audio_file(path: str, data: bytes):
+    """在线程池中写入音频文件，避免磁盘IO阻塞共享事件循环"""
+    await asyncio.get_running_loop().run_in_executor(None, _write_file, path, data)
+
+
+def run_in_thread_loop(coro: Awaitable[T]) -> T:
+    """在当前线程复用的事件循环中执行协程
+
+    内部仍有阻塞调用的TTS不能放进共享事件循环，否则会拖慢所有连接，
+    这类TTS在各自的TTS线程中执行，但事件循环只创建一次。
+    """
+    loop = getattr(_thread_local, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _thread_local.loop = loop
+    return loop.run_until_complete(coro)
+
+
+def iterate_in_thread_loop(stream: AsyncIterator[T]) -> Iterator[T]:
+    """在当前线程复用的事件循环中逐个读取异步生成器"""
+    try:
+        while True:
+            try:
+                item = run_in_thread_loop(stream.__anext__())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            run_in_thread_loop(aclose())
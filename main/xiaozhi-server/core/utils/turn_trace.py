@@ -0,0 +1,220 @@
+"""
+对话轮次耗时追踪
+每轮对话从VAD检测到说话结束开始计时，记录ASR、意图识别、记忆查询、LLM、工具调用等各阶段耗时，
+以及LLM首字、TTS首段音频、首个音频包发出距说话结束的时间，汇总为直方图，
+通过HTTP服务的/metrics接口以Prometheus文本格式导出。
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 直方图分桶上界（秒）
+DEFAULT_BUCKETS = (
+    0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0,
+)
+
+# 各阶段自身耗时
+STAGE_METRIC = "xiaozhi_turn_stage_seconds"
+# 关键节点距说话结束的时间
+MILESTONE_METRIC = "xiaozhi_turn_milestone_seconds"
+
+METRIC_HELP = {
+    STAGE_METRIC: "Duration of each stage in a conversation turn",
+    MILESTONE_METRIC: "Time from end of user speech (VAD stop) to each milestone",
+}
+METRIC_LABEL = {STAGE_METRIC: "stage", MILESTONE_METRIC: "milestone"}
+
+
+class Histogram:
+    """固定分桶直方图，桶内保存的是非累计计数，导出时再累加"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {"counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    def merge(self, data: dict):
+        for i, c in enumerate(data["counts"]):
+            self.counts[i] += c
+        self.sum += data["sum"]
+        self.count += data["count"]
+
+
+class MetricsRegistry:
+    """进程内的直方图集合，按 指标名 -> 标签值 组织"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Histogram]] = {}
+
+    def observe(self, metric: str, label: str, value: float):
+        with self._lock:
+            series = self._histograms.setdefault(metric, {})
+            histogram = series.get(label)
+            if histogram is None:
+                histogram = series[label] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self) -> dict:
+        """导出为可序列化的字典，多进程模式下由工作进程随心跳上报主进程"""
+        with self._lock:
+            return {
+                metric: {label: h.to_dict() for label, h in series.items()}
+                for metric, series in self._histograms.items()
+            }
+
+    @staticmethod
+    def render(snapshots: List[dict]) -> str:
+        """把一个或多个快照合并后渲染为Prometheus文本格式"""
+        merged: Dict[str, Dict[str, Histogram]] = {}
+        for snapshot in snapshots:
+            for metric, series in snapshot.items():
+                for label, data in series.items():
+                    histogram = merged.setdefault(metric, {}).get(label)
+                    if histogram is None:
+                        histogram = merged[metric][label] = Histogram()
+                    histogram.merge(data)
+
+        lines = []
+        for metric in sorted(merged):
+            label_name = METRIC_LABEL.get(metric, "name")
+            lines.append(f"# HELP {metric} {METRIC_HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {metric} histogram")
+            for label in sorted(merged[metric]):
+                histogram = merged[metric][label]
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{metric}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(
+                    f'{metric}_bucket{{{label_name}="{label}",le="+Inf"}} {histogram.count}'
+                )
+                lines.append(f'{metric}_sum{{{label_name}="{label}"}} {histogram.sum:.6f}')
+                lines.append(f'{metric}_count{{{label_name}="{label}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def render_local(self) -> str:
+        return self.render([self.snapshot()])
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取当前进程的指标集合"""
+    return _registry
+
+
+class TurnTrace:
+    """一轮对话的耗时记录
+
+    各阶段分布在事件循环、LLM线程和音频播放线程中，所有方法都是线程安全的；
+    关键节点每轮只记录第一次，结束后的记录全部忽略。
+    """
+
+    def __init__(self, session_id: str, start_time: Optional[float] = None):
+        self.session_id = session_id
+        self.start_time = start_time if start_time is not None else time.monotonic()
+        self.stages: Dict[str, float] = {}
+        self.milestones: Dict[str, float] = {}
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def record_stage(self, stage: str, seconds: float):
+        """记录一个阶段的耗时，同一阶段多次出现（如多次工具调用）时累加"""
+        with self._lock:
+            if self.finished:
+                return
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        _registry.observe(STAGE_METRIC, stage, seconds)
+
+    def mark(self, milestone: str):
+        """记录关键节点距本轮开始的时间，只记录第一次"""
+        with self._lock:
+            if self.finished or milestone in self.milestones:
+                return
+            elapsed = time.monotonic() - self.start_time
+            self.milestones[milestone] = elapsed
+        _registry.observe(MILESTONE_METRIC, milestone, elapsed)
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.monotonic() - start)
+
+    @asynccontextmanager
+    async def aspan(self, stage: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.monotonic() - start)
+
+    def finish(self, completed: bool = True):
+        """本轮结束，输出本轮汇总
+
+        Args:
+            completed: 最后一段音频正常发出为True，被打断或没有回复时为False
+        """
+        if completed:
+            self.mark("turn_complete")
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            stages = ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in self.stages.items())
+            milestones = ", ".join(
+                f"{k}={v * 1000:.0f}ms" for k, v in self.milestones.items()
+            )
+        logger.bind(tag=TAG).debug(
+            f"本轮耗时 session={self.session_id} 阶段[{stages}] 节点[{milestones}]"
+        )
+
+
+class _NullTrace(TurnTrace):
+    """没有进行中的轮次时使用，所有记录都被忽略"""
+
+    def __init__(self):
+        super().__init__("", 0.0)
+        self.finished = True
+
+    def finish(self, completed: bool = True):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+def start_turn(conn, start_time: Optional[float] = None) -> TurnTrace:
+    """说话结束时开始新一轮记录，上一轮未正常结束的直接丢弃"""
+    previous = getattr(conn, "turn_trace", None)
+    if previous is not None:
+        previous.finish(completed=False)
+    conn.turn_trace = TurnTrace(conn.session_id, start_time)
+    return conn.turn_trace
+
+
+def current_turn(conn) -> TurnTrace:
+    """获取连接当前的轮次记录，没有时返回空记录"""
+    return getattr(conn, "turn_trace", None) or NULL_TRACE
@@ -1,5 +1,4 @@
 import re
-import os
 import json
 import copy
 import wave
@@ -11,8 +10,9 @@ import numpy as np
 import opuslib_next
 from io import BytesIO
 from core.utils import p3
-from pydub import AudioSegment
-from typing import Callable, Any
+from typing import Callable, Any, Iterable, Iterator
+from core.utils.audio_decode import decode_to_pcm_chunks
+from core.utils.opus_encoder_utils import get_opus_encoder_pool, PcmFrameSplitter
 
 TAG = __name__
 emoji_map = {
@@ -252,22 +252,11 @@ def extract_json_from_string(input_string):
 def audio_to_data_stream(
     audio_file_path, is_opus=True, callback: Callable[[Any], Any] = None
 ) -> None:
-    # 获取文件后缀名
-    file_type = os.path.splitext(audio_file_path)[1]
-    if file_type:
-        file_type = file_type.lstrip(".")
-    # 读取音频文件，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
-    audio = AudioSegment.from_file(
-        audio_file_path, format=file_type, parameters=["-nostdin"]
+    # 解码为16kHz单声道PCM后分块编码
+    pcm_chunks_to_data_stream(
+        decode_to_pcm_chunks(audio_file_path), is_opus, callback
     )
 
-    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
-    audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-
-    # 获取原始PCM数据（16位小端）
-    raw_data = audio.raw_data
-    pcm_to_data_stream(raw_data, is_opus, callback)
-
 
 async def audio_to_data(
     audio_file_path: str, is_opus: bool = True, use_cache: bool = True
@@ -292,48 +281,8 @@ async def audio_to_data(
             return cached_result
 
     def _sync_audio_to_data():
-        # 获取文件后缀名
-        file_type = os.path.splitext(audio_file_path)[1]
-        if file_type:
-            file_type = file_type.lstrip(".")
-        # 读取音频文件，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
-        audio = AudioSegment.from_file(
-            audio_file_path, format=file_type, parameters=["-nostdin"]
-        )
-
-        # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
-        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-
-        # 获取原始PCM数据（16位小端）
-        raw_data = audio.raw_data
-
-        # 初始化Opus编码器
-        encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
-
-        # 编码参数
-        frame_duration = 60  # 60ms per frame
-        frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
-
         datas = []
-        # 按帧处理所有音频数据（包括最后一帧可能补零）
-        for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-            # 获取当前帧的二进制数据
-            chunk = raw_data[i : i + frame_size * 2]
-
-            # 如果最后一帧不足，补零
-            if len(chunk) < frame_size * 2:
-                chunk += b"\x00" * (frame_size * 2 - len(chunk))
-
-            if is_opus:
-                # 转换为numpy数组处理
-                np_frame = np.frombuffer(chunk, dtype=np.int16)
-                # 编码Opus数据
-                frame_data = encoder.encode(np_frame.tobytes(), frame_size)
-            else:
-                frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
-
-            datas.append(frame_data)
-
+        audio_to_data_stream(audio_file_path, is_opus, callback=datas.append)
         return datas
 
     loop = asyncio.get_running_loop()
@@ -357,41 +306,54 @@ def audio_bytes_to_data_stream(
         # 直接用p3解码
         return p3.decode_opus_from_bytes_stream(audio_bytes, callback)
     else:
-        # 其他格式用pydub
-        audio = AudioSegment.from_file(
-            BytesIO(audio_bytes), format=file_type, parameters=["-nostdin"]
+        # 其他格式在进程内解码，无法处理的格式才使用ffmpeg
+        pcm_chunks_to_data_stream(
+            decode_to_pcm_chunks(audio_bytes, file_type), is_opus, callback
         )
-        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-        raw_data = audio.raw_data
-        pcm_to_data_stream(raw_data, is_opus, callback)
 
 
 def pcm_to_data_stream(raw_data, is_opus=True, callback: Callable[[Any], Any] = None):
-    # 初始化Opus编码器
-    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
+    pcm_chunks_to_data_stream([raw_data], is_opus, callback)
 
+
+def pcm_chunks_to_data_stream(
+    pcm_chunks: Iterable[bytes], is_opus=True, callback: Callable[[Any], Any] = None
+):
+    """把分块到达的16kHz单声道PCM按60ms切帧，边解码边编码，最后一帧不足时补零"""
+    for data in iter_pcm_chunks_to_data(pcm_chunks, is_opus):
+        callback(data)
+
+
+def iter_pcm_chunks_to_data(
+    pcm_chunks: Iterable[bytes], is_opus=True
+) -> Iterator[bytes]:
+    """pcm_chunks_to_data_stream的按需版本：每取一帧才解码、编码一帧"""
     # 编码参数
     frame_duration = 60  # 60ms per frame
     frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
 
-    # 按帧处理所有音频数据（包括最后一帧可能补零）
-    for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-        # 获取当前帧的二进制数据
-        chunk = raw_data[i : i + frame_size * 2]
-
-        # 如果最后一帧不足，补零
-        if len(chunk) < frame_size * 2:
-            chunk += b"\x00" * (frame_size * 2 - len(chunk))
+    # 从编码器池取出Opus编码器，用完重置后归还
+    pool = get_opus_encoder_pool()
+    encoder = pool.acquire(16000, 1, opuslib_next.APPLICATION_AUDIO) if is_opus else None
+    splitter = PcmFrameSplitter(frame_size)
 
+    def convert(frame: np.ndarray) -> bytes:
         if is_opus:
-            # 转换为numpy数组处理
-            np_frame = np.frombuffer(chunk, dtype=np.int16)
-            # 编码Opus数据
-            frame_data = encoder.encode(np_frame.tobytes(), frame_size)
-            callback(frame_data)
-        else:
-            frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
-            callback(frame_data)
+            return encoder.encode(frame.tobytes(), frame_size)
+        return frame.tobytes()
+
+    try:
+        for chunk in pcm_chunks:
+            for frame in splitter.feed(np.frombuffer(chunk, dtype=np.int16)):
+                yield convert(frame)
+
+        # 如果最后一帧不足，补零
+        last_frame = splitter.flush()
+        if last_frame is not None:
+            yield convert(last_frame)
+    finally:
+        if encoder is not None:
+            pool.release(encoder)
 
 
 def opus_datas_to_wav_bytes(opus_datas, sample_rate=16000, channels=1):
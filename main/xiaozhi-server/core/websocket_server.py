@@ -1,3 +1,5 @@
+import os
+import time
 import asyncio
 import logging
 
@@ -35,6 +37,8 @@ from config.config_loader import get_config_from_api_async
 from core.auth import AuthManager, AuthenticationError
 from core.utils.modules_initialize import initialize_modules
 from core.utils.util import check_vad_update, check_asr_update
+from core.utils.cache.tts_cache import get_tts_cache
+from core.providers.asr.dto.dto import InterfaceType
 
 TAG = __name__
 
@@ -68,15 +72,63 @@ class WebSocketServer:
         expire_seconds = auth_config.get("expire_seconds", None)
         self.auth = AuthManager(secret_key=secret_key, expire_seconds=expire_seconds)
 
-    async def start(self):
+        # 多进程模式下与主进程通信的通道，单进程模式为None
+        self.cluster = None
+        self.active_connections = 0
+        self.start_time = time.time()
+        self._server = None
+        self._stop_event = None
+
+    async def start(self, reuse_port: bool = False):
+        """启动WebSocket服务
+
+        Args:
+            reuse_port: 是否开启SO_REUSEPORT，多进程模式下多个进程监听同一端口
+        """
         server_config = self.config["server"]
         host = server_config.get("ip", "0.0.0.0")
         port = int(server_config.get("port", 8000))
+        self._stop_event = asyncio.Event()
 
+        serve_kwargs = {"reuse_port": True} if reuse_port else {}
         async with websockets.serve(
-            self._handle_connection, host, port, process_request=self._http_response
-        ):
-            await asyncio.Future()
+            self._handle_connection,
+            host,
+            port,
+            process_request=self._http_response,
+            **serve_kwargs,
+        ) as server:
+            self._server = server
+            if self.cluster:
+                self.cluster.notify_ready()
+            await self._stop_event.wait()
+
+    async def drain(self, timeout: float = 30):
+        """优雅停止：不再接受新连接，等待已有连接结束（最多timeout秒）后退出"""
+        if self._server is None:
+            if self._stop_event is not None:
+                self._stop_event.set()
+            return
+        self._server.close(close_connections=False)
+        self.logger.bind(tag=TAG).info(
+            f"停止接受新连接，等待{self.active_connections}个连接结束"
+        )
+        deadline = time.monotonic() + timeout
+        while self.active_connections > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.5)
+        self._stop_event.set()
+
+    def get_health(self) -> dict:
+        """当前进程的健康状态"""
+        health = {
+            "pid": os.getpid(),
+            "connections": self.active_connections,
+            "uptime": int(time.time() - self.start_time),
+        }
+        tts_cache = get_tts_cache(self.config)
+        if tts_cache is not None:
+            health["tts_cache"] = tts_cache.stats()
+        return health
 
     async def _handle_connection(self, websocket):
         headers = dict(websocket.request.headers)
@@ -123,11 +175,13 @@ class WebSocketServer:
             self._intent,
             self,  # 传入server实例
         )
+        self.active_connections += 1
         try:
             await handler.handle_connection(websocket)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"处理连接时出错: {e}")
         finally:
+            self.active_connections -= 1
             # 强制关闭连接（如果还没有关闭的话）
             try:
                 # 安全地检查WebSocket状态并关闭
@@ -166,43 +220,72 @@ class WebSocketServer:
                     self.logger.bind(tag=TAG).error("获取新配置失败")
                     return False
                 self.logger.bind(tag=TAG).info(f"获取新配置成功")
-                # 检查 VAD 和 ASR 类型是否需要更新
-                update_vad = check_vad_update(self.config, new_config)
-                update_asr = check_asr_update(self.config, new_config)
-                self.logger.bind(tag=TAG).info(
-                    f"检查VAD和ASR类型是否需要更新: {update_vad} {update_asr}"
-                )
-                # 更新配置
-                self.config = new_config
-                # 重新初始化组件
-                modules = initialize_modules(
-                    self.logger,
-                    new_config,
-                    update_vad,
-                    update_asr,
-                    "LLM" in new_config["selected_module"],
-                    False,
-                    "Memory" in new_config["selected_module"],
-                    "Intent" in new_config["selected_module"],
-                )
-
-                # 更新组件实例
-                if "vad" in modules:
-                    self._vad = modules["vad"]
-                if "asr" in modules:
-                    self._asr = modules["asr"]
-                if "llm" in modules:
-                    self._llm = modules["llm"]
-                if "intent" in modules:
-                    self._intent = modules["intent"]
-                if "memory" in modules:
-                    self._memory = modules["memory"]
-                self.logger.bind(tag=TAG).info(f"更新配置任务执行完毕")
-                return True
+                self._apply_config(new_config)
+            # 多进程模式下通知其他工作进程同步应用新配置
+            if self.cluster:
+                self.cluster.broadcast_config(new_config)
+            return True
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"更新服务器配置失败: {str(e)}")
             return False
 
+    async def apply_config(self, new_config: dict) -> bool:
+        """应用其他进程已经获取到的新配置（多进程模式下由主进程转发）"""
+        try:
+            async with self.config_lock:
+                self._apply_config(new_config)
+            return True
+        except Exception as e:
+            self.logger.bind(tag=TAG).error(f"应用服务器配置失败: {str(e)}")
+            return False
+
+    def _apply_config(self, new_config: dict):
+        """用新配置重新初始化组件"""
+        # 检查 VAD 和 ASR 类型是否需要更新
+        update_vad = check_vad_update(self.config, new_config)
+        update_asr = check_asr_update(self.config, new_config)
+        self.logger.bind(tag=TAG).info(
+            f"检查VAD和ASR类型是否需要更新: {update_vad} {update_asr}"
+        )
+        # 更新配置
+        self.config = new_config
+        # 重新初始化组件
+        modules = initialize_modules(
+            self.logger,
+            new_config,
+            update_vad,
+            update_asr,
+            "LLM" in new_config["selected_module"],
+            False,
+            "Memory" in new_config["selected_module"],
+            "Intent" in new_config["selected_module"],
+        )
+
+        # 更新组件实例
+        if "vad" in modules:
+            old_vad = self._vad
+            self._vad = modules["vad"]
+            # 旧的VAD不再分配给新连接，停止其批量推理线程，已有连接继续逐连接推理直到断开
+            if old_vad is not None and old_vad is not self._vad:
+                old_vad.close()
+        if "asr" in modules:
+            old_asr = self._asr
+            self._asr = modules["asr"]
+            # 本地ASR所有连接共享，旧实例不再分配给新连接，关闭其批处理线程或推理子进程
+            if (
+                old_asr is not None
+                and old_asr is not self._asr
+                and getattr(old_asr, "interface_type", None) == InterfaceType.LOCAL
+            ):
+                old_asr.close()
+        if "llm" in modules:
+            self._llm = modules["llm"]
+        if "intent" in modules:
+            self._intent = modules["intent"]
+        if "memory" in modules:
+            self._memory = modules["memory"]
+        self.logger.bind(tag=TAG).info(f"更新配置任务执行完毕")
+
     async def _handle_auth(self, websocket):
         # 先认证，后建立连接
         if self.auth_enable:
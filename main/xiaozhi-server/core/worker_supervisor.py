@@ -0,0 +1,304 @@
+"""
+多进程WebSocket服务
+主进程只负责管理：启动N个工作进程，每个工作进程独立加载模块并通过SO_REUSEPORT监听同一端口，
+由内核在进程间分配连接；主进程负责重启异常退出的进程、同步配置更新、汇总健康状态，
+以及逐个替换工作进程的平滑重启（新进程就绪后旧进程才停止接受新连接，已有连接处理完再退出）。
+"""
+
+import os
+import sys
+import time
+import signal
+import asyncio
+import threading
+import multiprocessing
+from typing import Dict, Optional
+from config.logger import setup_logging
+from core.utils.turn_trace import MetricsRegistry, get_metrics_registry
+
+TAG = __name__
+logger = setup_logging()
+
+# 工作进程上报状态的间隔（秒）
+HEARTBEAT_INTERVAL = 5
+# 等待新进程加载模块就绪的最长时间（秒）
+READY_TIMEOUT = 120
+# 平滑重启时等待旧进程已有连接结束的最长时间（秒）
+DRAIN_TIMEOUT = 60
+
+
+def reuse_port_supported() -> bool:
+    """当前平台是否支持SO_REUSEPORT"""
+    import socket
+
+    return sys.platform != "win32" and hasattr(socket, "SO_REUSEPORT")
+
+
+class WorkerChannel:
+    """工作进程一侧的通信通道，挂在WebSocketServer.cluster上"""
+
+    def __init__(self, worker_id: int, pipe, server, loop: asyncio.AbstractEventLoop):
+        self.worker_id = worker_id
+        self.pipe = pipe
+        self.server = server
+        self.loop = loop
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(
+            target=self._read_commands, name=f"worker-{worker_id}-channel", daemon=True
+        )
+        self._reader.start()
+        self._heartbeat_task = loop.create_task(self._heartbeat())
+
+    def _send(self, kind: str, payload=None):
+        try:
+            with self._send_lock:
+                self.pipe.send((kind, payload))
+        except (BrokenPipeError, EOFError, OSError) as e:
+            logger.bind(tag=TAG).warning(f"向主进程发送消息失败: {kind}, {e}")
+
+    def _read_commands(self):
+        while True:
+            try:
+                kind, payload = self.pipe.recv()
+            except (EOFError, OSError):
+                # 主进程已退出，工作进程随之停止
+                kind, payload = "drain", 0
+            if kind == "apply_config":
+                asyncio.run_coroutine_threadsafe(
+                    self.server.apply_config(payload), self.loop
+                )
+            elif kind == "drain":
+                asyncio.run_coroutine_threadsafe(self.server.drain(payload), self.loop)
+                return
+
+    async def _heartbeat(self):
+        while True:
+            stats = self.server.get_health()
+            stats["metrics"] = get_metrics_registry().snapshot()
+            self._send("stats", stats)
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def notify_ready(self):
+        self._send("ready", os.getpid())
+
+    def broadcast_config(self, config: dict):
+        """本进程已更新配置，由主进程转发给其他工作进程"""
+        self._send("config_updated", config)
+
+    def request_restart(self):
+        """请求主进程逐个平滑重启所有工作进程"""
+        self._send("restart")
+
+
+def _worker_entry(worker_id: int, config: dict, pipe):
+    """工作进程入口"""
+    # Ctrl-C由主进程统一处理，工作进程只响应主进程的停止指令
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_main(worker_id, config, pipe))
+
+
+async def _worker_main(worker_id: int, config: dict, pipe):
+    from core.websocket_server import WebSocketServer
+    from core.utils.gc_manager import get_gc_manager
+
+    gc_manager = get_gc_manager(interval_seconds=300)
+    await gc_manager.start()
+
+    server = WebSocketServer(config)
+    server.cluster = WorkerChannel(worker_id, pipe, server, asyncio.get_running_loop())
+    try:
+        await server.start(reuse_port=True)
+    finally:
+        await gc_manager.stop()
+    logger.bind(tag=TAG).info(f"工作进程{worker_id}已退出: pid={os.getpid()}")
+
+
+class _Worker:
+    """主进程中记录的单个工作进程"""
+
+    def __init__(self, worker_id: int, process, pipe):
+        self.worker_id = worker_id
+        self.process = process
+        self.pipe = pipe
+        self.ready = asyncio.Event()
+        self.draining = False
+        self.stats: dict = {}
+        self.stats_time = 0.0
+
+
+class WorkerSupervisor:
+    """工作进程管理器，运行在主进程的事件循环中"""
+
+    def __init__(self, config: dict, workers: int):
+        self.config = config
+        self.workers = workers
+        # 各模块依赖的torch、onnxruntime等不适合fork，统一用spawn启动
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: Dict[int, _Worker] = {}
+        self._restart_lock: Optional[asyncio.Lock] = None
+        self._monitor_task = None
+        self._stopping = False
+
+    async def start(self):
+        self._restart_lock = asyncio.Lock()
+        for worker_id in range(self.workers):
+            self._spawn(worker_id)
+        loop = asyncio.get_running_loop()
+        if sys.platform != "win32":
+            loop.add_signal_handler(
+                signal.SIGHUP, lambda: asyncio.ensure_future(self.rolling_restart())
+            )
+        self._monitor_task = asyncio.create_task(self._monitor())
+        logger.bind(tag=TAG).info(f"已启动{self.workers}个WebSocket工作进程")
+
+    def _spawn(self, worker_id: int) -> _Worker:
+        parent_pipe, child_pipe = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_entry,
+            args=(worker_id, self.config, child_pipe),
+            name=f"ws-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        child_pipe.close()
+        worker = _Worker(worker_id, process, parent_pipe)
+        asyncio.get_running_loop().add_reader(
+            parent_pipe.fileno(), self._on_message, worker
+        )
+        self._workers[worker_id] = worker
+        return worker
+
+    def _on_message(self, worker: _Worker):
+        try:
+            kind, payload = worker.pipe.recv()
+        except (EOFError, OSError):
+            self._detach(worker)
+            return
+        if kind == "ready":
+            logger.bind(tag=TAG).info(
+                f"工作进程{worker.worker_id}已就绪: pid={payload}"
+            )
+            worker.ready.set()
+        elif kind == "stats":
+            worker.stats = payload
+            worker.stats_time = time.time()
+        elif kind == "config_updated":
+            self.config = payload
+            for other in list(self._workers.values()):
+                if other is not worker:
+                    self._send(other, "apply_config", payload)
+        elif kind == "restart":
+            asyncio.ensure_future(self.rolling_restart())
+
+    def _detach(self, worker: _Worker):
+        try:
+            asyncio.get_running_loop().remove_reader(worker.pipe.fileno())
+        except (ValueError, OSError):
+            pass
+        worker.pipe.close()
+
+    def _send(self, worker: _Worker, kind: str, payload=None):
+        try:
+            worker.pipe.send((kind, payload))
+        except (BrokenPipeError, EOFError, OSError) as e:
+            logger.bind(tag=TAG).warning(
+                f"向工作进程{worker.worker_id}发送消息失败: {kind}, {e}"
+            )
+
+    async def _monitor(self):
+        """重启异常退出的工作进程"""
+        while not self._stopping:
+            await asyncio.sleep(2)
+            for worker_id, worker in list(self._workers.items()):
+                if worker.draining or worker.process.is_alive():
+                    continue
+                if self._stopping:
+                    return
+                logger.bind(tag=TAG).error(
+                    f"工作进程{worker_id}异常退出: pid={worker.process.pid}, "
+                    f"exitcode={worker.process.exitcode}，正在重启"
+                )
+                if not worker.pipe.closed:
+                    self._detach(worker)
+                self._spawn(worker_id)
+
+    async def rolling_restart(self):
+        """逐个替换工作进程，任何时刻都有进程在接受新连接"""
+        if self._restart_lock.locked():
+            logger.bind(tag=TAG).info("平滑重启已在进行中，忽略本次请求")
+            return
+        async with self._restart_lock:
+            logger.bind(tag=TAG).info("开始平滑重启工作进程")
+            for worker_id in list(self._workers.keys()):
+                if self._stopping:
+                    return
+                old = self._workers[worker_id]
+                # 先标记，避免监控任务把新旧替换过程当作异常退出
+                old.draining = True
+                new = self._spawn(worker_id)
+                try:
+                    await asyncio.wait_for(new.ready.wait(), READY_TIMEOUT)
+                except asyncio.TimeoutError:
+                    logger.bind(tag=TAG).error(
+                        f"新工作进程{worker_id}启动超时，保留旧进程"
+                    )
+                    new.draining = True
+                    new.process.terminate()
+                    self._workers[worker_id] = old
+                    old.draining = False
+                    continue
+                await self._drain(old)
+            logger.bind(tag=TAG).info("工作进程平滑重启完成")
+
+    async def _drain(self, worker: _Worker, timeout: float = DRAIN_TIMEOUT):
+        """让旧进程停止接受新连接，等待已有连接结束后退出"""
+        worker.draining = True
+        self._send(worker, "drain", timeout)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, worker.process.join, timeout + 5)
+        if worker.process.is_alive():
+            logger.bind(tag=TAG).warning(
+                f"工作进程{worker.worker_id}未能按时退出，强制结束: pid={worker.process.pid}"
+            )
+            worker.process.kill()
+        if not worker.pipe.closed:
+            self._detach(worker)
+
+    def get_health(self) -> dict:
+        """汇总各工作进程上报的状态"""
+        now = time.time()
+        workers = []
+        for worker_id, worker in sorted(self._workers.items()):
+            workers.append(
+                {
+                    "worker_id": worker_id,
+                    "pid": worker.process.pid,
+                    "alive": worker.process.is_alive(),
+                    "ready": worker.ready.is_set(),
+                    "connections": worker.stats.get("connections", 0),
+                    "uptime": worker.stats.get("uptime", 0),
+                    "tts_cache": worker.stats.get("tts_cache"),
+                    "stale": now - worker.stats_time > HEARTBEAT_INTERVAL * 3,
+                }
+            )
+        return {
+            "mode": "multi_process",
+            "workers": workers,
+            "connections": sum(w["connections"] for w in workers),
+        }
+
+    def render_metrics(self) -> str:
+        """合并各工作进程最近一次上报的指标"""
+        return MetricsRegistry.render(
+            [w.stats.get("metrics", {}) for w in self._workers.values()]
+        )
+
+    async def stop(self, timeout: float = 5):
+        self._stopping = True
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        workers = list(self._workers.values())
+        await asyncio.gather(
+            *(self._drain(worker, timeout) for worker in workers),
+            return_exceptions=True,
+        )
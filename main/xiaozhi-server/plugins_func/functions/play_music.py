@@ -8,6 +8,7 @@ from pathlib import Path
 from core.handle.sendAudioHandle import send_stt_message
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.dialogue import Message
+from core.utils.music_library import get_music_library
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType, ContentType
 
 TAG = __name__
@@ -133,14 +134,28 @@ def initialize_music_handler(conn):
             MUSIC_CACHE["music_dir"] = os.path.abspath("./music")
             MUSIC_CACHE["music_ext"] = (".mp3", ".wav", ".p3")
             MUSIC_CACHE["refresh_time"] = 60
+        # 预转码音乐库，未开启时为None
+        MUSIC_CACHE["library"] = get_music_library(
+            MUSIC_CACHE.get("music_config", {})
+        )
         # 获取音乐文件列表
         MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = get_music_files(
             MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
         )
         MUSIC_CACHE["scan_time"] = time.time()
+        _index_music_files()
     return MUSIC_CACHE
 
 
+def _index_music_files():
+    """把音乐文件交给后台预转码"""
+    if MUSIC_CACHE.get("library") is not None:
+        MUSIC_CACHE["library"].index(
+            os.path.join(MUSIC_CACHE["music_dir"], f)
+            for f in MUSIC_CACHE["music_files"]
+        )
+
+
 async def handle_music_command(conn, text):
     initialize_music_handler(conn)
     global MUSIC_CACHE
@@ -157,6 +172,7 @@ async def handle_music_command(conn, text):
                 get_music_files(MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"])
             )
             MUSIC_CACHE["scan_time"] = time.time()
+            _index_music_files()
 
         potential_song = _extract_song_name(clean_text)
         if potential_song:
@@ -211,6 +227,9 @@ async def play_local_music(conn, specific_file=None):
         if not os.path.exists(music_path):
             conn.logger.bind(tag=TAG).error(f"选定的音乐文件不存在: {music_path}")
             return
+        # 已预转码的歌曲直接播放p3文件，省去解码和Opus编码
+        if MUSIC_CACHE.get("library") is not None and conn.audio_format != "pcm":
+            music_path = MUSIC_CACHE["library"].resolve(music_path)
         text = _get_random_play_prompt(selected_music)
         await send_stt_message(conn, text)
         conn.dialogue.put(Message(role="assistant", content=text))
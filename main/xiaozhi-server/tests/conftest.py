@@ -0,0 +1,22 @@
+"""
+单元测试公共配置
+测试不依赖data/.config.yaml，直接以默认配置文件初始化配置缓存，日志等模块可以正常导入。
+"""
+
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+import config.settings as settings  # noqa: E402
+from config.config_loader import read_config  # noqa: E402
+from core.utils.cache.manager import cache_manager, CacheType  # noqa: E402
+
+settings.config_file_valid = True
+cache_manager.set(
+    CacheType.CONFIG,
+    "main_config",
+    read_config(os.path.join(PROJECT_DIR, "config.yaml")),
+)
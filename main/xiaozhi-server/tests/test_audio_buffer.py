@@ -0,0 +1,106 @@
+import io
+import wave
+
+import numpy as np
+
+from core.utils.audio_buffer import PacketRingBuffer, PCMRingBuffer, Utterance
+
+
+def samples(start, count):
+    return np.arange(start, start + count, dtype=np.int16)
+
+
+def test_pcm_ring_buffer_reads_in_order():
+    buffer = PCMRingBuffer(capacity=8)
+    buffer.write(samples(0, 5).tobytes())
+    buffer.write(samples(5, 5))
+    assert len(buffer) == 10
+    assert buffer.read(4).tolist() == [0, 1, 2, 3]
+    assert buffer.read(7) is None
+    assert buffer.read(6).tolist() == [4, 5, 6, 7, 8, 9]
+    assert len(buffer) == 0
+
+
+def test_pcm_ring_buffer_compacts_before_growing():
+    buffer = PCMRingBuffer(capacity=8)
+    buffer.write(samples(0, 6))
+    buffer.read(5)
+    # 未读数据搬回开头后空间足够，不扩容
+    buffer.write(samples(6, 6))
+    assert len(buffer._buf) == 8
+    assert buffer.read(7).tolist() == list(range(5, 12))
+
+
+def test_pcm_ring_buffer_clear():
+    buffer = PCMRingBuffer(capacity=4)
+    buffer.write(samples(0, 3))
+    buffer.clear()
+    assert len(buffer) == 0
+    assert buffer.read(1) is None
+    buffer.write(b"")
+    assert len(buffer) == 0
+
+
+def test_packet_ring_buffer_keep_last():
+    buffer = PacketRingBuffer()
+    for i in range(10):
+        buffer.append(bytes([i]), pcm_frame=bytes([i, i]))
+    buffer.keep_last(3)
+    assert len(buffer) == 3
+    assert list(buffer) == [b"\x07", b"\x08", b"\x09"]
+    assert buffer[0] == b"\x07" and buffer[-1] == b"\x09"
+    assert buffer[1:] == [b"\x08", b"\x09"]
+    assert buffer.copy() == [b"\x07", b"\x08", b"\x09"]
+    # keep_last不会把已丢弃的包找回来
+    buffer.keep_last(5)
+    assert len(buffer) == 3
+
+
+def test_packet_ring_buffer_compacts_after_threshold():
+    buffer = PacketRingBuffer()
+    total = PacketRingBuffer._COMPACT_THRESHOLD + 10
+    for i in range(total):
+        buffer.append(i.to_bytes(2, "big"))
+        buffer.keep_last(2)
+    assert len(buffer._items) < PacketRingBuffer._COMPACT_THRESHOLD
+    assert list(buffer) == [(total - 2).to_bytes(2, "big"), (total - 1).to_bytes(2, "big")]
+
+
+def test_packet_ring_buffer_clear_bumps_generation():
+    buffer = PacketRingBuffer()
+    buffer.append(b"a")
+    generation = buffer.generation
+    buffer.clear()
+    assert not buffer
+    assert buffer.generation == generation + 1
+
+
+def test_utterance_reuses_decoded_pcm():
+    buffer = PacketRingBuffer()
+    for i in range(4):
+        buffer.append(bytes([i]), pcm_frame=bytes([i]) * 4)
+    utterance = buffer.to_utterance(start=1, end=3)
+    # 本身就是音频包列表，PCM直接使用接收时的解码结果
+    assert list(utterance) == [b"\x01", b"\x02"]
+    assert utterance.pcm_frames == [b"\x01" * 4, b"\x02" * 4]
+    assert utterance.pcm == b"\x01" * 4 + b"\x02" * 4
+
+    tail = utterance.tail(1)
+    assert list(tail) == [b"\x02"]
+    assert tail.pcm == b"\x02" * 4
+
+
+def test_utterance_with_missing_frames_decodes_again():
+    utterance = Utterance([b"a", b"b"], [b"1", None])
+    assert utterance._pcm_frames is None
+
+
+def test_utterance_pcm_format_and_wav():
+    utterance = Utterance.wrap([b"\x01\x00", b"\x02\x00\x03"], audio_format="pcm")
+    assert utterance.pcm == b"\x01\x00\x02\x00\x03"
+    with wave.open(io.BytesIO(utterance.to_wav())) as wav_file:
+        assert wav_file.getframerate() == 16000
+        assert wav_file.getnchannels() == 1
+        # 奇数长度时去掉最后一个字节
+        assert wav_file.readframes(10) == b"\x01\x00\x02\x00"
+    assert Utterance.wrap(utterance) is utterance
@@ -0,0 +1,61 @@
+import asyncio
+
+from core.providers.llm import client_pool
+from core.providers.llm.client_pool import get_async_openai, get_http_client
+
+
+def test_clients_are_shared_within_a_loop():
+    async def main():
+        first = get_async_openai("http://a/v1", "key")
+        assert get_async_openai("http://a/v1", "key") is first
+        assert get_async_openai("http://b/v1", "key") is not first
+        assert first._client is get_http_client()
+
+    asyncio.run(main())
+
+
+def test_clients_are_closed_when_loop_shuts_down():
+    async def main():
+        return get_http_client(), asyncio.get_running_loop()
+
+    http_client, loop = asyncio.run(main())
+    assert http_client.is_closed
+    assert loop not in client_pool._loop_clients
+
+
+def test_each_loop_gets_its_own_http_client():
+    async def main():
+        return get_http_client()
+
+    assert asyncio.run(main()) is not asyncio.run(main())
+
+
+def test_openai_clients_are_evicted_least_recently_used(monkeypatch):
+    monkeypatch.setattr(client_pool, "MAX_OPENAI_CLIENTS", 2)
+
+    async def main():
+        first = get_async_openai("http://a/v1", "key")
+        get_async_openai("http://b/v1", "key")
+        # 最近使用过的不被淘汰
+        assert get_async_openai("http://a/v1", "key") is first
+        get_async_openai("http://c/v1", "key")
+        clients = client_pool._loop_clients[asyncio.get_running_loop()]
+        assert [url for url, _, _ in clients.openai] == ["http://a/v1", "http://c/v1"]
+        # 淘汰不会关闭共享的httpx客户端
+        assert not clients.http.is_closed
+
+    asyncio.run(main())
+
+
+def test_closed_http_client_is_rebuilt():
+    async def main():
+        old = get_http_client()
+        old_openai = get_async_openai("http://a/v1", "key")
+        await old.aclose()
+        new = get_http_client()
+        assert new is not old and not new.is_closed
+        assert get_async_openai("http://a/v1", "key") is not old_openai
+        await asyncio.sleep(0)
+        assert client_pool._loop_clients[asyncio.get_running_loop()].http is new
+
+    asyncio.run(main())
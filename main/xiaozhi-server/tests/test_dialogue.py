@@ -0,0 +1,182 @@
+import time
+import threading
+
+import pytest
+
+from core.utils import dialogue as dialogue_module
+from core.utils.dialogue import Dialogue, Message
+
+# 每条消息20个汉字，估算为24个token（含固定开销）
+TEXT = "对话内容" * 5
+
+
+def build(max_tokens, summarizer=None, turns=4):
+    d = Dialogue(max_tokens=max_tokens, summarizer=summarizer)
+    d.put(Message(role="system", content="你是小智"))
+    for i in range(turns):
+        d.put(Message(role="user", content=f"{TEXT}{i}"))
+        d.put(Message(role="assistant", content=f"{TEXT}{i}"))
+    return d
+
+
+def wait_summary(d, timeout=1):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with d._summary_lock:
+            if not d._summarizing:
+                return
+        time.sleep(0.01)
+    raise AssertionError("摘要线程未结束")
+
+
+def contents(messages):
+    return [m.content for m in messages]
+
+
+def test_unlimited_window_keeps_everything():
+    d = build(0)
+    assert len(d._window()) == 8
+
+
+def test_window_starts_at_user_message():
+    d = build(60)
+    window = d._window()
+    # 预算只够最近一轮对话
+    assert [m.role for m in window] == ["user", "assistant"]
+    assert window[0].content.endswith("3")
+
+
+def test_latest_turn_kept_even_over_budget():
+    d = build(10, turns=1)
+    assert [m.role for m in d._window()] == ["user", "assistant"]
+
+
+def test_tool_calls_stay_with_their_turn():
+    d = build(120, turns=2)
+    d.put(Message(role="user", content=TEXT))
+    d.put(Message(role="assistant", tool_calls=[{"id": "1"}]))
+    d.put(Message(role="tool", content=TEXT, tool_call_id="1"))
+    d.put(Message(role="assistant", content=TEXT))
+    window = d._window()
+    assert window[0].role == "user"
+    assert [m.role for m in window[-3:]] == ["assistant", "tool", "assistant"]
+
+
+def test_folded_messages_are_summarized():
+    calls = []
+
+    def summarizer(summary, messages):
+        calls.append(contents(messages))
+        return "早期对话摘要"
+
+    d = build(60, summarizer)
+    d._window()
+    wait_summary(d)
+    assert d.summary == "早期对话摘要"
+    # 压缩到一半预算处，最近一轮之前的消息都进入摘要
+    assert calls == [contents(d.dialogue[1:7])]
+    assert all(m.summarized for m in d.dialogue[1:7])
+    assert not any(m.summarized for m in d.dialogue[7:])
+
+    # 已压缩的消息不再出现在窗口中，也不会再次压缩
+    d._window()
+    wait_summary(d)
+    assert len(calls) == 1
+
+
+def test_in_window_turns_are_summarized_before_leaving_window():
+    release = threading.Event()
+
+    def summarizer(summary, messages):
+        release.wait(1)
+        return "摘要：" + "|".join(contents(messages))
+
+    # 预算够两轮，压缩到一半预算处只保留最近一轮
+    d = build(100, summarizer)
+    in_window = d.dialogue[5:7]
+    assert contents(d._window()) == contents(d.dialogue[5:])
+
+    # 摘要生成前，窗口内的那一轮照常发送
+    assert contents(d._window()) == contents(d.dialogue[5:])
+    assert not any(m.summarized for m in in_window)
+
+    release.set()
+    wait_summary(d)
+    # 摘要已包含这一轮，之后才移出窗口
+    assert all(m.content in d.summary for m in in_window)
+    assert contents(d._window()) == contents(d.dialogue[7:])
+
+
+def test_failed_summary_backs_off():
+    calls = []
+
+    def summarizer(summary, messages):
+        calls.append(len(messages))
+        return None
+
+    d = build(60, summarizer)
+    d._window()
+    wait_summary(d)
+    d._window()
+    wait_summary(d)
+    # 失败后退避期间不再请求LLM，消息也不会被标记
+    assert calls == [6]
+    assert not any(m.summarized for m in d.dialogue)
+    assert len(d._window()) == 2
+
+
+def test_repeated_failures_drop_messages(monkeypatch):
+    monkeypatch.setattr(dialogue_module, "SUMMARY_RETRY_INTERVAL", 0)
+    calls = []
+
+    def summarizer(summary, messages):
+        calls.append(len(messages))
+        raise RuntimeError("LLM不可用")
+
+    d = build(60, summarizer)
+    for _ in range(dialogue_module.SUMMARY_MAX_FAILURES):
+        d._window()
+        wait_summary(d)
+    assert calls == [6] * dialogue_module.SUMMARY_MAX_FAILURES
+    # 达到最大失败次数后放弃摘要，早期消息不再累积
+    assert all(m.summarized for m in d.dialogue[1:7])
+    assert d.summary == ""
+
+    d._window()
+    wait_summary(d)
+    assert len(calls) == dialogue_module.SUMMARY_MAX_FAILURES
+
+
+@pytest.mark.parametrize("max_tokens", [0, 60])
+def test_summary_goes_into_system_prompt(max_tokens):
+    d = build(max_tokens)
+    d.summary = "用户叫小明"
+    messages = d.get_llm_dialogue()
+    assert messages[0]["role"] == "system"
+    assert "<dialogue_summary>\n用户叫小明\n</dialogue_summary>" in messages[0]["content"]
+
+
+def system_prompt(d, memory=None):
+    return d.get_llm_dialogue_with_memory(memory, None)[0]["content"]
+
+
+def test_static_prefix_is_stable_without_context_block():
+    d = build(0, turns=1)
+    d.update_system_message("你是小智\n现在是{{current_time}}\n<memory>\n</memory>")
+    first = system_prompt(d, "用户喜欢猫")
+    second = system_prompt(d, "用户喜欢狗")
+    prefix = "你是小智\n现在是（见末尾的当前时间）\n<memory>\n</memory>"
+    # 时间和记忆都只出现在末尾的易变部分
+    assert first.startswith(prefix) and second.startswith(prefix)
+    assert "当前时间：" in first[len(prefix) :]
+    assert first.endswith("<memory>\n用户喜欢猫\n</memory>")
+    assert second.endswith("<memory>\n用户喜欢狗\n</memory>")
+
+
+def test_memory_replaces_placeholder_in_context_block():
+    d = build(0, turns=1)
+    d.context_renderer = lambda: "<context>\n时间：{{current_time}}\n</context>\n<memory>\n</memory>"
+    prompt = system_prompt(d, "用户叫小明")
+    assert prompt.startswith("你是小智\n\n<context>\n时间：")
+    assert "{{current_time}}" not in prompt
+    assert prompt.endswith("<memory>\n用户叫小明\n</memory>")
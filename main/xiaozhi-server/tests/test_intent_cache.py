@@ -0,0 +1,125 @@
+import pytest
+
+from core.utils.cache.intent_cache import IntentCache, normalize_text
+
+FINGERPRINT = "tools"
+WEATHER = '{"function_call": {"name": "result_for_context"}}'
+CHAT = '{"function_call": {"name": "continue_chat"}}'
+MUSIC = '{"function_call": {"name": "play_music", "arguments": {"song_name": "稻香"}}}'
+
+
+@pytest.fixture
+def cache():
+    return IntentCache()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("请打开灯。", "打开灯"),
+        ("麻烦你帮我把灯打开一下吧！", "灯打开"),
+        ("ＯＫ，Ｇｏｏｇｌｅ", "okgoogle"),
+        # “请问”是一个词，不是礼貌前缀“请”
+        ("请问今天天气怎么样", "请问今天天气怎么样"),
+        ("请教你一个问题", "请教你一个问题"),
+    ],
+)
+def test_normalize_text(text, expected):
+    assert normalize_text(text) == expected
+
+
+def test_exact_hit_after_normalization(cache):
+    cache.put("今天天气怎么样？", FINGERPRINT, WEATHER)
+    assert cache.get("今天天气怎么样", FINGERPRINT) == WEATHER
+    assert cache.get("今天天气怎么样啊", FINGERPRINT) == WEATHER
+    assert cache.get("今天天气怎么样", "other-tools") is None
+
+
+def test_fuzzy_hit_only_differs_by_fillers(cache):
+    cache.put("打开客厅灯", FINGERPRINT, CHAT)
+    assert cache.get("打开一下客厅灯啊", FINGERPRINT) == CHAT
+    assert cache.get("打开客厅灯呀", FINGERPRINT) == CHAT
+    assert cache.get_stats()["fuzzy_hits"] == 1
+
+
+@pytest.mark.parametrize(
+    "cached, query",
+    [
+        # 时间词不同
+        ("今天天气怎么样", "明天天气怎么样"),
+        ("今天天气怎么样", "后天天气怎么样"),
+        # 多了地点
+        ("今天天气怎么样", "上海今天天气怎么样"),
+        # 否定词不同
+        ("我不想听音乐了", "我想听音乐了"),
+        ("我想听音乐了", "我不想听音乐了"),
+        # 参数不同
+        ("播放稻香", "播放晴天"),
+        # 词序不同，意思可能相反
+        ("我打你", "你打我"),
+    ],
+)
+def test_no_fuzzy_hit_across_content_changes(cache, cached, query):
+    cache.put(cached, FINGERPRINT, WEATHER)
+    assert cache.get(query, FINGERPRINT) is None
+
+
+@pytest.mark.parametrize(
+    "cached, query",
+    [
+        # 指令和询问状态的问句不能共用意图
+        ("打开客厅的灯", "打开客厅的灯了吗"),
+        ("打开客厅的灯", "打开客厅的灯吗"),
+        ("打开客厅的灯", "客厅的灯打开了吧"),
+        ("播放音乐", "播放音乐了吗"),
+        ("播放音乐", "播放音乐了"),
+        ("播放音乐", "播放音乐呢"),
+        ("灯开了", "灯开了吗"),
+        ("灯开了", "灯开了吧"),
+    ],
+)
+def test_question_forms_do_not_match_commands(cache, cached, query):
+    cache.put(cached, FINGERPRINT, MUSIC)
+    assert cache.get(query, FINGERPRINT) is None
+    # 反过来也不匹配
+    other = IntentCache()
+    other.put(query, FINGERPRINT, CHAT)
+    assert other.get(cached, FINGERPRINT) is None
+
+
+@pytest.mark.parametrize("text", ["好的", "嗯", "不要", "可以啊", "开灯", "这首歌再放一遍"])
+def test_context_dependent_utterances_are_not_cached(cache, text):
+    cache.put(text, FINGERPRINT, CHAT)
+    assert cache.get(text, FINGERPRINT) is None
+    assert cache.get_stats()["size"] == 0
+
+
+def test_unstable_intent_is_not_used(cache):
+    cache.put("播放音乐", FINGERPRINT, MUSIC)
+    cache.put("播放音乐", FINGERPRINT, CHAT)
+    # 两次结果不同，置信度0.5低于0.6
+    assert cache.get("播放音乐", FINGERPRINT) is None
+    cache.put("播放音乐", FINGERPRINT, CHAT)
+    cache.put("播放音乐", FINGERPRINT, CHAT)
+    assert cache.get("播放音乐", FINGERPRINT) == CHAT
+
+
+def test_fuzzy_match_can_be_disabled():
+    cache = IntentCache(fuzzy_match=False)
+    cache.put("打开客厅灯", FINGERPRINT, CHAT)
+    assert cache.get("打开一下客厅灯", FINGERPRINT) is None
+
+
+def test_expired_and_evicted_entries(monkeypatch):
+    cache = IntentCache(ttl=10, max_size=2)
+    now = [1000.0]
+    monkeypatch.setattr("core.utils.cache.intent_cache.time.time", lambda: now[0])
+    cache.put("打开客厅灯", FINGERPRINT, CHAT)
+    cache.put("关闭客厅灯", FINGERPRINT, CHAT)
+    cache.put("打开卧室灯", FINGERPRINT, CHAT)
+    # 超出容量时淘汰最久未使用的
+    assert cache.get("打开客厅灯", FINGERPRINT) is None
+    assert cache.get("关闭客厅灯", FINGERPRINT) == CHAT
+    now[0] += 11
+    assert cache.get("关闭客厅灯", FINGERPRINT) is None
+    assert cache.get("关闭一下客厅灯", FINGERPRINT) is None
@@ -0,0 +1,121 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from core.utils.micro_batcher import MicroBatcher
+
+
+class Recorder:
+    def __init__(self, gate=None):
+        self.batches = []
+        self.gate = gate
+
+    def __call__(self, items):
+        if self.gate is not None:
+            self.gate.wait(1)
+        self.batches.append(list(items))
+        return [item * 10 for item in items]
+
+
+@pytest.fixture
+def make_batcher():
+    """创建批处理器，测试结束时统一关闭并等待工作线程退出"""
+    batchers = []
+
+    def make(batch_fn, **kwargs):
+        batcher = MicroBatcher(batch_fn, **kwargs)
+        batchers.append(batcher)
+        return batcher
+
+    yield make
+    for batcher in batchers:
+        batcher.close()
+        batcher._thread.join(1)
+        assert not batcher._thread.is_alive()
+
+
+def test_concurrent_requests_share_one_batch(make_batcher):
+    recorder = Recorder()
+    batcher = make_batcher(recorder, max_batch_size=8, max_wait_ms=200)
+    futures = [batcher.submit_nowait(i) for i in range(3)]
+    assert [f.result(1) for f in futures] == [0, 10, 20]
+    assert recorder.batches == [[0, 1, 2]]
+
+
+def test_batch_size_is_limited(make_batcher):
+    gate = threading.Event()
+    recorder = Recorder(gate)
+    batcher = make_batcher(recorder, max_batch_size=2, max_wait_ms=50)
+    futures = [batcher.submit_nowait(i) for i in range(5)]
+    gate.set()
+    assert [f.result(1) for f in futures] == [0, 10, 20, 30, 40]
+    assert all(len(batch) <= 2 for batch in recorder.batches)
+    assert [item for batch in recorder.batches for item in batch] == list(range(5))
+
+
+def test_errors_are_set_on_every_future(make_batcher):
+    def fail(items):
+        raise RuntimeError("推理失败")
+
+    batcher = make_batcher(fail, max_wait_ms=50)
+    futures = [batcher.submit_nowait(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(1)
+
+
+def test_cancelled_requests_are_skipped(make_batcher):
+    gate = threading.Event()
+    recorder = Recorder(gate)
+    batcher = make_batcher(recorder, max_batch_size=1, max_wait_ms=0)
+    first = batcher.submit_nowait(1)
+    cancelled = batcher.submit_nowait(2)
+    assert cancelled.cancel()
+    last = batcher.submit_nowait(3)
+    gate.set()
+    assert first.result(1) == 10
+    assert last.result(1) == 30
+    assert recorder.batches == [[1], [3]]
+
+
+def test_async_submit(make_batcher):
+    batcher = make_batcher(Recorder(), max_wait_ms=50)
+
+    async def main():
+        return await asyncio.gather(batcher.submit(1), batcher.submit(2))
+
+    assert asyncio.run(main()) == [10, 20]
+
+
+def test_close_fails_pending_requests_and_stops_thread():
+    gate = threading.Event()
+    recorder = Recorder(gate)
+    batcher = MicroBatcher(recorder, max_batch_size=1, max_wait_ms=0)
+    running = batcher.submit_nowait(1)
+    # 等第一个请求进入批次，第二个仍在排队
+    for _ in range(100):
+        if running.running():
+            break
+        time.sleep(0.01)
+    pending = batcher.submit_nowait(2)
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        pending.result(1)
+    gate.set()
+    # 正在执行的批次正常完成
+    assert running.result(1) == 10
+    batcher._thread.join(1)
+    assert not batcher._thread.is_alive()
+    assert batcher.batch_fn is None
+
+
+def test_submit_after_close_fails():
+    batcher = MicroBatcher(Recorder(), max_wait_ms=0)
+    batcher.close()
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit_nowait(1).result(1)
+    batcher._thread.join(1)
+    assert not batcher._thread.is_alive()
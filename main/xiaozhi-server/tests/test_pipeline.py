@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+
+from core.providers.tts.dto.dto import SentenceType
+from core.providers.tts.pipeline import SentencePipeline
+
+
+def drain(output: queue.Queue, count: int, timeout: float = 2):
+    items = []
+    deadline = time.time() + timeout
+    while len(items) < count and time.time() < deadline:
+        try:
+            items.append(output.get(timeout=0.05))
+        except queue.Empty:
+            continue
+    return items
+
+
+def speak(text, delay=0.0):
+    def fn(job):
+        time.sleep(delay)
+        job.put((SentenceType.FIRST, None, text))
+        job.handle_opus(text.encode())
+
+    return fn
+
+
+def test_output_keeps_submit_order():
+    output = queue.Queue()
+    pipeline = SentencePipeline(output, lookahead=3)
+    try:
+        # 第一句最慢，后面的句子先合成完也要排在它后面
+        pipeline.submit(speak("a", delay=0.2))
+        pipeline.submit(speak("b"))
+        pipeline.submit(speak("c", delay=0.1))
+        pipeline.put((SentenceType.LAST, [], None))
+        items = drain(output, 7)
+    finally:
+        pipeline.close()
+    assert [item[2] for item in items if item[0] == SentenceType.FIRST] == [
+        "a",
+        "b",
+        "c",
+    ]
+    assert [item[1] for item in items if item[0] == SentenceType.MIDDLE] == [
+        b"a",
+        b"b",
+        b"c",
+    ]
+    assert items[-1][0] == SentenceType.LAST
+
+
+def test_cancel_stops_running_job_and_releases_slot():
+    output = queue.Queue()
+    pipeline = SentencePipeline(output, lookahead=1)
+    started = threading.Event()
+    stopped = threading.Event()
+
+    def slow(job):
+        job.put((SentenceType.FIRST, None, "old"))
+        started.set()
+        # 模拟重试中的合成，打断后应尽快退出
+        while not job.is_cancelled():
+            time.sleep(0.01)
+        job.handle_opus(b"stale")
+        stopped.set()
+
+    try:
+        pipeline.submit(slow)
+        assert started.wait(1)
+        assert drain(output, 1) == [(SentenceType.FIRST, None, "old")]
+        pipeline.cancel()
+        assert stopped.wait(1)
+
+        # 名额已释放，打断后的新句子不被旧句子阻塞
+        begin = time.time()
+        pipeline.submit(speak("new"))
+        items = drain(output, 2)
+        assert time.time() - begin < 1
+    finally:
+        pipeline.close()
+    assert items == [(SentenceType.FIRST, None, "new"), (SentenceType.MIDDLE, b"new", None)]
+    assert output.empty()
+
+
+def test_cancel_releases_slot_while_stale_job_is_blocked():
+    output = queue.Queue()
+    pipeline = SentencePipeline(output, lookahead=1)
+    release = threading.Event()
+
+    def stuck(job):
+        # 模拟无法中途停止的网络请求
+        release.wait(2)
+        job.handle_opus(b"stale")
+
+    try:
+        pipeline.submit(stuck)
+        pipeline.cancel()
+        begin = time.time()
+        pipeline.submit(speak("new"))
+        items = drain(output, 2)
+        assert time.time() - begin < 1
+        release.set()
+        time.sleep(0.1)
+    finally:
+        pipeline.close()
+    assert items == [(SentenceType.FIRST, None, "new"), (SentenceType.MIDDLE, b"new", None)]
+    assert output.empty()
+
+
+def test_jobs_not_started_are_skipped_after_cancel():
+    output = queue.Queue()
+    pipeline = SentencePipeline(output, lookahead=2)
+    calls = []
+    gate = threading.Event()
+
+    def record(text):
+        def fn(job):
+            gate.wait(1)
+            calls.append(text)
+
+        return fn
+
+    try:
+        pipeline.submit(record("a"))
+        pipeline.submit(record("b"))
+        pipeline.cancel()
+        gate.set()
+        pipeline.submit(speak("c"))
+        items = drain(output, 2)
+    finally:
+        pipeline.close()
+    assert [item[2] for item in items if item[0] == SentenceType.FIRST] == ["c"]
+    assert output.empty()
+
+
+
+class FakeAudioSource:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_dropped_audio_sources_are_closed():
+    output = queue.Queue()
+    pipeline = SentencePipeline(output, lookahead=2)
+    gate = threading.Event()
+    queued, late = FakeAudioSource(), FakeAudioSource()
+
+    def late_file(job):
+        gate.wait(1)
+        job.put((SentenceType.MIDDLE, late, None))
+
+    try:
+        pipeline.submit(late_file)
+        pipeline.put((SentenceType.MIDDLE, queued, None))
+        pipeline.cancel()
+        gate.set()
+        time.sleep(0.3)
+    finally:
+        pipeline.close()
+    # 打断后丢弃的音频文件要关闭，临时文件才会被删除
+    assert output.empty()
+    assert queued.closed and late.closed
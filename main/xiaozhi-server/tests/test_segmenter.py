@@ -0,0 +1,82 @@
+from core.providers.tts import segmenter as segmenter_module
+from core.providers.tts.segmenter import TextSegmenter
+
+
+def feed_all(segmenter, deltas):
+    segments = []
+    for delta in deltas:
+        segment = segmenter.feed(delta)
+        if segment:
+            segments.append(segment)
+    rest = segmenter.flush()
+    if rest:
+        segments.append(rest)
+    return segments
+
+
+def test_first_sentence_splits_at_comma():
+    segmenter = TextSegmenter()
+    assert feed_all(segmenter, ["你好", "，今天", "天气不错，", "适合出门。再见"]) == [
+        "你好，",
+        "今天天气不错，适合出门。",
+        "再见",
+    ]
+
+
+def test_later_sentences_split_only_at_sentence_end():
+    segmenter = TextSegmenter(first_comma_split=False)
+    assert feed_all(segmenter, ["好的，我来", "帮你", "查一下。", "北京，晴。"]) == [
+        "好的，我来帮你查一下。",
+        "北京，晴。",
+    ]
+
+
+def test_split_at_last_punctuation_of_delta():
+    segmenter = TextSegmenter()
+    segmenter.feed("第一句。")
+    # 一段文本中有多个句号时，切到最后一个
+    assert segmenter.feed("第二句！第三句？第四") == "第二句！第三句？"
+    assert segmenter.flush() == "第四"
+    assert segmenter.flush() is None
+
+
+def test_first_min_chars_delays_comma_split():
+    segmenter = TextSegmenter(first_min_chars=6)
+    assert segmenter.feed("嗯，") is None
+    assert segmenter.feed("我想想，") == "嗯，我想想，"
+
+
+def test_sentence_end_ignores_first_min_chars():
+    segmenter = TextSegmenter(first_min_chars=10)
+    assert segmenter.feed("好。") == "好。"
+
+
+def test_first_max_wait_cuts_without_punctuation(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(segmenter_module.time, "monotonic", lambda: now[0])
+    segmenter = TextSegmenter(first_max_wait_ms=300)
+    assert segmenter.feed("今天的天气") is None
+    now[0] += 0.5
+    assert segmenter.feed("非常好") == "今天的天气非常好"
+    # 之后的句子不受等待时间影响
+    now[0] += 1
+    assert segmenter.feed("适合出门") is None
+
+
+def test_reset_starts_a_new_reply():
+    segmenter = TextSegmenter()
+    segmenter.feed("没说完的话")
+    segmenter.feed("第一句。")
+    segmenter.reset()
+    assert segmenter.is_first_sentence
+    assert segmenter.feed("新的，") == "新的，"
+
+
+def test_from_config():
+    segmenter = TextSegmenter.from_config(
+        {"first_min_chars": 4, "first_comma_split": False, "first_max_wait_ms": 200}
+    )
+    assert segmenter.first_min_chars == 4
+    assert not segmenter.first_comma_split
+    assert segmenter.first_max_wait == 0.2
+    assert TextSegmenter.from_config(None).first_comma_split
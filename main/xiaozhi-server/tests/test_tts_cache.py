@@ -0,0 +1,41 @@
+import os
+import threading
+
+from core.utils.cache import tts_cache
+from core.utils.cache.tts_cache import TTSAudioCache, get_tts_cache
+
+
+def test_concurrent_disk_writes_use_unique_temp_files(tmp_path):
+    cache = TTSAudioCache(disk_dir=str(tmp_path))
+    key = cache.make_key("fp", "你好", "opus")
+    frames = [b"\x01" * 40, b"\x02" * 60]
+    barrier = threading.Barrier(8)
+
+    def write():
+        barrier.wait()
+        cache._write_disk(key, frames)
+
+    threads = [threading.Thread(target=write) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert files == [f"{key}.p3"]
+    # 新实例从磁盘读到完整的帧
+    assert TTSAudioCache(disk_dir=str(tmp_path)).get(key) == frames
+
+
+def test_get_tts_cache_rebuilds_on_config_change(monkeypatch):
+    monkeypatch.setattr(tts_cache, "_tts_cache", None)
+    monkeypatch.setattr(tts_cache, "_tts_cache_config", None)
+    config = {"tts_cache": {"enabled": True, "memory_max_mb": 1}}
+
+    first = get_tts_cache(config)
+    assert get_tts_cache({"tts_cache": dict(config["tts_cache"])}) is first
+
+    changed = get_tts_cache({"tts_cache": {"enabled": True, "memory_max_mb": 2}})
+    assert changed is not first
+    assert changed.memory_max_bytes == 2 * 1024 * 1024
+    assert get_tts_cache({"tts_cache": {"enabled": False}}) is None
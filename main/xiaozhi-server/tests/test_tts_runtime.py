@@ -0,0 +1,73 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from core.utils.tts_runtime import get_tts_runtime, iterate_in_thread_loop
+
+
+async def numbers(count, closed, error=None):
+    try:
+        for i in range(count):
+            await asyncio.sleep(0.001)
+            yield i, threading.current_thread().name
+        if error is not None:
+            raise error
+    finally:
+        closed.append(count)
+
+
+def test_iterate_reads_on_runtime_and_yields_in_caller():
+    closed = []
+    items = list(get_tts_runtime().iterate(numbers(3, closed)))
+    assert [i for i, _ in items] == [0, 1, 2]
+    # 读取在运行时线程，处理在调用方线程
+    assert {name for _, name in items} == {"tts-runtime"}
+    assert closed == [3]
+
+
+def test_iterate_raises_stream_errors():
+    closed = []
+    with pytest.raises(ValueError):
+        list(get_tts_runtime().iterate(numbers(2, closed, ValueError("boom"))))
+    assert closed == [2]
+
+
+def test_iterate_cancels_reading_when_caller_stops():
+    closed = []
+    stream = get_tts_runtime().iterate(numbers(100, closed))
+    next(stream)
+    stream.close()
+    # 取消在运行时线程中异步执行
+    deadline = time.time() + 1
+    while not closed and time.time() < deadline:
+        time.sleep(0.01)
+    assert closed == [100]
+
+
+def test_iterate_in_thread_loop_closes_stream():
+    closed = []
+    stream = iterate_in_thread_loop(numbers(100, closed))
+    assert next(stream)[0] == 0
+    stream.close()
+    assert closed == [100]
+
+
+def test_default_text_to_speak_stream_yields_whole_sentence():
+    from core.providers.tts.base import TTSProviderBase
+
+    class WholeSentenceTTS(TTSProviderBase):
+        def __init__(self):
+            self.requests = []
+
+        async def text_to_speak(self, text, output_file):
+            self.requests.append((text, output_file))
+            return b"audio:" + text.encode()
+
+    async def collect(tts, text):
+        return [chunk async for chunk in tts.text_to_speak_stream(text)]
+
+    tts = WholeSentenceTTS()
+    assert asyncio.run(collect(tts, "你好")) == ["audio:你好".encode()]
+    assert tts.requests == [("你好", None)]
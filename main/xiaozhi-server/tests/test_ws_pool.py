@@ -0,0 +1,154 @@
+import json
+import asyncio
+
+import pytest
+import websockets
+
+from core.providers.tts.ws_pool import WebSocketPool
+
+
+class FakeWebSocket:
+    """模拟上游连接：feed写入上游消息，send记录发出的消息"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+        self._incoming = asyncio.Queue()
+
+    def feed(self, message):
+        self._incoming.put_nowait(message)
+
+    async def send(self, data):
+        self.sent.append(data)
+
+    async def recv(self):
+        item = await self._incoming.get()
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    async def close(self):
+        self.closed = True
+
+
+class Connector:
+    def __init__(self):
+        self.sockets = []
+
+    async def __call__(self):
+        ws = FakeWebSocket()
+        self.sockets.append(ws)
+        return ws
+
+
+def route_by_session(message):
+    data = json.loads(message)
+    return data.get("session_id"), data["payload"]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_released_connection_is_reused():
+    async def main():
+        pool = WebSocketPool("test", min_idle=0)
+        connector = Connector()
+        first = await pool.open_session("s1", connector)
+        await first.send("hello")
+        first.release()
+        second = await pool.open_session("s2", connector)
+        assert len(connector.sockets) == 1
+        assert connector.sockets[0].sent == ["hello"]
+        assert pool.stats() == {"connections": 1, "idle": 0, "sessions": 1}
+        await second.close()
+        await asyncio.sleep(0)
+        assert connector.sockets[0].closed
+        assert pool.stats()["connections"] == 0
+
+    run(main())
+
+
+def test_warm_up_keeps_idle_connection():
+    async def main():
+        pool = WebSocketPool("test", min_idle=1)
+        connector = Connector()
+        await pool.open_session("s1", connector)
+        await asyncio.sleep(0.01)
+        # 会话开始后在后台预热一条空闲连接
+        assert pool.stats() == {"connections": 2, "idle": 1, "sessions": 1}
+        await pool.open_session("s2", connector)
+        assert len(connector.sockets) >= 2
+        assert pool.stats()["sessions"] == 2
+
+    run(main())
+
+
+def test_messages_are_routed_by_session_id():
+    async def main():
+        pool = WebSocketPool(
+            "test", min_idle=0, max_sessions_per_connection=2, route=route_by_session
+        )
+        connector = Connector()
+        a = await pool.open_session("a", connector)
+        b = await pool.open_session("b", connector)
+        assert len(connector.sockets) == 1
+        ws = connector.sockets[0]
+        ws.feed(json.dumps({"session_id": "b", "payload": "to-b"}))
+        ws.feed(json.dumps({"session_id": "a", "payload": "to-a"}))
+        ws.feed(json.dumps({"session_id": "gone", "payload": "dropped"}))
+        assert await asyncio.wait_for(a.recv(), 1) == "to-a"
+        assert await asyncio.wait_for(b.recv(), 1) == "to-b"
+
+    run(main())
+
+
+def test_session_waits_for_free_connection():
+    async def main():
+        pool = WebSocketPool("test", max_connections=1, min_idle=0)
+        connector = Connector()
+        first = await pool.open_session("s1", connector)
+        waiting = asyncio.ensure_future(pool.open_session("s2", connector, timeout=1))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        first.release()
+        second = await asyncio.wait_for(waiting, 1)
+        assert second.session_id == "s2"
+        assert len(connector.sockets) == 1
+
+        with pytest.raises(TimeoutError):
+            await pool.open_session("s3", connector, timeout=0.05)
+
+    run(main())
+
+
+def test_connection_loss_is_raised_to_sessions():
+    async def main():
+        pool = WebSocketPool("test", min_idle=0)
+        connector = Connector()
+        session = await pool.open_session("s1", connector)
+        connector.sockets[0].feed(websockets.ConnectionClosedError(None, None))
+        with pytest.raises(websockets.ConnectionClosed):
+            await asyncio.wait_for(session.recv(), 1)
+        assert pool.stats()["connections"] == 0
+        # 断开的连接不再复用
+        session.release()
+        await pool.open_session("s2", connector)
+        assert len(connector.sockets) == 2
+
+    run(main())
+
+
+def test_idle_connections_expire():
+    async def main():
+        pool = WebSocketPool("test", min_idle=0, idle_timeout=0)
+        connector = Connector()
+        session = await pool.open_session("s1", connector)
+        session.release()
+        await asyncio.sleep(0.01)
+        await pool.open_session("s2", connector)
+        await asyncio.sleep(0.01)
+        assert len(connector.sockets) == 2
+        assert connector.sockets[0].closed
+
+    run(main())